@@ -0,0 +1,14 @@
+"""Registers rtDoModifier, see rigging_toolkit.maya.utils.api.modifier_command"""
+from rigging_toolkit.maya.utils.api.modifier_command import initialize_plugin, uninitialize_plugin
+
+
+def maya_useNewAPI():
+    pass
+
+
+def initializePlugin(plugin):
+    initialize_plugin(plugin)
+
+
+def uninitializePlugin(plugin):
+    uninitialize_plugin(plugin)
@@ -0,0 +1,116 @@
+from typing import Iterator, Optional, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+
+from rigging_toolkit.core.delta_stack import DeltaStack, WeightMapStack
+
+if TYPE_CHECKING:
+    from rigging_toolkit.core.filesystem import Path
+
+# upper bound on the number of output coordinates, frames x 3V, evaluated at once
+CHUNK_ELEMENTS = 1 << 23
+
+# upper bound on the size of the dense (targets x coordinates) blocks multiplied with the frame weights
+BLOCK_ELEMENTS = 1 << 22
+
+
+class BlendShapeEvaluator(object):
+    """
+    Evaluate a blendShape node outside of maya, for any number of frames of target weights:
+
+        points = base + envelope * base_weights * sum(w_i * target_weights_i * delta_i)
+
+    The per vertex weights are folded into the sparse targets once. Only the coordinates moved by
+    a target are evaluated, in dense blocks so every batch of frames is a few BLAS products.
+    """
+
+    def __init__(self, base_points, deltas, target_weights=None, base_weights=None, envelope=1.0):
+        # type: (np.ndarray, DeltaStack, Optional[Union[WeightMapStack, np.ndarray]], Optional[np.ndarray], Optional[float]) -> None
+        self.base_points = np.asarray(base_points, dtype=np.float64).reshape(-1, 3)
+        if deltas.vertex_count != len(self.base_points):
+            raise ValueError(
+                f"The targets have {deltas.vertex_count} vertices, the base has {len(self.base_points)}"
+            )
+        self.names = list(deltas.names)
+
+        scaled = deltas.masked(target_weights) if target_weights is not None else deltas
+        if base_weights is not None:
+            scaled = scaled.masked(np.asarray(base_weights, dtype=np.float32) * np.float32(envelope))
+        elif envelope != 1.0:
+            scaled = scaled.scaled(envelope)
+
+        # (3V, T) with the coordinates moved by no target removed
+        matrix = scaled.matrix.transpose()
+        self._columns = np.flatnonzero(matrix.row_lengths)
+        self._matrix = matrix.take_rows(self._columns)
+
+    @property
+    def vertex_count(self):
+        # type: () -> int
+        return len(self.base_points)
+
+    def _frame_weights(self, weights):
+        # type: (np.ndarray) -> np.ndarray
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim == 1:
+            weights = weights[np.newaxis]
+        if weights.shape[1] != len(self.names):
+            raise ValueError(f"Expected weights for {len(self.names)} targets, got {weights.shape[1]}")
+        return weights
+
+    def chunks(self, weights, chunk_size=None):
+        # type: (np.ndarray, Optional[int]) -> Iterator[Tuple[int, np.ndarray]]
+        """Yield (first frame, (n, V, 3) points) for consecutive chunks of the (F, T) frame weights."""
+        weights = self._frame_weights(weights)
+        chunk_size = chunk_size or max(CHUNK_ELEMENTS // max(self.vertex_count * 3, 1), 1)
+        block_size = max(BLOCK_ELEMENTS // max(len(self.names), 1), 1)
+        for start in range(0, len(weights), chunk_size):
+            frames = weights[start:start + chunk_size].astype(np.float32)
+            points = np.repeat(self.base_points.reshape(1, -1), len(frames), axis=0)
+            for block_start in range(0, len(self._columns), block_size):
+                block_stop = min(block_start + block_size, len(self._columns))
+                columns = self._columns[block_start:block_stop]
+                points[:, columns] += np.dot(frames, self._dense_block(block_start, block_stop))
+            yield start, points.reshape(-1, self.vertex_count, 3)
+
+    def _dense_block(self, start, stop):
+        # type: (int, int) -> np.ndarray
+        """(T, stop - start) dense targets of the evaluated coordinates [start, stop)."""
+        block = np.zeros((len(self.names), stop - start), dtype=np.float32)
+        lo, hi = self._matrix.indptr[start], self._matrix.indptr[stop]
+        rows = np.repeat(np.arange(stop - start), np.diff(self._matrix.indptr[start:stop + 1]))
+        block[self._matrix.indices[lo:hi], rows] = self._matrix.data[lo:hi]
+        return block
+
+    def evaluate(self, weights):
+        # type: (np.ndarray) -> np.ndarray
+        """(V, 3) points for (T,) weights, or (F, V, 3) points for (F, T) weights of every frame."""
+        frames = self._frame_weights(weights)
+        result = np.empty((len(frames), self.vertex_count, 3))
+        for start, points in self.chunks(frames):
+            result[start:start + len(points)] = points
+        return result[0] if np.ndim(weights) == 1 else result
+
+    def bake(self, weights, path, dtype=np.float32):
+        # type: (np.ndarray, Union[str, Path], Optional[np.dtype]) -> None
+        """Stream the (F, V, 3) points of every frame to a .npy point cache, without holding them in memory."""
+        frames = self._frame_weights(weights)
+        cache = np.lib.format.open_memmap(
+            str(path), mode="w+", dtype=dtype, shape=(len(frames), self.vertex_count, 3)
+        )
+        for start, points in self.chunks(frames):
+            cache[start:start + len(points)] = points
+        cache.flush()
+        del cache
+
+    def validate(self, weights, expected_points, tolerance=1e-4):
+        # type: (np.ndarray, np.ndarray, Optional[float]) -> np.ndarray
+        """Return the (frame, vertex) pairs of the expected (F, V, 3) points further than tolerance from the evaluation."""
+        frames = self._frame_weights(weights)
+        expected_points = np.asarray(expected_points).reshape(len(frames), self.vertex_count, 3)
+        mismatches = []
+        for start, points in self.chunks(frames):
+            distances = np.linalg.norm(points - expected_points[start:start + len(points)], axis=2)
+            frame_ids, vertex_ids = np.nonzero(distances > tolerance)
+            mismatches.append(np.stack([frame_ids + start, vertex_ids], axis=1))
+        return np.concatenate(mismatches) if mismatches else np.zeros((0, 2), dtype=np.int64)
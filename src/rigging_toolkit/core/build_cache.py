@@ -0,0 +1,89 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+import hashlib
+import json
+import logging
+
+from rigging_toolkit.core.delta_stack import DeltaStack
+from rigging_toolkit.core.filesystem import Path
+
+logger = logging.getLogger(__name__)
+
+# bytes read at once when hashing a file
+_READ_SIZE = 1 << 20
+
+
+def file_digest(path):
+    # type: (Union[str, Path]) -> str
+    """Hash of the content of a file."""
+    digest = hashlib.sha1()
+    with open(str(path), "rb") as f:
+        for chunk in iter(lambda: f.read(_READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def combine_digests(digests):
+    # type: (Iterable[str]) -> str
+    """Hash of an ordered sequence of hashes, the digest of a result from the digests of its inputs."""
+    return hashlib.sha1("\n".join(digests).encode("utf-8")).hexdigest()
+
+
+class BuildCache(object):
+    """
+    Deltas produced by a build step, with the digest of the inputs of every target.
+
+    The manifest, {name}.json, maps every target to its digest and the deltas are stored next
+    to it in {name}.npz. A target whose digest is unchanged on the next build is reused as is.
+    The digests of inputs shared by all the targets, e.g. the neutral, are kept in {name}.inputs.json
+    so the cache can be checked without rebuilding them.
+    """
+
+    def __init__(self, folder, name):
+        # type: (Path, str) -> None
+        self.manifest_path = Path(folder) / f"{name}.json"
+        self.deltas_path = Path(folder) / f"{name}.npz"
+        self.inputs_path = Path(folder) / f"{name}.inputs.json"
+        self.digests = {}  # type: Dict[str, str]
+        self.inputs = {}  # type: Dict[str, str]
+        self.deltas = None  # type: Optional[DeltaStack]
+        self.load()
+
+    def load(self):
+        # type: () -> None
+        self.digests, self.inputs, self.deltas = {}, {}, None
+        if not self.manifest_path.exists() or not self.deltas_path.exists():
+            return
+        try:
+            with open(str(self.manifest_path), "r") as f:
+                self.digests = json.load(f)
+            if self.inputs_path.exists():
+                with open(str(self.inputs_path), "r") as f:
+                    self.inputs = json.load(f)
+            self.deltas = DeltaStack.load(self.deltas_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring the unreadable build cache {self.manifest_path}: {e}")
+            self.digests, self.inputs, self.deltas = {}, {}, None
+
+    def reusable(self, digests):
+        # type: (Dict[str, str]) -> List[str]
+        """Names of the targets cached with the same digest"""
+        if self.deltas is None:
+            return []
+        return [name for name, digest in digests.items() if self.digests.get(name) == digest and name in self.deltas]
+
+    def get(self, names):
+        # type: (Sequence[str]) -> DeltaStack
+        return self.deltas[list(names)]
+
+    def save(self, digests, deltas, inputs=None):
+        # type: (Dict[str, str], DeltaStack, Optional[Dict[str, str]]) -> None
+        """Replace the cache with the deltas of the targets and their digests"""
+        Path.create_path(self.manifest_path.parent)
+        deltas.save(self.deltas_path)
+        with open(str(self.manifest_path), "w") as f:
+            json.dump({name: digests[name] for name in deltas.names}, f, indent=4)
+        with open(str(self.inputs_path), "w") as f:
+            json.dump(inputs or {}, f, indent=4)
+        self.digests = {name: digests[name] for name in deltas.names}
+        self.inputs = dict(inputs or {})
+        self.deltas = deltas
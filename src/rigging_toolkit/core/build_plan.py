@@ -0,0 +1,393 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import json
+import logging
+
+from rigging_toolkit.core.build_cache import BuildCache, combine_digests, file_digest
+from rigging_toolkit.core.config_store import FULL_SPLIT, ConfigStore, FaceConfig
+from rigging_toolkit.core.context import Context
+from rigging_toolkit.core.filesystem import Path, find_latest
+from rigging_toolkit.core.shape_lattice import ShapeLattice, shape_components
+
+logger = logging.getLogger(__name__)
+
+BUILD_PLAN_VERSION = 1
+
+# folders of the shapes series that aren't shapes
+SHAPES_IGNORE_LIST = ["_archive", "_pack"]
+
+# assets of the character left out of the face rig
+FACE_RIG_IGNORED_ASSETS = ["eyelashes", "baseBody"]
+
+# asset whose weights can be transferred to the assets asked for that have no weights of their own
+WEIGHTS_SOURCE = "geo_head_L1"
+
+# mask of the full splits, a full split copies the delta of its target and has no mask file
+FULL_SPLIT_MASK = "xFull"
+FULL_SPLIT_DIGEST = combine_digests([FULL_SPLIT_MASK])
+
+# rough seconds per operation, to compare plans rather than predict the build time
+OPERATION_COSTS = {
+    "import_asset": 2.0,
+    "import_shader": 0.5,
+    "import_module": 5.0,
+    "import_neutral": 2.0,
+    "load_shape": 1.5,
+    "solve_corrective": 0.01,
+    "split": 0.005,
+    "set_driven_keys": 0.02,
+    "create_follicle": 0.05,
+    "import_weights": 1.0,
+    "transfer_weights": 3.0,
+}
+
+# seconds of an operation whose result comes from a build cache
+CACHED_COST = 0.001
+
+
+def shape_graph_cache_path(context):
+    # type: (Context) -> Path
+    return context.rigs_path / "cache" / "shape_graph"
+
+
+def plan_file(context, relative_path):
+    # type: (Context, str) -> Optional[Path]
+    """Absolute path of a file input of an operation, None if the file was missing when planned"""
+    return context.character_path / relative_path if relative_path else None
+
+
+def list_shape_names(shapes_path):
+    # type: (Path) -> List[str]
+    """Shapes of the shapes series, one folder per shape, shp_12_L1 -> shp_12"""
+    return [
+        shape.stem.replace("_L1", "") for shape in shapes_path.iterdir() if shape.stem not in SHAPES_IGNORE_LIST
+    ]
+
+
+def build_shape_lattice(shapes):
+    # type: (Iterable[str]) -> ShapeLattice
+    """Lattice of the shapes, the base shapes then the combos, each sorted by name"""
+    shapes = sorted(set(shapes))
+    base_shapes = [shape for shape in shapes if len(shape_components(shape)) == 1]
+    combo_shapes = [shape for shape in shapes if len(shape_components(shape)) > 1]
+    return ShapeLattice(base_shapes + combo_shapes)
+
+
+def plan_splits(face_config, lattice, targets, shape, skip=()):
+    # type: (FaceConfig, ShapeLattice, Sequence[str], str, Iterable[str]) -> List[Tuple[str, str, str]]
+    """
+    (target, mask, split name) of every split of the targets containing the shape, each target is
+    split by the masks of the splitting group of its components, splits already in skip are left out.
+    The targets of a full split group get a single FULL_SPLIT_MASK split, a copy of their delta.
+    """
+    skip = set(skip)
+    shape_mask = lattice.mask(shape)
+    splits = []
+    for target in targets:
+        if lattice.mask_of(target) & shape_mask != shape_mask:
+            continue
+        group = face_config.group(face_config.corrective_splitting_group(shape_components(target)))
+        if group is None:
+            continue
+        if group.masks:
+            splits.extend((target, f"x{mask}", f"{target}_x{mask}") for mask in group.masks)
+        elif group.name == FULL_SPLIT:
+            splits.append((target, FULL_SPLIT_MASK, f"{target}_xFullShape"))
+    return [split for split in splits if split[2] not in skip]
+
+
+@dataclass(frozen=True)
+class Operation:
+
+    kind: str
+    name: str
+    inputs: Tuple[str, ...] = field(default=())
+    cached: bool = field(default=False)
+    cost: float = field(default=0.0)
+
+    @property
+    def key(self):
+        # type: () -> str
+        return f"{self.kind}:{self.name}"
+
+
+class BuildPlan(object):
+    """
+    Ordered operations of a build with their inputs and estimated cost, planned without Maya.
+
+    Files are stored relative to the character folder so the plans of two machines or two series
+    can be compared, see diff. The build executes a plan by reading its operations instead of
+    analysing the shapes and resolving the files again.
+    """
+
+    def __init__(self, operations=None, metadata=None, warnings=None):
+        # type: (Optional[List[Operation]], Optional[Dict[str, Any]], Optional[List[str]]) -> None
+        self.operations = list(operations or [])
+        self.metadata = dict(metadata or {})
+        self.warnings = list(warnings or [])
+
+    def add(self, kind, name, inputs=(), cached=False):
+        # type: (str, str, Sequence[str], Optional[bool]) -> Operation
+        cost = CACHED_COST if cached else OPERATION_COSTS.get(kind, 0.0)
+        operation = Operation(kind, name, tuple(inputs), bool(cached), cost)
+        self.operations.append(operation)
+        return operation
+
+    def warn(self, message):
+        # type: (str) -> None
+        logger.warning(message)
+        self.warnings.append(message)
+
+    def of_kind(self, kind):
+        # type: (str) -> List[Operation]
+        return [operation for operation in self.operations if operation.kind == kind]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.operations)
+
+    @property
+    def total_cost(self):
+        # type: () -> float
+        return sum(operation.cost for operation in self.operations)
+
+    def summary(self):
+        # type: () -> Dict[str, Dict[str, float]]
+        """{kind: {count, cached, cost}} in the order the kinds first appear"""
+        summary = {}  # type: Dict[str, Dict[str, float]]
+        for operation in self.operations:
+            row = summary.setdefault(operation.kind, {"count": 0, "cached": 0, "cost": 0.0})
+            row["count"] += 1
+            row["cached"] += int(operation.cached)
+            row["cost"] += operation.cost
+        return summary
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        return {
+            "version": BUILD_PLAN_VERSION,
+            "metadata": self.metadata,
+            "summary": self.summary(),
+            "total_cost": self.total_cost,
+            "warnings": self.warnings,
+            "operations": [asdict(operation) for operation in self.operations],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # type: (Dict[str, Any]) -> BuildPlan
+        if data.get("version", 0) > BUILD_PLAN_VERSION:
+            raise ValueError(f"The build plan was written by a newer version, {data['version']}")
+        operations = [
+            Operation(op["kind"], op["name"], tuple(op.get("inputs", [])), op.get("cached", False), op.get("cost", 0.0))
+            for op in data.get("operations", [])
+        ]
+        return cls(operations, data.get("metadata"), data.get("warnings"))
+
+    def save(self, path):
+        # type: (Union[str, Path]) -> None
+        Path.create_path(Path(path).parent)
+        with open(str(path), "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        # type: (Union[str, Path]) -> BuildPlan
+        with open(str(path), "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def diff(self, other):
+        # type: (BuildPlan) -> Dict[str, List[str]]
+        """Operations added, removed and changed, their inputs or cache state, from this plan to the other"""
+        ours = {operation.key: operation for operation in self.operations}
+        theirs = {operation.key: operation for operation in other.operations}
+        return {
+            "added": [key for key in theirs if key not in ours],
+            "removed": [key for key in ours if key not in theirs],
+            "changed": [
+                key for key in ours
+                if key in theirs and (ours[key].inputs, ours[key].cached) != (theirs[key].inputs, theirs[key].cached)
+            ],
+        }
+
+
+class BuildPlanner(object):
+    """
+    Plans the shape graph and the face rig of a context without Maya: lists and analyses the shapes,
+    resolves every file, assigns the splitting groups and checks the build caches, so the number and
+    cost of the imports, correctives and splits are known before the build runs.
+
+    The full shapes are planned as cached when their file is unchanged since the last build and the
+    neutral is assumed unchanged too, its points are only known once it is loaded in Maya.
+    """
+
+    def __init__(self, context, use_cache=True):
+        # type: (Context, Optional[bool]) -> None
+        self.context = context
+        self.use_cache = use_cache
+        self.configs = ConfigStore.of(context)
+
+    def _relative(self, path):
+        # type: (Optional[Path]) -> str
+        if path is None:
+            return ""
+        return Path(path).resolve().relative_to(self.context.character_path.resolve()).as_posix()
+
+    def _latest(self, plan, folder, versioned_name, extension):
+        # type: (BuildPlan, Path, str, str) -> str
+        latest = None
+        if Path.validate_path(folder) is not None:
+            latest, _ = find_latest(folder, versioned_name, extension)
+        if latest is None:
+            plan.warn(f"No {versioned_name}.{extension} found in {folder}")
+        return self._relative(latest)
+
+    def _cache(self, name):
+        # type: (str) -> Optional[BuildCache]
+        return BuildCache(shape_graph_cache_path(self.context), name) if self.use_cache else None
+
+    def _metadata(self):
+        # type: () -> Dict[str, Any]
+        return {
+            "character_name": self.context.character_name,
+            "assets_series": self.context.assets_series,
+            "rigs_series": self.context.rigs_series,
+            "shapes_series": self.context.shapes_series,
+            "utilities_series": self.context.utilities_series,
+        }
+
+    def plan_shape_graph(self, load_neutral=True, plan=None):
+        # type: (Optional[bool], Optional[BuildPlan]) -> BuildPlan
+        plan = plan if plan is not None else BuildPlan(metadata=self._metadata())
+        shapes = list_shape_names(self.context.shapes_path)
+        lattice = build_shape_lattice(shapes)
+        plan.metadata["shapes"] = sorted(set(shapes))
+
+        for shape in lattice.combo_shapes:
+            missing = lattice.missing_components(shape)
+            if missing:
+                plan.warn(f"{shape} is left out, it has components without a base shape: {missing}")
+
+        if load_neutral:
+            neutral = self._latest(plan, self.context.assets_path / "head" / "meshes", "geo_head_L1", "abc")
+            plan.add("import_neutral", "geo_head_L1", [neutral])
+
+        # full shapes, the cached ones were imported with the same file and neutral
+        loaded = [shape for shape in lattice.evaluation_order() if not lattice.missing_components(shape)]
+        cache = self._cache("full_shapes")
+        neutral_digest = cache.inputs.get("neutral") if cache else None
+        shape_digests = {}  # type: Dict[str, str]
+        files = {shape: self._latest(plan, self.context.shapes_path / f"{shape}_L1", f"{shape}_L1", "abc") for shape in loaded}
+        for shape in loaded:
+            if neutral_digest and files[shape]:
+                shape_digests[shape] = combine_digests([neutral_digest, file_digest(plan_file(self.context, files[shape]))])
+        cached = set(cache.reusable(shape_digests)) if cache else set()
+        for shape in loaded:
+            plan.add("load_shape", shape, [files[shape]], cached=shape in cached)
+
+        # correctives of the combos, chained through the digests of all the shapes they contain
+        digests = {}  # type: Dict[str, str]
+        for shape in loaded:
+            if shape in shape_digests:
+                digests[shape] = combine_digests(
+                    [shape_digests[shape]] + [digests[sub] for sub in lattice.sub_shapes(shape) if sub in digests]
+                )
+        combos = [shape for shape in loaded if lattice.is_combo(shape)]
+        cache = self._cache("correctives")
+        cached = set(cache.reusable({combo: digests[combo] for combo in combos if combo in digests})) if cache else set()
+        for combo in combos:
+            plan.add("solve_corrective", combo, lattice.sub_shapes(combo), cached=combo in cached)
+
+        # the base targets are keyed by their full shape, the correctives by their chained digest
+        target_digests = {f"{shape}_L1": shape_digests.get(shape) for shape in loaded if not lattice.is_combo(shape)}
+        target_digests.update({f"delta_{combo}_L1": digests.get(combo) for combo in combos})
+        self._plan_splits(plan, lattice, loaded, target_digests)
+        return plan
+
+    def _plan_splits(self, plan, lattice, loaded, target_digests):
+        # type: (BuildPlan, ShapeLattice, List[str], Dict[str, Optional[str]]) -> None
+        face_config = self.configs.face()
+        if face_config is None:
+            plan.warn("No face config, the shapes won't be split")
+            return
+
+        base_shapes = [shape for shape in loaded if not lattice.is_combo(shape)]
+        combos = [shape for shape in loaded if lattice.is_combo(shape)]
+        targets = [f"{shape}_L1" for shape in base_shapes] + [f"delta_{combo}_L1" for combo in combos]
+
+        splits = []
+        split_names = set()
+        for shape in sorted(base_shapes):
+            if not face_config.shape_groups(f"{shape}_L1"):
+                continue
+            new_splits = plan_splits(face_config, lattice, targets, shape, split_names)
+            splits.extend(new_splits)
+            split_names.update(name for _, _, name in new_splits)
+
+        masks_path = self.context.utilities_path / "masks"
+        mask_files = {}  # type: Dict[str, str]
+        split_digests = {}  # type: Dict[str, str]
+        mask_digests = {FULL_SPLIT_MASK: FULL_SPLIT_DIGEST}
+        for target, mask, name in splits:
+            if mask == FULL_SPLIT_MASK:
+                mask_files[mask] = ""
+            elif mask not in mask_files:
+                mask_files[mask] = self._latest(plan, masks_path, f"msk_{mask}", "wmap")
+                if mask_files[mask]:
+                    mask_digests[mask] = file_digest(plan_file(self.context, mask_files[mask]))
+            if target_digests.get(target) and mask in mask_digests:
+                split_digests[name] = combine_digests([target_digests[target], mask_digests[mask]])
+        cache = self._cache("splits")
+        cached = set(cache.reusable(split_digests)) if cache else set()
+        for target, mask, name in splits:
+            plan.add("split", name, [target, mask, mask_files[mask]], cached=name in cached)
+
+    def plan_face_rig(self, weights_transfer_targets=None):
+        # type: (Optional[List[str]]) -> BuildPlan
+        """
+        Assets without a weights xml are skipped, unless they are listed in weights_transfer_targets
+        in which case the weights of WEIGHTS_SOURCE are transferred to them.
+        """
+        plan = BuildPlan(metadata=self._metadata())
+        context = self.context
+
+        assets = []
+        for asset in context.assets_path.iterdir():
+            if asset.name in FACE_RIG_IGNORED_ASSETS:
+                continue
+            name = f"geo_{asset.name}_L1"
+            plan.add("import_asset", name, [self._latest(plan, asset / "meshes", name, "abc")])
+            assets.append(name)
+
+        shader_setup = self.configs.shaders()
+        for shader in shader_setup.shaders if shader_setup else []:
+            plan.add("import_shader", shader, [self._latest(plan, context.shaders_path, shader, "json")])
+
+        modules_path = context.rigs_path / "modules"
+        plan.add("import_module", "body_rig", [self._latest(plan, modules_path, "body_rig", "ma")])
+        self.plan_shape_graph(load_neutral=False, plan=plan)
+        plan.add("import_module", "teeth_eyes_rig", [self._latest(plan, modules_path, "teeth_eyes_rig", "ma")])
+        face_ui = f"{context.character_name}_face_ui"
+        plan.add("import_module", face_ui, [self._latest(plan, context.rigs_path / "ui", face_ui, "ma")])
+
+        ui_setup = self.configs.ui_setup()
+        if ui_setup is not None:
+            for c in ui_setup.shape_connections:
+                plan.add("set_driven_keys", f"{c.control}.{c.axis}->{c.target}")
+            for c in ui_setup.joint_connections:
+                plan.add("set_driven_keys", f"{c.control}.{c.axis}->{c.joint}.{c.joint_axis}")
+
+        eyebrows = self.configs.eyebrows()
+        for vertex in eyebrows.vertices if eyebrows else []:
+            plan.add("create_follicle", vertex, [eyebrows.mesh])
+
+        weights_path = context.rigs_path / "weights"
+        for asset in assets:
+            weights = None
+            if Path.validate_path(weights_path) is not None:
+                weights, _ = find_latest(weights_path, asset, "xml")
+            if weights is not None:
+                plan.add("import_weights", asset, [self._relative(weights)])
+            elif asset != WEIGHTS_SOURCE and asset in (weights_transfer_targets or []):
+                plan.add("transfer_weights", asset, [WEIGHTS_SOURCE])
+        return plan
@@ -0,0 +1,265 @@
+from typing import Optional, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+
+from rigging_toolkit.core.sparse import CSRMatrix, concatenate_ranges, unique_keys
+from rigging_toolkit.core.spatial import SpatialIndex
+
+if TYPE_CHECKING:
+    from rigging_toolkit.core.filesystem import Path
+
+# upper bound on the number of (query, triangle) candidate pairs tested at once
+CHUNK_ELEMENTS = 1 << 22
+
+
+def closest_point_on_triangles(points, a, b, c):
+    # type: (np.ndarray, np.ndarray, np.ndarray, np.ndarray) -> np.ndarray
+    """
+    Barycentric coordinates of the closest point on each (a, b, c) triangle to each point.
+
+    All arrays are (n, 3), the voronoi region tests follow Ericson, Real-Time Collision Detection.
+    """
+    ab = b - a
+    ac = c - a
+    ap = points - a
+    bp = points - b
+    cp = points - c
+
+    d1 = np.einsum("ij,ij->i", ab, ap)
+    d2 = np.einsum("ij,ij->i", ac, ap)
+    d3 = np.einsum("ij,ij->i", ab, bp)
+    d4 = np.einsum("ij,ij->i", ac, bp)
+    d5 = np.einsum("ij,ij->i", ab, cp)
+    d6 = np.einsum("ij,ij->i", ac, cp)
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    def _divide(numerator, denominator):
+        safe = np.where(denominator == 0.0, 1.0, denominator)
+        return np.where(denominator == 0.0, 0.0, numerator / safe)
+
+    barycentric = np.zeros((len(points), 3))
+
+    # inside the face
+    total = va + vb + vc
+    v = _divide(vb, total)
+    w = _divide(vc, total)
+    barycentric[:] = np.stack([1.0 - v - w, v, w], axis=1)
+
+    # the regions are assigned from the lowest to the highest priority, later ones win
+    edge_bc = (va <= 0) & ((d4 - d3) >= 0) & ((d5 - d6) >= 0)
+    w = _divide(d4 - d3, (d4 - d3) + (d5 - d6))
+    barycentric[edge_bc] = np.stack([np.zeros_like(w), 1.0 - w, w], axis=1)[edge_bc]
+
+    edge_ac = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+    w = _divide(d2, d2 - d6)
+    barycentric[edge_ac] = np.stack([1.0 - w, np.zeros_like(w), w], axis=1)[edge_ac]
+
+    vertex_c = (d6 >= 0) & (d5 <= d6)
+    barycentric[vertex_c] = (0.0, 0.0, 1.0)
+
+    edge_ab = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+    v = _divide(d1, d1 - d3)
+    barycentric[edge_ab] = np.stack([1.0 - v, v, np.zeros_like(v)], axis=1)[edge_ab]
+
+    vertex_b = (d3 >= 0) & (d4 <= d3)
+    barycentric[vertex_b] = (0.0, 1.0, 0.0)
+
+    vertex_a = (d1 <= 0) & (d2 <= 0)
+    barycentric[vertex_a] = (1.0, 0.0, 0.0)
+
+    return barycentric
+
+
+class SurfaceCorrespondence(object):
+    """
+    Closest point of every target point on a source surface, as the source triangle vertices
+    and their barycentric weights.
+    """
+
+    def __init__(self, vertex_ids, barycentric, distances, num_source_vertices):
+        # type: (np.ndarray, np.ndarray, np.ndarray, int) -> None
+        self.vertex_ids = np.asarray(vertex_ids, dtype=np.int64).reshape(-1, 3)
+        self.barycentric = np.asarray(barycentric, dtype=np.float64).reshape(-1, 3)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.num_source_vertices = int(num_source_vertices)
+        self._matrix = None  # type: Optional[CSRMatrix]
+
+    @property
+    def num_targets(self):
+        # type: () -> int
+        return len(self.vertex_ids)
+
+    @property
+    def matrix(self):
+        # type: () -> CSRMatrix
+        """(num_targets, num_source_vertices) interpolation matrix."""
+        if self._matrix is None:
+            rows = np.repeat(np.arange(self.num_targets), 3)
+            self._matrix = CSRMatrix.from_coo(
+                rows,
+                self.vertex_ids.ravel(),
+                self.barycentric.ravel(),
+                (self.num_targets, self.num_source_vertices),
+            )
+        return self._matrix
+
+    def interpolate(self, values):
+        # type: (np.ndarray) -> np.ndarray
+        """Interpolate per source vertex values, e.g. a weight matrix, at the target points."""
+        return self.matrix.dot(values)
+
+    def save(self, path):
+        # type: (Union[str, Path]) -> None
+        with open(str(path), "wb") as f:
+            np.savez_compressed(
+                f,
+                vertex_ids=self.vertex_ids,
+                barycentric=self.barycentric,
+                distances=self.distances,
+                num_source_vertices=self.num_source_vertices,
+            )
+
+    @classmethod
+    def load(cls, path):
+        # type: (Union[str, Path]) -> SurfaceCorrespondence
+        with np.load(str(path)) as data:
+            return cls(
+                data["vertex_ids"],
+                data["barycentric"],
+                data["distances"],
+                int(data["num_source_vertices"]),
+            )
+
+
+class TriangleGrid(object):
+    """
+    Uniform grid over the triangles of a mesh, built once and queried in batch for closest points.
+
+    Every triangle is registered in all the cells its bounding box overlaps. The distance to the
+    closest source vertex bounds the search region of each query, so the result is exact.
+    """
+
+    def __init__(self, points, triangles, cell_size=None):
+        # type: (np.ndarray, np.ndarray, Optional[float]) -> None
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+
+        if not len(self.triangles):
+            raise ValueError("Cannot build a TriangleGrid without triangles")
+
+        corners = self.points[self.triangles]
+        lower = corners.min(axis=1)
+        upper = corners.max(axis=1)
+
+        if cell_size is None:
+            cell_size = float(np.mean((upper - lower).max(axis=1)))
+        self.cell_size = max(float(cell_size), 1e-9)
+
+        self._origin = lower.min(axis=0)
+        lower_cells = self._cells(lower)
+        upper_cells = self._cells(upper)
+        self._dims = upper_cells.max(axis=0) + 1
+
+        triangle_ids, keys = self._expand_boxes(lower_cells, upper_cells)
+        order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[order]
+        self._triangle_ids = triangle_ids[order]
+
+        # closest vertex distance is an upper bound of the closest surface distance
+        self._vertex_ids = unique_keys(self.triangles.ravel())
+        self._vertex_index = SpatialIndex(self.points[self._vertex_ids])
+
+    def _cells(self, points):
+        # type: (np.ndarray) -> np.ndarray
+        return np.floor((points - self._origin) / self.cell_size).astype(np.int64)
+
+    def _keys(self, cells):
+        # type: (np.ndarray) -> np.ndarray
+        return (cells[:, 0] * self._dims[1] + cells[:, 1]) * self._dims[2] + cells[:, 2]
+
+    def _expand_boxes(self, lower_cells, upper_cells):
+        # type: (np.ndarray, np.ndarray) -> Tuple[np.ndarray, np.ndarray]
+        """Return (box ids, cell keys) for every cell of every [lower, upper] cell box."""
+        sizes = upper_cells - lower_cells + 1
+        counts = np.prod(sizes, axis=1)
+        box_ids = np.repeat(np.arange(len(counts)), counts)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        local = np.arange(offsets[-1]) - offsets[box_ids]
+
+        size_y = sizes[box_ids, 1]
+        size_z = sizes[box_ids, 2]
+        cells = lower_cells[box_ids] + np.stack(
+            [local // (size_y * size_z), (local // size_z) % size_y, local % size_z], axis=1
+        )
+        return box_ids, self._keys(cells)
+
+    def closest_points(self, queries):
+        # type: (np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """Return the closest (triangle ids, barycentric coordinates, distances) of every query point."""
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        num_queries = len(queries)
+
+        radii, _ = self._vertex_index.query_nearest(queries, k=1)
+        radii = radii[:, 0] * (1.0 + 1e-9) + 1e-12
+
+        lower_cells = np.clip(self._cells(queries - radii[:, np.newaxis]), 0, self._dims - 1)
+        upper_cells = np.clip(self._cells(queries + radii[:, np.newaxis]), 0, self._dims - 1)
+        cumulative = np.zeros(num_queries + 1, dtype=np.int64)
+        np.cumsum(np.prod(upper_cells - lower_cells + 1, axis=1), out=cumulative[1:])
+
+        triangle_ids = np.full(num_queries, -1, dtype=np.int64)
+        barycentric = np.zeros((num_queries, 3))
+        distances = np.full(num_queries, np.inf)
+
+        start = 0
+        while start < num_queries:
+            stop = int(np.searchsorted(cumulative, cumulative[start] + CHUNK_ELEMENTS, side="right")) - 1
+            stop = min(max(stop, start + 1), num_queries)
+            self._closest_points_chunk(
+                queries, lower_cells, upper_cells, start, stop, triangle_ids, barycentric, distances
+            )
+            start = stop
+
+        return triangle_ids, barycentric, distances
+
+    def _closest_points_chunk(self, queries, lower_cells, upper_cells, start, stop, triangle_ids, barycentric, distances):
+        # type: (np.ndarray, np.ndarray, np.ndarray, int, int, np.ndarray, np.ndarray, np.ndarray) -> None
+        query_ids, keys = self._expand_boxes(lower_cells[start:stop], upper_cells[start:stop])
+        query_ids += start
+
+        starts = np.searchsorted(self._sorted_keys, keys, side="left")
+        stops = np.searchsorted(self._sorted_keys, keys, side="right")
+        candidates = self._triangle_ids[concatenate_ranges(starts, stops)]
+        query_ids = np.repeat(query_ids, stops - starts)
+
+        # a triangle overlapping several cells of the same query is only tested once
+        pair_keys = unique_keys(query_ids * len(self.triangles) + candidates)
+        query_ids, candidates = np.divmod(pair_keys, len(self.triangles))
+        if not len(query_ids):
+            return
+
+        corners = self.points[self.triangles[candidates]]
+        weights = closest_point_on_triangles(queries[query_ids], corners[:, 0], corners[:, 1], corners[:, 2])
+        closest = np.einsum("ij,ijk->ik", weights, corners)
+        pair_distances = np.linalg.norm(closest - queries[query_ids], axis=1)
+
+        order = np.lexsort((pair_distances, query_ids))
+        query_ids = query_ids[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = query_ids[1:] != query_ids[:-1]
+        best = order[first]
+
+        triangle_ids[query_ids[first]] = candidates[best]
+        barycentric[query_ids[first]] = weights[best]
+        distances[query_ids[first]] = pair_distances[best]
+
+    def correspondence(self, queries):
+        # type: (np.ndarray) -> SurfaceCorrespondence
+        triangle_ids, barycentric, distances = self.closest_points(queries)
+        return SurfaceCorrespondence(
+            self.triangles[triangle_ids], barycentric, distances, len(self.points)
+        )
@@ -0,0 +1,51 @@
+from typing import Iterable, List, Optional, Sequence
+import re
+
+import numpy as np
+
+from rigging_toolkit.core.sparse import concatenate_ranges
+
+# a single index, vtx[12], or an inclusive range, vtx[3:9]
+_COMPONENT_PATTERN = re.compile(r"\[(\d+)(?::(\d+))?\]")
+
+
+def index_ranges(indices):
+    # type: (np.ndarray) -> np.ndarray
+    """Split sorted unique indices into (n, 2) inclusive [first, last] runs of consecutive values."""
+    indices = np.asarray(indices, dtype=np.int64).ravel()
+    if not len(indices):
+        return np.zeros((0, 2), dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    firsts = indices[np.concatenate([[0], breaks])]
+    lasts = indices[np.concatenate([breaks - 1, [len(indices) - 1]])]
+    return np.stack([firsts, lasts], axis=1)
+
+
+def encode_components(indices, component_type="vtx"):
+    # type: (Sequence[int], Optional[str]) -> List[str]
+    """
+    Encode indices into the shortest componentList, e.g. [0, 1, 2, 5] -> ["vtx[0:2]", "vtx[5]"].
+
+    The indices are sorted and deduplicated first, so the components are in ascending order.
+    """
+    indices = np.asarray(indices, dtype=np.int64).ravel()
+    if len(indices) > 1 and not np.all(indices[1:] > indices[:-1]):
+        indices = np.unique(indices)
+    return [
+        f"{component_type}[{first}]" if first == last else f"{component_type}[{first}:{last}]"
+        for first, last in index_ranges(indices).tolist()
+    ]
+
+
+def decode_components(components):
+    # type: (Iterable[str]) -> np.ndarray
+    """
+    Decode a componentList, e.g. ["vtx[0:2]", "vtx[5]"] -> [0, 1, 2, 5], keeping the order of the components
+    so the indices stay aligned with the matching point data.
+    """
+    matches = _COMPONENT_PATTERN.findall(" ".join(components or []))
+    if not matches:
+        return np.zeros(0, dtype=np.int64)
+    firsts = np.array([int(first) for first, _ in matches], dtype=np.int64)
+    lasts = np.array([int(last) if last else int(first) for first, last in matches], dtype=np.int64)
+    return concatenate_ranges(firsts, lasts + 1)
@@ -0,0 +1,314 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+
+from rigging_toolkit.core.context import Context
+from rigging_toolkit.core.filesystem import Path, find_file, find_latest
+
+logger = logging.getLogger(__name__)
+
+FULL_SPLIT = "full_split"
+
+# splitting groups of a corrective, the first one containing any of its components wins
+CORRECTIVE_SPLIT_PRIORITY = ["vertical_split", "four_split", "horizontal_split"]
+
+
+def _require(data, key, source):
+    # type: (dict, str, Path) -> Any
+    if not isinstance(data, dict) or key not in data:
+        raise ValueError(f"{source}: missing the key {key!r}")
+    return data[key]
+
+
+def _first_item(data, source):
+    # type: (dict, Path) -> Tuple[str, Any]
+    if not isinstance(data, dict) or not data:
+        raise ValueError(f"{source}: expected a non empty object, got {data!r}")
+    return next(iter(data.items()))
+
+
+@dataclass(frozen=True)
+class SplittingGroup:
+
+    name: str
+    masks: Tuple[str, ...] = field(default=())
+    shapes: Tuple[str, ...] = field(default=())
+
+
+class FaceConfig(object):
+    """
+    Splitting groups of the face shapes, read from the face json:
+    {"...": [{"<group>": [masks], "shapes": ["shp_12_L1", ...]}, ...]}
+
+    The groups of every shape are indexed once so the splitting of a shape is a dict lookup.
+    """
+
+    def __init__(self, groups):
+        # type: (List[SplittingGroup]) -> None
+        self.groups = list(groups)
+        self._groups = {}  # type: Dict[str, SplittingGroup]
+        self._shape_groups = {}  # type: Dict[str, List[SplittingGroup]]
+        for group in self.groups:
+            self._groups.setdefault(group.name, group)
+            for shape in group.shapes:
+                self._shape_groups.setdefault(shape, []).append(group)
+
+    @classmethod
+    def parse(cls, data, source):
+        # type: (dict, Path) -> FaceConfig
+        _, entries = _first_item(data, source)
+        groups = []
+        for entry in entries:
+            name, masks = _first_item(entry, source)
+            groups.append(SplittingGroup(name, tuple(masks or []), tuple(entry.get("shapes", []))))
+        return cls(groups)
+
+    def group(self, name):
+        # type: (str) -> Optional[SplittingGroup]
+        return self._groups.get(name)
+
+    def masks(self, group):
+        # type: (str) -> List[str]
+        return list(self._groups[group].masks) if group in self._groups else []
+
+    def shape_groups(self, shape):
+        # type: (str) -> List[SplittingGroup]
+        """Groups listing the shape, e.g. shp_12_L1"""
+        return list(self._shape_groups.get(shape, []))
+
+    def shape_masks(self, shape):
+        # type: (str) -> Optional[List[str]]
+        """Masks of the first group listing the shape, None if no group does"""
+        groups = self._shape_groups.get(shape)
+        return list(groups[0].masks) if groups else None
+
+    def corrective_splitting_group(self, components):
+        # type: (List[str]) -> str
+        """Splitting group of a corrective from the groups of its base components, full_split if none has one"""
+        names = {group.name for component in components for group in self._shape_groups.get(f"shp_{component}_L1", [])}
+        for name in CORRECTIVE_SPLIT_PRIORITY:
+            if name in names:
+                return name
+        return FULL_SPLIT
+
+
+@dataclass(frozen=True)
+class ShapeConnection:
+
+    target: str
+    control: str
+    axis: str
+    neutral_value: float
+    driver_value: float
+
+
+@dataclass(frozen=True)
+class JointConnection:
+
+    joint: str
+    joint_axis: str
+    control: str
+    axis: str
+    neutral_value: float
+    driver_value: float
+    neutral_joint_value: float
+    driver_joint_value: float
+
+
+@dataclass(frozen=True)
+class UISetup:
+
+    shape_connections: Tuple[ShapeConnection, ...] = field(default=())
+    joint_connections: Tuple[JointConnection, ...] = field(default=())
+
+    @classmethod
+    def parse(cls, data, source):
+        # type: (dict, Path) -> UISetup
+        shape_connections = []
+        for connection in _require(data, "shape_connections", source):
+            for target, values in connection.items():
+                shape_connections.append(ShapeConnection(
+                    target,
+                    _require(values, "control", source),
+                    _require(values, "axis", source),
+                    float(_require(values, "neutral_value", source)),
+                    float(_require(values, "driver_value", source)),
+                ))
+        joint_connections = []
+        for connection in _require(data, "joint_connections", source):
+            for joint, values in connection.items():
+                joint_connections.append(JointConnection(
+                    joint,
+                    _require(values, "jnt_axis", source),
+                    _require(values, "control", source),
+                    _require(values, "axis", source),
+                    float(_require(values, "neutral_value", source)),
+                    float(_require(values, "driver_value", source)),
+                    float(_require(values, "neutral_jnt_value", source)),
+                    float(_require(values, "driver_jnt_value", source)),
+                ))
+        return cls(tuple(shape_connections), tuple(joint_connections))
+
+
+@dataclass(frozen=True)
+class EyebrowSetup:
+
+    mesh: str
+    vertices: Tuple[str, ...] = field(default=())
+
+    @classmethod
+    def parse(cls, data, source):
+        # type: (dict, Path) -> EyebrowSetup
+        _, values = _first_item(data, source)
+        return cls(_require(values, "mesh", source), tuple(_require(values, "vertices", source)))
+
+
+@dataclass(frozen=True)
+class EyeSetup:
+
+    side: str
+    name: str
+    eye_mesh: Any
+    upper_lid_vertices: Tuple[str, ...] = field(default=())
+    lower_lid_vertices: Tuple[str, ...] = field(default=())
+    parent_jnt: Optional[str] = None
+    parent_ctrl: Optional[str] = None
+    parent_grp: Optional[str] = None
+
+    @classmethod
+    def parse_all(cls, data, source):
+        # type: (dict, Path) -> List[EyeSetup]
+        if not isinstance(data, dict):
+            raise ValueError(f"{source}: expected an object of eyes by side")
+        return [
+            cls(
+                side,
+                _require(values, "name", source),
+                _require(values, "eye_mesh", source),
+                tuple(_require(values, "upper_lid_vertices", source)),
+                tuple(_require(values, "lower_lid_vertices", source)),
+                values.get("parent_jnt") or None,
+                values.get("parent_ctrl") or None,
+                values.get("parent_grp") or None,
+            )
+            for side, values in data.items()
+        ]
+
+
+@dataclass(frozen=True)
+class ShaderSetup:
+
+    assignments: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def shaders(self):
+        # type: () -> List[str]
+        return list(self.assignments)
+
+    @classmethod
+    def parse(cls, data, source):
+        # type: (dict, Path) -> ShaderSetup
+        if not isinstance(data, dict):
+            raise ValueError(f"{source}: expected an object of meshes by shader")
+        return cls({shader: list(meshes or []) for shader, meshes in data.items()})
+
+
+def _mtime(path):
+    # type: (Path) -> Optional[int]
+    try:
+        return os.stat(str(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ConfigStore(object):
+    """
+    The json configs of a context, resolved and parsed once into typed objects.
+
+    The latest version of a config is resolved again only when the modification time of its
+    folder changes, i.e. a file was added or removed, and parsed again only when the
+    modification time of the file changes, so the build can ask for a config for every shape.
+    Use ConfigStore.of(context) to share the store of a context.
+    """
+
+    _stores = {}  # type: Dict[Context, ConfigStore]
+
+    def __init__(self, context):
+        # type: (Context) -> None
+        self.context = context
+        # name -> (folder mtime, resolved path)
+        self._paths = {}  # type: Dict[str, Tuple[Optional[int], Optional[Path]]]
+        # name -> (path, file mtime, parsed config)
+        self._configs = {}  # type: Dict[str, Tuple[Path, Optional[int], Any]]
+
+    @classmethod
+    def of(cls, context):
+        # type: (Context) -> ConfigStore
+        if context not in cls._stores:
+            cls._stores[context] = cls(context)
+        return cls._stores[context]
+
+    def invalidate(self):
+        # type: () -> None
+        self._paths.clear()
+        self._configs.clear()
+
+    def _resolve(self, name, folder, resolver):
+        # type: (str, Path, Callable[[Path], Optional[Path]]) -> Optional[Path]
+        folder_mtime = _mtime(folder) if folder is not None else None
+        cached = self._paths.get(name)
+        if cached is None or cached[0] != folder_mtime:
+            path = resolver(folder) if folder_mtime is not None else None
+            cached = self._paths[name] = (folder_mtime, path)
+        return cached[1]
+
+    def _load(self, name, folder, resolver, parser):
+        # type: (str, Path, Callable[[Path], Optional[Path]], Callable[[Any, Path], Any]) -> Any
+        path = self._resolve(name, folder, resolver)
+        if path is None:
+            logger.warning(f"No {name} config found in {folder}")
+            return None
+        mtime = _mtime(path)
+        cached = self._configs.get(name)
+        if cached is None or cached[0] != path or cached[1] != mtime:
+            with open(str(path), "r") as f:
+                data = json.load(f)
+            cached = self._configs[name] = (path, mtime, parser(data, path))
+            logger.debug(f"Loaded the {name} config from {path}")
+        return cached[2]
+
+    def _load_latest(self, name, folder, versioned_name, parser):
+        # type: (str, Path, str, Callable[[Any, Path], Any]) -> Any
+        return self._load(name, folder, lambda f: find_latest(f, versioned_name, "json")[0], parser)
+
+    @property
+    def _data_path(self):
+        # type: () -> Path
+        return self.context.rigs_path / "data"
+
+    def face(self):
+        # type: () -> Optional[FaceConfig]
+        return self._load_latest("face", self._data_path, "face", FaceConfig.parse)
+
+    def ui_setup(self):
+        # type: () -> Optional[UISetup]
+        return self._load_latest("ui_setup", self._data_path, "ui_setup", UISetup.parse)
+
+    def eyebrows(self):
+        # type: () -> Optional[EyebrowSetup]
+        return self._load_latest("eyebrow_data", self._data_path, "eyebrow_data", EyebrowSetup.parse)
+
+    def eyes(self):
+        # type: () -> Optional[List[EyeSetup]]
+        return self._load_latest("eye_rig", self._data_path, "eye_rig", EyeSetup.parse_all)
+
+    def shaders(self):
+        # type: () -> Optional[ShaderSetup]
+        return self._load(
+            "setup_shaders",
+            self.context.config_path,
+            lambda f: find_file(f, "setup_shaders", "json"),
+            ShaderSetup.parse,
+        )
@@ -0,0 +1,92 @@
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from rigging_toolkit.core.skinning import blend_matrices, CHUNK_ELEMENTS
+from rigging_toolkit.core.sparse import CSRMatrix
+
+# offsets shorter than this are dropped from the sparse correctives
+OFFSET_TOLERANCE = 1e-5
+
+# relative determinant under which a vertex transform is treated as singular, e.g. an unweighted vertex
+SINGULAR_TOLERANCE = 1e-12
+
+
+def solve_corrective_offsets(transforms, base_points, sculpted_points):
+    # type: (np.ndarray, np.ndarray, np.ndarray) -> np.ndarray
+    """
+    Solve the offsets to add to the base points, before deformation, so that the deformed
+    points match the sculpted points. All the leading dimensions broadcast.
+
+    transforms holds the (..., V, 4, 3) row vector transform of every vertex, a point is deformed as
+    p * transform[:3] + transform[3]. The per vertex 3x3 systems are solved in one batch, singular
+    transforms fall back to the least squares solution.
+    """
+    transforms = np.asarray(transforms, dtype=np.float64)
+    base_points = np.asarray(base_points, dtype=np.float64)
+    sculpted_points = np.asarray(sculpted_points, dtype=np.float64)
+
+    linear = transforms[..., :3, :]
+    deformed = np.einsum("...vi,...vij->...vj", base_points, linear) + transforms[..., 3, :]
+    residuals = sculpted_points - deformed
+
+    # offset * linear = residual, solved as linear^T * offset^T = residual^T
+    systems, residuals = np.broadcast_arrays(np.swapaxes(linear, -1, -2), residuals[..., np.newaxis])
+    scales = np.abs(systems).max(axis=(-1, -2)) ** 3
+    singular = np.abs(np.linalg.det(systems)) <= SINGULAR_TOLERANCE * scales
+    singular |= scales == 0.0
+
+    offsets = np.empty(residuals.shape[:-1])
+    regular = ~singular
+    if regular.any():
+        offsets[regular] = np.linalg.solve(systems[regular], residuals[regular])[..., 0]
+    if singular.any():
+        offsets[singular] = np.matmul(np.linalg.pinv(systems[singular]), residuals[singular])[..., 0]
+    return offsets
+
+
+def corrective_offsets(base_points, sculpted_points, matrices, weights):
+    # type: (np.ndarray, np.ndarray, np.ndarray, Union[np.ndarray, CSRMatrix]) -> np.ndarray
+    """
+    Extract the pre-skinning offsets of many correctives at once, the numpy equivalent of invertShape
+    for a linear blend skinned mesh.
+
+    base_points are the (V, 3) or (C, V, 3) points going into the skinCluster, sculpted_points the
+    (C, V, 3) sculpted deformed points and matrices the (C, J, 4, 4) skinning matrices of the pose
+    of every corrective, or (J, 4, 4) when they share a pose, see skinning.skinning_matrices.
+    Returns the (C, V, 3) offsets, chunked over vertices to bound the memory.
+    """
+    sculpted_points = np.asarray(sculpted_points, dtype=np.float64)
+    if sculpted_points.ndim == 2:
+        sculpted_points = sculpted_points[np.newaxis]
+    base_points = np.asarray(base_points, dtype=np.float64)
+    matrices = np.asarray(matrices, dtype=np.float64)
+    if matrices.ndim == 3:
+        matrices = matrices[np.newaxis]
+
+    num_correctives, num_vertices = sculpted_points.shape[:2]
+    num_joints = matrices.shape[1]
+
+    offsets = np.empty((num_correctives, num_vertices, 3))
+    chunk_size = max(CHUNK_ELEMENTS // max(num_correctives * max(num_joints, 12), 1), 1)
+    for start in range(0, num_vertices, chunk_size):
+        stop = min(start + chunk_size, num_vertices)
+        transforms = blend_matrices(matrices, weights, start, stop)
+        offsets[:, start:stop] = solve_corrective_offsets(
+            transforms, base_points[..., start:stop, :], sculpted_points[:, start:stop]
+        )
+    return offsets
+
+
+def sparse_offsets(offsets, tolerance=OFFSET_TOLERANCE):
+    # type: (np.ndarray, float) -> List[Tuple[np.ndarray, np.ndarray]]
+    """Split (C, V, 3) offsets into the (vertex ids, offsets) of every corrective, dropping the short ones."""
+    offsets = np.asarray(offsets, dtype=np.float64)
+    if offsets.ndim == 2:
+        offsets = offsets[np.newaxis]
+
+    result = []
+    for corrective in offsets:
+        vertex_ids = np.flatnonzero(np.linalg.norm(corrective, axis=1) > tolerance)
+        result.append((vertex_ids, corrective[vertex_ids]))
+    return result
@@ -0,0 +1,470 @@
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+
+from rigging_toolkit.core.sparse import CSRMatrix, concatenate_ranges, unique_keys
+
+if TYPE_CHECKING:
+    from rigging_toolkit.core.filesystem import Path
+
+NameKey = Union[str, int, slice, Sequence[str], Sequence[int]]
+
+
+def _name_index(names):
+    # type: (Sequence[str]) -> dict
+    return {name: i for i, name in enumerate(names)}
+
+
+def _resolve_rows(names, index, key):
+    # type: (List[str], dict, NameKey) -> np.ndarray
+    """Row ids of a name, a position, a slice or a list of either."""
+    if isinstance(key, slice):
+        return np.arange(len(names))[key]
+    if isinstance(key, (str, int, np.integer)):
+        key = [key]
+    rows = []
+    for item in key:
+        if isinstance(item, str):
+            if item not in index:
+                raise KeyError(f"{item} is not in the stack")
+            rows.append(index[item])
+        else:
+            rows.append(int(item))
+    return np.array(rows, dtype=np.int64)
+
+
+class WeightMapStack(object):
+    """
+    Per vertex weights of T targets as one (T, V) float32 array, named by target.
+
+    Built from anything with a name and values, e.g. WeightMap objects.
+    """
+
+    def __init__(self, names, values):
+        # type: (Sequence[str], np.ndarray) -> None
+        self.names = list(names)
+        self.values = np.asarray(values, dtype=np.float32).reshape(len(self.names), -1)
+        self._index = _name_index(self.names)
+
+    @classmethod
+    def from_weight_maps(cls, weight_maps):
+        # type: (Iterable[Any]) -> WeightMapStack
+        weight_maps = list(weight_maps)
+        if not weight_maps:
+            return cls([], np.zeros((0, 0)))
+        return cls([w.name for w in weight_maps], np.stack([np.asarray(w.values, dtype=np.float32) for w in weight_maps]))
+
+    def to_weight_maps(self, weight_map_type):
+        # type: (Callable) -> List[Any]
+        """Build a weight_map_type(name, values) per target, e.g. WeightMap."""
+        return [weight_map_type(name, values.tolist()) for name, values in zip(self.names, self.values)]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.names)
+
+    def __contains__(self, name):
+        # type: (str) -> bool
+        return name in self._index
+
+    def __getitem__(self, key):
+        # type: (NameKey) -> WeightMapStack
+        rows = _resolve_rows(self.names, self._index, key)
+        return WeightMapStack([self.names[i] for i in rows], self.values[rows])
+
+    @property
+    def vertex_count(self):
+        # type: () -> int
+        return self.values.shape[1]
+
+    def weights(self, name):
+        # type: (str) -> np.ndarray
+        return self.values[self._index[name]]
+
+    def is_default(self):
+        # type: () -> np.ndarray
+        """(T,) mask of the maps with every weight at 1.0, which don't affect their target."""
+        return np.all(self.values == 1.0, axis=1)
+
+    def inverse(self):
+        # type: () -> WeightMapStack
+        return WeightMapStack([f"{name}_inverse" for name in self.names], 1.0 - self.values)
+
+    def normalized(self):
+        # type: () -> WeightMapStack
+        """Scale the weights of every vertex to sum to 1.0 over the maps, vertices summing to 0 are left as is."""
+        sums = self.values.sum(axis=0, dtype=np.float64)
+        sums[sums == 0.0] = 1.0
+        return WeightMapStack([f"{name}_normalized" for name in self.names], self.values / sums)
+
+    def aligned(self, names, default=1.0):
+        # type: (Sequence[str], Optional[float]) -> np.ndarray
+        """(len(names), V) weights in the order of names, missing names get the default weight."""
+        result = np.full((len(names), self.vertex_count), default, dtype=np.float32)
+        for row, name in enumerate(names):
+            if name in self._index:
+                result[row] = self.values[self._index[name]]
+        return result
+
+
+class DeltaStack(object):
+    """
+    Sparse offsets of T targets, in CSR layout: the vertex ids of target t are
+    indices[indptr[t]:indptr[t + 1]], sorted, with their (n, 3) float32 offsets.
+
+    Equivalent to a (T, 3V) sparse matrix where every stored vertex fills 3 columns,
+    so statistics and edits of all the targets of a rig are a few array operations.
+    Built from anything with a name, indices and deltas, e.g. Delta objects.
+
+    When the targets move about the same number of vertices, to_padded and from_padded convert
+    to and from rectangular (T, K) arrays that can be indexed per target without indptr.
+    """
+
+    PAD_INDEX = -1
+
+    def __init__(self, names, indptr, indices, offsets, vertex_count):
+        # type: (Sequence[str], np.ndarray, np.ndarray, np.ndarray, int) -> None
+        self.names = list(names)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.float32).reshape(-1, 3)
+        self.vertex_count = int(vertex_count)
+        self._index = _name_index(self.names)
+
+    @classmethod
+    def from_deltas(cls, deltas, vertex_count=None):
+        # type: (Iterable[Any], Optional[int]) -> DeltaStack
+        deltas = list(deltas)
+        names = [d.name for d in deltas]
+        indices = [np.asarray(d.indices, dtype=np.int64).ravel() for d in deltas]
+        offsets = [np.asarray(d.deltas, dtype=np.float32).reshape(-1, 3) for d in deltas]
+        return cls.from_arrays(names, indices, offsets, vertex_count=vertex_count)
+
+    @classmethod
+    def from_arrays(cls, names, indices, offsets, vertex_count=None):
+        # type: (Sequence[str], Sequence[np.ndarray], Sequence[np.ndarray], Optional[int]) -> DeltaStack
+        """Build a stack from the (indices, offsets) of every target, the indices are sorted if needed."""
+        lengths = np.array([len(i) for i in indices], dtype=np.int64)
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        flat_indices = np.concatenate(indices).astype(np.int64) if len(indices) else np.zeros(0, dtype=np.int64)
+        flat_offsets = np.concatenate(offsets) if len(offsets) else np.zeros((0, 3), dtype=np.float32)
+
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        keys = rows * (int(flat_indices.max()) + 1 if len(flat_indices) else 1) + flat_indices
+        if len(keys) > 1 and not np.all(keys[1:] > keys[:-1]):
+            order = np.argsort(keys, kind="stable")
+            flat_indices, flat_offsets = flat_indices[order], flat_offsets[order]
+
+        if vertex_count is None:
+            vertex_count = int(flat_indices.max()) + 1 if len(flat_indices) else 0
+        return cls(names, indptr, flat_indices, flat_offsets, vertex_count)
+
+    @classmethod
+    def from_dense(cls, names, offsets, tolerance=0.0):
+        # type: (Sequence[str], np.ndarray, Optional[float]) -> DeltaStack
+        """Build a stack from (T, V, 3) offsets, keeping the vertices that move more than tolerance."""
+        offsets = np.asarray(offsets, dtype=np.float32)
+        rows, vertex_ids = np.nonzero(np.linalg.norm(offsets, axis=2) > tolerance)
+        indptr = np.zeros(len(offsets) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(offsets)), out=indptr[1:])
+        return cls(names, indptr, vertex_ids, offsets[rows, vertex_ids], offsets.shape[1])
+
+    @classmethod
+    def from_padded(cls, names, indices, offsets, vertex_count):
+        # type: (Sequence[str], np.ndarray, np.ndarray, int) -> DeltaStack
+        """Build a stack from (T, K) vertex ids padded with PAD_INDEX and their (T, K, 3) offsets."""
+        indices = np.asarray(indices, dtype=np.int64).reshape(len(names), -1 if len(names) else 0)
+        offsets = np.asarray(offsets, dtype=np.float32).reshape(indices.shape + (3,))
+        stored = indices != cls.PAD_INDEX
+        return cls.from_arrays(
+            names,
+            [row[mask] for row, mask in zip(indices, stored)],
+            [row[mask] for row, mask in zip(offsets, stored)],
+            vertex_count=vertex_count,
+        )
+
+    @classmethod
+    def concatenate(cls, stacks, vertex_count=None):
+        # type: (Sequence[DeltaStack], Optional[int]) -> DeltaStack
+        """The targets of all the stacks, in order, in one stack."""
+        stacks = list(stacks)
+        if vertex_count is None:
+            vertex_count = stacks[0].vertex_count if stacks else 0
+        if any(stack.vertex_count != vertex_count for stack in stacks):
+            raise ValueError("Can't concatenate stacks with different vertex counts")
+        indptr = np.zeros(sum(len(stack) for stack in stacks) + 1, dtype=np.int64)
+        np.cumsum(np.concatenate([stack.row_lengths for stack in stacks] or [[]]), out=indptr[1:])
+        return cls(
+            [name for stack in stacks for name in stack.names],
+            indptr,
+            np.concatenate([stack.indices for stack in stacks] or [np.zeros(0, dtype=np.int32)]),
+            np.concatenate([stack.offsets for stack in stacks] or [np.zeros((0, 3), dtype=np.float32)]),
+            vertex_count,
+        )
+
+    @classmethod
+    def load(cls, path):
+        # type: (Union[str, Path]) -> DeltaStack
+        """Read a stack written by save."""
+        with np.load(str(path), allow_pickle=False) as data:
+            return cls(
+                data["names"].tolist(), data["indptr"], data["indices"], data["offsets"], int(data["vertex_count"])
+            )
+
+    def save(self, path):
+        # type: (Union[str, Path]) -> None
+        """Write the stack to a compressed .npz file."""
+        with open(str(path), "wb") as f:
+            np.savez_compressed(
+                f,
+                names=np.array(self.names, dtype=str),
+                indptr=self.indptr,
+                indices=self.indices,
+                offsets=self.offsets,
+                vertex_count=np.array(self.vertex_count),
+            )
+
+    def to_dense(self):
+        # type: () -> np.ndarray
+        """(T, V, 3) offsets of every target."""
+        dense = np.zeros((len(self), self.vertex_count, 3), dtype=np.float32)
+        dense[self.row_ids(), self.indices] = self.offsets
+        return dense
+
+    def to_padded(self):
+        # type: () -> Tuple[np.ndarray, np.ndarray]
+        """
+        (T, K) vertex ids padded with PAD_INDEX and their (T, K, 3) offsets padded with zeros,
+        K being the largest number of offsets of a target.
+        """
+        lengths = self.row_lengths
+        width = int(lengths.max()) if len(lengths) else 0
+        columns = np.arange(self.nnz) - np.repeat(self.indptr[:-1], lengths)
+        indices = np.full((len(self), width), self.PAD_INDEX, dtype=np.int32)
+        offsets = np.zeros((len(self), width, 3), dtype=np.float32)
+        indices[self.row_ids(), columns] = self.indices
+        offsets[self.row_ids(), columns] = self.offsets
+        return indices, offsets
+
+    def padding_ratio(self):
+        # type: () -> float
+        """Fraction of the padded arrays that would be padding, 0.0 when every target has as many offsets."""
+        lengths = self.row_lengths
+        size = len(self) * (int(lengths.max()) if len(lengths) else 0)
+        return 1.0 - self.nnz / size if size else 0.0
+
+    def to_deltas(self, delta_type):
+        # type: (Callable) -> List[Any]
+        """Build a delta_type(name, indices, offsets) per target, e.g. Delta."""
+        return [delta_type(name, indices, offsets) for name, indices, offsets in self.targets()]
+
+    def targets(self):
+        # type: () -> Iterator[Tuple[str, np.ndarray, np.ndarray]]
+        for row, name in enumerate(self.names):
+            lo, hi = self.indptr[row], self.indptr[row + 1]
+            yield name, self.indices[lo:hi], self.offsets[lo:hi]
+
+    def renamed(self, names):
+        # type: (Sequence[str]) -> DeltaStack
+        """The same targets under new names."""
+        if len(names) != len(self):
+            raise ValueError(f"Got {len(names)} names for {len(self)} targets")
+        return DeltaStack(names, self.indptr, self.indices, self.offsets, self.vertex_count)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.names)
+
+    def __contains__(self, name):
+        # type: (str) -> bool
+        return name in self._index
+
+    def __getitem__(self, key):
+        # type: (NameKey) -> DeltaStack
+        """Sub stack of the given names, positions or slice, in that order."""
+        rows = _resolve_rows(self.names, self._index, key)
+        starts, stops = self.indptr[rows], self.indptr[rows + 1]
+        positions = concatenate_ranges(starts, stops)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(stops - starts, out=indptr[1:])
+        return DeltaStack(
+            [self.names[i] for i in rows], indptr, self.indices[positions], self.offsets[positions], self.vertex_count
+        )
+
+    @property
+    def nnz(self):
+        # type: () -> int
+        return len(self.indices)
+
+    @property
+    def row_lengths(self):
+        # type: () -> np.ndarray
+        return np.diff(self.indptr)
+
+    def row_ids(self):
+        # type: () -> np.ndarray
+        """Target index of every stored offset."""
+        return np.repeat(np.arange(len(self)), self.row_lengths)
+
+    @property
+    def matrix(self):
+        # type: () -> CSRMatrix
+        """The stack as a (T, 3V) CSRMatrix, x, y and z of vertex v are the columns 3v, 3v + 1 and 3v + 2."""
+        columns = (self.indices.astype(np.int64)[:, np.newaxis] * 3 + np.arange(3)).ravel()
+        return CSRMatrix(self.indptr * 3, columns, self.offsets.ravel(), (len(self), self.vertex_count * 3))
+
+    def lengths(self):
+        # type: () -> np.ndarray
+        """Length of every stored offset."""
+        return np.linalg.norm(self.offsets, axis=1)
+
+    def _reduce(self, values, ufunc, empty):
+        # type: (np.ndarray, np.ufunc, float) -> np.ndarray
+        result = np.full((len(self),) + values.shape[1:], empty, dtype=values.dtype)
+        non_empty = np.flatnonzero(self.row_lengths)
+        if len(non_empty):
+            result[non_empty] = ufunc.reduceat(values, self.indptr[non_empty], axis=0)
+        return result
+
+    def norms(self):
+        # type: () -> np.ndarray
+        """(T,) frobenius norm of every target."""
+        return np.sqrt(self._reduce(np.einsum("ij,ij->i", self.offsets, self.offsets, dtype=np.float64), np.add, 0.0))
+
+    def max_lengths(self):
+        # type: () -> np.ndarray
+        """(T,) length of the largest offset of every target."""
+        return self._reduce(self.lengths(), np.maximum, 0.0)
+
+    def active_counts(self, tolerance=0.0):
+        # type: (Optional[float]) -> np.ndarray
+        """(T,) number of vertices moving more than tolerance in every target."""
+        return np.bincount(self.row_ids()[self.lengths() > tolerance], minlength=len(self))
+
+    def bounds(self, points, tolerance=0.0):
+        # type: (np.ndarray, Optional[float]) -> Tuple[np.ndarray, np.ndarray]
+        """
+        (T, 3) lower and upper corners of the region of the (V, 3) points moved by every target,
+        only counting offsets longer than tolerance. Targets moving nothing get nan corners.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        active = self.compressed(tolerance)
+        positions = points[active.indices]
+        lower = active._reduce(positions, np.minimum, np.nan)
+        upper = active._reduce(positions, np.maximum, np.nan)
+        return lower, upper
+
+    def compressed(self, tolerance=0.0):
+        # type: (Optional[float]) -> DeltaStack
+        """Drop the offsets not longer than tolerance."""
+        keep = self.lengths() > tolerance
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.row_ids()[keep], minlength=len(self)), out=indptr[1:])
+        return DeltaStack(self.names, indptr, self.indices[keep], self.offsets[keep], self.vertex_count)
+
+    def scaled(self, scales):
+        # type: (Union[float, np.ndarray]) -> DeltaStack
+        """Multiply every target by a scalar or by its entry of a (T,) array."""
+        scales = np.asarray(scales, dtype=np.float32)
+        if scales.ndim:
+            scales = np.repeat(scales, self.row_lengths)[:, np.newaxis]
+        return DeltaStack(self.names, self.indptr, self.indices, self.offsets * scales, self.vertex_count)
+
+    def masked(self, weights):
+        # type: (Union[WeightMapStack, np.ndarray]) -> DeltaStack
+        """
+        Multiply every offset by the weight of its vertex.
+
+        weights is a WeightMapStack matched by target name, targets without a map are unchanged,
+        a (V,) array applied to every target or a (T, V) array in the order of the stack.
+        """
+        if isinstance(weights, WeightMapStack):
+            weights = weights.aligned(self.names)
+        weights = np.asarray(weights, dtype=np.float32)
+        if weights.ndim == 1:
+            factors = weights[self.indices]
+        else:
+            factors = weights[self.row_ids(), self.indices]
+        offsets = self.offsets * factors[:, np.newaxis]
+        return DeltaStack(self.names, self.indptr, self.indices, offsets, self.vertex_count)
+
+    def split(self, masks, pairs=None, names=None, tolerance=0.0):
+        # type: (WeightMapStack, Optional[Sequence[Tuple[NameKey, NameKey]]], Optional[Sequence[str]], Optional[float]) -> DeltaStack
+        """
+        Split targets by masks, every (target, mask) pair is a target of the result holding mask * offsets.
+
+        pairs defaults to every target by every mask, target major, and names to "{target}_{mask}".
+        All the pairs are computed in one broadcast, the offsets not longer than tolerance are dropped.
+        """
+        if masks.vertex_count != self.vertex_count:
+            raise ValueError(f"The masks have {masks.vertex_count} vertices, the targets have {self.vertex_count}")
+        if pairs is None:
+            target_rows = np.repeat(np.arange(len(self)), len(masks))
+            mask_rows = np.tile(np.arange(len(masks)), len(self))
+        else:
+            pairs = list(pairs)
+            target_rows = _resolve_rows(self.names, self._index, [target for target, _ in pairs])
+            mask_rows = _resolve_rows(masks.names, _name_index(masks.names), [mask for _, mask in pairs])
+        if names is None:
+            names = [f"{self.names[t]}_{masks.names[m]}" for t, m in zip(target_rows.tolist(), mask_rows.tolist())]
+        elif len(names) != len(target_rows):
+            raise ValueError(f"Got {len(names)} names for {len(target_rows)} splits")
+
+        starts, stops = self.indptr[target_rows], self.indptr[target_rows + 1]
+        positions = concatenate_ranges(starts, stops)
+        indices = self.indices[positions]
+        factors = masks.values[np.repeat(mask_rows, stops - starts), indices]
+
+        # the split length is |factor| * length, test it before gathering the offsets
+        keep = np.abs(factors) * self.lengths()[positions] > tolerance
+        kept = np.zeros(len(keep) + 1, dtype=np.int64)
+        np.cumsum(keep, out=kept[1:])
+        indptr = np.zeros(len(target_rows) + 1, dtype=np.int64)
+        np.cumsum(stops - starts, out=indptr[1:])
+        positions, factors = positions[keep], factors[keep]
+        offsets = self.offsets[positions] * factors[:, np.newaxis]
+        return DeltaStack(names, kept[indptr], indices[keep], offsets, self.vertex_count)
+
+    def combine(self, coefficients):
+        # type: (np.ndarray) -> np.ndarray
+        """
+        Linear combinations of the targets, (T,) coefficients give the (V, 3) sum of the weighted targets
+        and (K, T) coefficients the (K, V, 3) result of every row.
+        """
+        coefficients = np.asarray(coefficients, dtype=np.float64)
+        squeeze = coefficients.ndim == 1
+        coefficients = coefficients.reshape(-1, len(self))
+        result = self.matrix.transpose().dot(coefficients.T).T.reshape(len(coefficients), self.vertex_count, 3)
+        return result[0] if squeeze else result
+
+    def sparse_combine(self, coefficients, names, tolerance=0.0):
+        # type: (CSRMatrix, Sequence[str], Optional[float]) -> DeltaStack
+        """
+        Linear combinations of the targets as a new stack, target k is the sum of coefficients[k, t] * target t
+        for the (K, T) sparse coefficients. Only the vertices moved by the combined targets are visited,
+        the offsets not longer than tolerance are dropped.
+        """
+        if coefficients.shape[1] != len(self):
+            raise ValueError(f"Expected coefficients for {len(self)} targets, got {coefficients.shape[1]}")
+        if len(names) != coefficients.shape[0]:
+            raise ValueError(f"Got {len(names)} names for {coefficients.shape[0]} combinations")
+        starts, stops = self.indptr[coefficients.indices], self.indptr[coefficients.indices + 1]
+        positions = concatenate_ranges(starts, stops)
+        rows = np.repeat(coefficients.row_ids(), stops - starts)
+        factors = np.repeat(np.asarray(coefficients.data, dtype=np.float64), stops - starts)
+
+        # sum the terms landing on the same (combination, vertex)
+        keys = rows * max(self.vertex_count, 1) + self.indices[positions]
+        unique = unique_keys(keys)
+        slots = np.searchsorted(unique, keys)
+        weighted = self.offsets[positions] * factors[:, np.newaxis]
+        offsets = np.stack(
+            [np.bincount(slots, weights=weighted[:, axis], minlength=len(unique)) for axis in range(3)], axis=1
+        )
+
+        combination_ids = unique // max(self.vertex_count, 1)
+        indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(combination_ids, minlength=len(names)), out=indptr[1:])
+        combined = DeltaStack(names, indptr, unique % max(self.vertex_count, 1), offsets, self.vertex_count)
+        return combined.compressed(tolerance)
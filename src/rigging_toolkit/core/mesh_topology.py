@@ -0,0 +1,152 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from rigging_toolkit.core.sparse import CSRMatrix
+from rigging_toolkit.core.spatial import SpatialIndex
+
+
+class MeshTopology(object):
+    """
+    Polygon topology and point positions of a mesh as flat arrays.
+
+    counts holds the number of vertices of each face and connects the face vertex ids,
+    which is the layout returned by MFnMesh.getVertices.
+    """
+
+    def __init__(self, counts, connects, points):
+        # type: (np.ndarray, np.ndarray, np.ndarray) -> None
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.connects = np.asarray(connects, dtype=np.int64)
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self._adjacency = {}  # type: dict
+        self._spatial_index = None  # type: Optional[SpatialIndex]
+
+    @property
+    def num_vertices(self):
+        # type: () -> int
+        return len(self.points)
+
+    @property
+    def num_faces(self):
+        # type: () -> int
+        return len(self.counts)
+
+    @property
+    def face_offsets(self):
+        # type: () -> np.ndarray
+        offsets = np.zeros(self.num_faces + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=offsets[1:])
+        return offsets
+
+    def spatial_index(self, cell_size=None):
+        # type: (Optional[float]) -> SpatialIndex
+        """Spatial index over the points, rebuilt only when a different cell_size is asked for."""
+        if self._spatial_index is None or (cell_size is not None and cell_size != self._spatial_index.cell_size):
+            self._spatial_index = SpatialIndex(self.points, cell_size=cell_size)
+        return self._spatial_index
+
+    def face_ids(self):
+        # type: () -> np.ndarray
+        """Face id of every entry in connects."""
+        return np.repeat(np.arange(self.num_faces), self.counts)
+
+    def edges(self):
+        # type: () -> Tuple[np.ndarray, np.ndarray]
+        """Return the (start, end) vertex ids of every face edge, shared edges appear twice."""
+        offsets = self.face_offsets
+        face_ids = self.face_ids()
+        local = np.arange(len(self.connects)) - offsets[face_ids]
+        following = offsets[face_ids] + (local + 1) % self.counts[face_ids]
+        return self.connects, self.connects[following]
+
+    def triangles(self):
+        # type: () -> np.ndarray
+        """(num_triangles, 3) vertex ids of the fan triangulation of every face."""
+        offsets = self.face_offsets
+        num_triangles = np.maximum(self.counts - 2, 0)
+        face_ids = np.repeat(np.arange(self.num_faces), num_triangles)
+        triangle_offsets = np.zeros(self.num_faces + 1, dtype=np.int64)
+        np.cumsum(num_triangles, out=triangle_offsets[1:])
+        local = np.arange(triangle_offsets[-1]) - triangle_offsets[face_ids] + 1
+
+        first = self.connects[offsets[face_ids]]
+        second = self.connects[offsets[face_ids] + local]
+        third = self.connects[offsets[face_ids] + local + 1]
+        return np.stack([first, second, third], axis=1)
+
+    def vertex_face_matrix(self):
+        # type: () -> CSRMatrix
+        """(num_vertices, num_faces) incidence matrix."""
+        return CSRMatrix.from_coo(
+            self.connects, self.face_ids(), None, (self.num_vertices, self.num_faces), sum_duplicates=False
+        )
+
+    def vertex_adjacency(self, use_faces=True):
+        # type: (Optional[bool]) -> CSRMatrix
+        """
+        Vertex adjacency pattern including the vertices themselves.
+
+        With use_faces every vertex sharing a face is a neighbour, otherwise only
+        the vertices sharing an edge are.
+        """
+        if use_faces in self._adjacency:
+            return self._adjacency[use_faces]
+
+        if use_faces:
+            incidence = self.vertex_face_matrix()
+            adjacency = incidence.pattern_dot(incidence.transpose())
+        else:
+            start, end = self.edges()
+            identity = np.arange(self.num_vertices)
+            rows = np.concatenate([start, end, identity])
+            cols = np.concatenate([end, start, identity])
+            adjacency = CSRMatrix.from_coo(rows, cols, None, (self.num_vertices, self.num_vertices))
+            adjacency.data[:] = 1.0
+
+        self._adjacency[use_faces] = adjacency
+        return adjacency
+
+    def k_ring(self, depth=1, use_faces=True):
+        # type: (Optional[int], Optional[bool]) -> CSRMatrix
+        """Pattern of every vertex within depth rings of each vertex, including itself."""
+        adjacency = self.vertex_adjacency(use_faces=use_faces)
+        ring = CSRMatrix.identity(self.num_vertices)
+        for _ in range(depth):
+            ring = ring.pattern_dot(adjacency)
+        return ring
+
+    def overlap_matrix(self, distance_threshold=0.1):
+        # type: (Optional[float]) -> CSRMatrix
+        """Pattern of the vertices lying within distance_threshold of each vertex, including itself."""
+        if distance_threshold > 0 and self.num_vertices:
+            first, second = self.spatial_index(cell_size=distance_threshold).query_pairs(distance_threshold)
+        else:
+            first, second = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        identity = np.arange(self.num_vertices)
+        rows = np.concatenate([first, second, identity])
+        cols = np.concatenate([second, first, identity])
+        overlap = CSRMatrix.from_coo(rows, cols, None, (self.num_vertices, self.num_vertices))
+        overlap.data[:] = 1.0
+        return overlap
+
+    def smoothing_operator(self, depth=3, use_faces=True, include_overlap=True, distance_threshold=0.1):
+        # type: (Optional[int], Optional[bool], Optional[bool], Optional[float]) -> CSRMatrix
+        """
+        Row normalized operator averaging the neighbourhood of each vertex.
+
+        The neighbourhood is the depth ring around the vertex and, with include_overlap, around
+        every vertex overlapping it, excluding the vertex and its overlapping vertices.
+        """
+        ring = self.k_ring(depth=depth, use_faces=use_faces)
+        if include_overlap:
+            # overlapping vertices that are already direct neighbours stay regular neighbours
+            overlap = self.overlap_matrix(distance_threshold=distance_threshold)
+            overlap = overlap.pattern_difference(self.vertex_adjacency(use_faces=use_faces))
+            origin = overlap.pattern_union(CSRMatrix.identity(self.num_vertices))
+            neighbourhood = origin.pattern_dot(ring)
+        else:
+            origin = CSRMatrix.identity(self.num_vertices)
+            neighbourhood = ring
+        return neighbourhood.pattern_difference(origin).row_normalized()
+
@@ -0,0 +1,242 @@
+from typing import Dict, Iterable, List, Optional
+import logging
+import re
+
+import numpy as np
+
+from rigging_toolkit.core.corrective import OFFSET_TOLERANCE
+from rigging_toolkit.core.delta_stack import DeltaStack
+from rigging_toolkit.core.sparse import CSRMatrix
+
+logger = logging.getLogger(__name__)
+
+# prefixes, suffixes and splits stripped from a shape name before reading its components
+_NAME_PATTERNS = [re.compile(pattern) for pattern in ["delta_", "_x.*", "shp_", "_L1"]]
+
+_COMPONENT_PATTERN = re.compile(r"(\d+|[A-Za-z]+(?:_[A-Za-z]+)*)")
+
+# components the component regex splits apart, merged back together
+_MERGED_COMPONENTS = [
+    ("14L18", ["14", "L", "18"]),
+    ("14R18", ["14", "R", "18"]),
+    ("30L", ["30", "L"]),
+    ("30R", ["30", "R"]),
+]
+
+
+def strip_shape_name(shape):
+    # type: (str) -> str
+    """delta_shp_12_14_L1_xLeft -> 12_14"""
+    for pattern in _NAME_PATTERNS:
+        shape = pattern.sub("", shape)
+    return shape
+
+
+def shape_components(shape):
+    # type: (str) -> List[str]
+    """Base components of a shape name, shp_12_14L18_L1 -> ["12", "14L18"]"""
+    parts = _COMPONENT_PATTERN.findall(strip_shape_name(shape))
+
+    # the regex splits the components that contain a side, their adjacent parts are merged back
+    components = []
+    i = 0
+    while i < len(parts):
+        for merged, merged_parts in _MERGED_COMPONENTS:
+            if parts[i:i + len(merged_parts)] == merged_parts:
+                components.append(merged)
+                i += len(merged_parts)
+                break
+        else:
+            components.append(parts[i])
+            i += 1
+    return components
+
+
+def _bit_count(mask):
+    # type: (int) -> int
+    return bin(mask).count("1")
+
+
+class ShapeLattice(object):
+    """
+    Combination shapes as a lattice over their base components: every shape is a bitmask with
+    one bit per component, base shapes have a single bit and a combo shape contains another
+    when its mask is a superset.
+
+    Shapes are looked up by mask in a dict, the sub combinations of every combo are found
+    once when the lattice is built, so the graph of thousands of combos builds in milliseconds.
+    """
+
+    def __init__(self, shapes):
+        # type: (Iterable[str]) -> None
+        self.components = []  # type: List[str]
+        self._bits = {}  # type: Dict[str, int]
+        self._components = {}  # type: Dict[str, List[str]]
+        self._masks = {}  # type: Dict[str, int]
+        self._shapes = {}  # type: Dict[int, str]
+
+        for shape in shapes:
+            if shape in self._masks:
+                continue
+            components = shape_components(shape)
+            if not components:
+                continue
+            mask = 0
+            for component in components:
+                if component not in self._bits:
+                    self._bits[component] = len(self.components)
+                    self.components.append(component)
+                mask |= 1 << self._bits[component]
+            if mask in self._shapes:
+                logger.warning(f"{shape} has the same components as {self._shapes[mask]}, it is ignored")
+                continue
+            self._components[shape] = components
+            self._masks[shape] = mask
+            self._shapes[mask] = shape
+
+        # number of components of every mask
+        self._sizes = {mask: _bit_count(mask) for mask in self._shapes}  # type: Dict[int, int]
+        self._sub_combinations = {}  # type: Dict[str, List[str]]
+        combo_masks = [mask for mask, size in self._sizes.items() if size > 1]
+        for mask in combo_masks:
+            self._sub_combinations[self._shapes[mask]] = self._find_sub_combinations(mask, combo_masks)
+
+    def _find_sub_combinations(self, mask, combo_masks):
+        # type: (int, List[int]) -> List[str]
+        """Combos strictly contained in the mask, enumerating its submasks or scanning the combos, whichever is fewer"""
+        sizes = self._sizes
+        if 1 << sizes[mask] <= len(combo_masks):
+            subs = []
+            sub = (mask - 1) & mask
+            while sub:
+                if sizes.get(sub, 0) > 1:
+                    subs.append(sub)
+                sub = (sub - 1) & mask
+        else:
+            subs = [other for other in combo_masks if other != mask and other & mask == other]
+        return [self._shapes[sub] for sub in sorted(subs, key=lambda sub: (sizes[sub], sub))]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._masks)
+
+    def __contains__(self, shape):
+        # type: (str) -> bool
+        return shape in self._masks
+
+    def mask(self, shape):
+        # type: (str) -> int
+        return self._masks[shape]
+
+    def mask_of(self, shape):
+        # type: (str) -> int
+        """Mask of any shape name, e.g. a split or delta target, components not in the lattice are ignored"""
+        mask = 0
+        for component in shape_components(shape):
+            bit = self._bits.get(component)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def shape(self, mask):
+        # type: (int) -> Optional[str]
+        """The shape with exactly these components, None if there is none"""
+        return self._shapes.get(mask)
+
+    def components_of(self, shape):
+        # type: (str) -> List[str]
+        """Components of the shape, in the order of its name"""
+        return list(self._components[shape])
+
+    def is_combo(self, shape):
+        # type: (str) -> bool
+        return self._sizes[self._masks[shape]] > 1
+
+    @property
+    def base_shapes(self):
+        # type: () -> List[str]
+        return [shape for shape, mask in self._masks.items() if self._sizes[mask] == 1]
+
+    @property
+    def combo_shapes(self):
+        # type: () -> List[str]
+        return [shape for shape, mask in self._masks.items() if self._sizes[mask] > 1]
+
+    def base_shape(self, component):
+        # type: (str) -> Optional[str]
+        """The base shape of a component, None if it is only used in combos"""
+        bit = self._bits.get(component)
+        return self._shapes.get(1 << bit) if bit is not None else None
+
+    def base_shapes_of(self, shape):
+        # type: (str) -> List[str]
+        """Existing base shapes of the components of the shape, in the order of its name"""
+        bases = [self.base_shape(component) for component in self._components[shape]]
+        return [base for base in bases if base is not None]
+
+    def missing_components(self, shape):
+        # type: (str) -> List[str]
+        """Components of the shape without a base shape"""
+        return [component for component in self._components[shape] if self.base_shape(component) is None]
+
+    def sub_combinations(self, shape):
+        # type: (str) -> List[str]
+        """Combos made of a strict subset of the components of the combo, smallest first"""
+        return list(self._sub_combinations.get(shape, []))
+
+    def evaluation_order(self):
+        # type: () -> List[str]
+        """All the shapes, every shape after all the shapes it contains"""
+        order = {shape: i for i, shape in enumerate(self._masks)}
+        return sorted(self._masks, key=lambda shape: (self._sizes[self._masks[shape]], order[shape]))
+
+    def sub_shapes(self, shape):
+        # type: (str) -> List[str]
+        """Base shapes and combos strictly contained in the shape"""
+        if not self.is_combo(shape):
+            return []
+        return self.base_shapes_of(shape) + self.sub_combinations(shape)
+
+    def corrective_coefficients(self):
+        # type: () -> Dict[str, Dict[str, float]]
+        """
+        {shape: {shape: coefficient}} expressing the corrective of every shape in full shapes, the
+        corrective of a combo being the combo minus the correctives of all the shapes it contains.
+        Solved bottom up in evaluation order, every shape reusing the memoized rows of its sub shapes.
+        """
+        coefficients = {}  # type: Dict[str, Dict[str, float]]
+        for shape in self.evaluation_order():
+            row = {shape: 1.0}
+            for sub in self.sub_shapes(shape):
+                for other, value in coefficients[sub].items():
+                    row[other] = row.get(other, 0.0) - value
+            coefficients[shape] = {other: value for other, value in row.items() if value != 0.0}
+        return coefficients
+
+
+def solve_combination_correctives(deltas, lattice=None, tolerance=OFFSET_TOLERANCE):
+    # type: (DeltaStack, Optional[ShapeLattice], Optional[float]) -> DeltaStack
+    """
+    Corrective deltas of every combo of the stack of full sculpted deltas, in a single sparse pass.
+
+    The lattice is built from the names of the stack if not provided, it must use the same names,
+    shapes of the lattice missing from the stack are left out. Returns the correctives of the combos, named after them.
+    """
+    lattice = lattice or ShapeLattice(deltas.names)
+    if any(shape not in deltas for shape in lattice.evaluation_order()):
+        lattice = ShapeLattice([shape for shape in lattice.evaluation_order() if shape in deltas])
+
+    combos = [shape for shape in lattice.evaluation_order() if lattice.is_combo(shape)]
+    target_rows = {name: i for i, name in enumerate(deltas.names)}
+    rows, columns, values = [], [], []
+    coefficients = lattice.corrective_coefficients()
+    for row, combo in enumerate(combos):
+        for shape, value in coefficients[combo].items():
+            rows.append(row)
+            columns.append(target_rows[shape])
+            values.append(value)
+    matrix = CSRMatrix.from_coo(
+        np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64), np.array(values),
+        (len(combos), len(deltas)),
+    )
+    return deltas.sparse_combine(matrix, combos, tolerance=tolerance)
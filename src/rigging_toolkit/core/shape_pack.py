@@ -0,0 +1,87 @@
+from typing import Any, Dict, List, Optional, Union
+import hashlib
+import json
+
+import numpy as np
+
+from rigging_toolkit.core.delta_stack import DeltaStack
+from rigging_toolkit.core.filesystem import Path
+
+SHAPE_PACK_VERSION = 1
+
+
+def topology_digest(counts, connects):
+    # type: (np.ndarray, np.ndarray) -> str
+    """Hash of a polygon topology, the face vertex counts and face vertex ids as returned by MFnMesh.getVertices."""
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(counts, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(connects, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+class ShapePack(object):
+    """
+    All the targets of a shape series in a single compressed .npz file: the sparse deltas of
+    every target, the digest of the base topology they apply to and a manifest.
+
+    Replaces one mesh file per target, a pack is read in one go and its deltas written straight
+    to a blendshape without building any intermediate mesh.
+    """
+
+    def __init__(self, deltas, topology, manifest=None):
+        # type: (DeltaStack, str, Optional[Dict[str, Any]]) -> None
+        self.deltas = deltas
+        self.topology = topology
+        self.manifest = manifest if manifest is not None else self._build_manifest()
+
+    def _build_manifest(self):
+        # type: () -> Dict[str, Any]
+        return {
+            "version": SHAPE_PACK_VERSION,
+            "topology": self.topology,
+            "vertex_count": self.deltas.vertex_count,
+            "target_count": len(self.deltas),
+            "targets": {name: int(count) for name, count in zip(self.deltas.names, self.deltas.row_lengths)},
+        }
+
+    @property
+    def names(self):
+        # type: () -> List[str]
+        return self.deltas.names
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.deltas)
+
+    def validate(self, topology):
+        # type: (str) -> None
+        """Raise a ValueError if the pack was written from a base with another topology"""
+        if topology != self.topology:
+            raise ValueError(f"The shape pack topology {self.topology} doesn't match the base topology {topology}")
+
+    @classmethod
+    def read(cls, path):
+        # type: (Union[str, Path]) -> ShapePack
+        with np.load(str(path), allow_pickle=False) as data:
+            manifest = json.loads(str(data["manifest"]))
+            if manifest.get("version", 0) > SHAPE_PACK_VERSION:
+                raise ValueError(f"{path} was written by a newer version, {manifest['version']}")
+            deltas = DeltaStack(
+                data["names"].tolist(), data["indptr"], data["indices"], data["offsets"], int(data["vertex_count"])
+            )
+            return cls(deltas, str(data["topology"]), manifest)
+
+    def write(self, path):
+        # type: (Union[str, Path]) -> None
+        Path.create_path(Path(path).parent)
+        with open(str(path), "wb") as f:
+            np.savez_compressed(
+                f,
+                names=np.array(self.deltas.names, dtype=str),
+                indptr=self.deltas.indptr,
+                indices=self.deltas.indices,
+                offsets=self.deltas.offsets,
+                vertex_count=np.array(self.deltas.vertex_count),
+                topology=np.array(self.topology),
+                manifest=np.array(json.dumps(self.manifest)),
+            )
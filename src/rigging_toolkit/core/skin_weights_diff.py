@@ -0,0 +1,200 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union, TYPE_CHECKING
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from rigging_toolkit.core.skin_weights_io import SkinWeightsData, load_skin_weights
+
+if TYPE_CHECKING:
+    from rigging_toolkit.core.filesystem import Path
+
+# upper bound on the number of dense weights, vertices x influences, compared at once
+CHUNK_ELEMENTS = 1 << 21
+
+
+@dataclass
+class SkinWeightsDiff:
+    """Differences between two sets of skin weights, with influences aligned by name."""
+
+    influences: List[str]
+    num_vertices: int
+    tolerance: float
+    max_abs_delta: np.ndarray
+    changed_vertices: np.ndarray
+    totals_a: np.ndarray
+    totals_b: np.ndarray
+    influence_max_abs_delta: np.ndarray
+    unnormalized_a: np.ndarray
+    unnormalized_b: np.ndarray
+    missing_in_a: List[str] = field(default_factory=list)
+    missing_in_b: List[str] = field(default_factory=list)
+    num_vertices_a: int = 0
+    num_vertices_b: int = 0
+
+    @property
+    def is_equal(self):
+        # type: () -> bool
+        """True when no vertex changed by more than the tolerance and both sides have the same vertices."""
+        return not len(self.changed_vertices) and self.num_vertices_a == self.num_vertices_b
+
+    @property
+    def is_valid(self):
+        # type: () -> bool
+        return self.is_equal and not len(self.unnormalized_a) and not len(self.unnormalized_b)
+
+    def changed_influences(self):
+        # type: () -> Dict[str, float]
+        """{influence: max abs delta} of the influences that changed by more than the tolerance."""
+        return {
+            self.influences[i]: float(self.influence_max_abs_delta[i])
+            for i in np.flatnonzero(self.influence_max_abs_delta > self.tolerance)
+        }
+
+    def summary(self, max_vertices=20):
+        # type: (Optional[int]) -> dict
+        """Json serializable report, vertex lists are truncated to max_vertices."""
+        return {
+            "equal": self.is_equal,
+            "valid": self.is_valid,
+            "tolerance": self.tolerance,
+            "num_vertices": [self.num_vertices_a, self.num_vertices_b],
+            "max_abs_delta": float(self.max_abs_delta.max()) if len(self.max_abs_delta) else 0.0,
+            "num_changed_vertices": len(self.changed_vertices),
+            "changed_vertices": self.changed_vertices[:max_vertices].tolist(),
+            "changed_influences": self.changed_influences(),
+            "missing_in_a": self.missing_in_a,
+            "missing_in_b": self.missing_in_b,
+            "num_unnormalized": [len(self.unnormalized_a), len(self.unnormalized_b)],
+            "unnormalized_a": self.unnormalized_a[:max_vertices].tolist(),
+            "unnormalized_b": self.unnormalized_b[:max_vertices].tolist(),
+        }
+
+
+def _dense_rows(data, columns, start, stop, num_influences):
+    # type: (SkinWeightsData, np.ndarray, int, int, int) -> np.ndarray
+    """Densify the rows [start, stop) of CSR weights, rows past the end of data are left at zero."""
+    dense = np.zeros((stop - start, num_influences))
+    num_rows = len(data.indptr) - 1
+    stop = min(stop, num_rows)
+    if stop <= start:
+        return dense
+
+    indptr = np.asarray(data.indptr[start:stop + 1], dtype=np.int64)
+    lo, hi = int(indptr[0]), int(indptr[-1])
+    rows = np.repeat(np.arange(stop - start), np.diff(indptr))
+    cols = columns[np.asarray(data.indices[lo:hi], dtype=np.int64)]
+    np.add.at(dense, (rows, cols), np.asarray(data.weights[lo:hi], dtype=np.float64))
+    return dense
+
+
+def compare_skin_weights(a, b, tolerance=1e-4, normalization_tolerance=1e-3, chunk_size=None):
+    # type: (SkinWeightsData, SkinWeightsData, Optional[float], Optional[float], Optional[int]) -> SkinWeightsDiff
+    """
+    Compare two CSR skin weights vertex by vertex, streaming over chunks of chunk_size vertices.
+
+    Influences are matched by name, an influence missing on one side counts as zero weights.
+    A vertex is changed when any of its weights differ by more than tolerance, and
+    unnormalized when its weights sum differs from one by more than normalization_tolerance.
+    """
+    influences = list(a.influences)
+    influence_index = {name: i for i, name in enumerate(influences)}
+    for name in b.influences:
+        if name not in influence_index:
+            influence_index[name] = len(influences)
+            influences.append(name)
+
+    columns_a = np.array([influence_index[name] for name in a.influences], dtype=np.int64)
+    columns_b = np.array([influence_index[name] for name in b.influences], dtype=np.int64)
+    num_influences = len(influences)
+
+    num_vertices_a = len(a.indptr) - 1
+    num_vertices_b = len(b.indptr) - 1
+    num_vertices = max(num_vertices_a, num_vertices_b)
+
+    max_abs_delta = np.zeros(num_vertices, dtype=np.float32)
+    totals_a = np.zeros(num_influences)
+    totals_b = np.zeros(num_influences)
+    influence_max_abs_delta = np.zeros(num_influences)
+    unnormalized_a = []  # type: List[np.ndarray]
+    unnormalized_b = []  # type: List[np.ndarray]
+
+    chunk_size = chunk_size or max(CHUNK_ELEMENTS // max(num_influences, 1), 1)
+    for start in range(0, num_vertices, chunk_size):
+        stop = min(start + chunk_size, num_vertices)
+        dense_a = _dense_rows(a, columns_a, start, stop, num_influences)
+        dense_b = _dense_rows(b, columns_b, start, stop, num_influences)
+
+        delta = np.abs(dense_a - dense_b)
+        max_abs_delta[start:stop] = delta.max(axis=1, initial=0.0)
+        np.maximum(influence_max_abs_delta, delta.max(axis=0, initial=0.0), out=influence_max_abs_delta)
+        totals_a += dense_a.sum(axis=0)
+        totals_b += dense_b.sum(axis=0)
+
+        # vertices missing on one side are reported as changed, not as unnormalized
+        for dense, num_rows, result in (
+            (dense_a, num_vertices_a, unnormalized_a),
+            (dense_b, num_vertices_b, unnormalized_b),
+        ):
+            sums = dense[:max(min(stop, num_rows) - start, 0)].sum(axis=1)
+            result.append(np.flatnonzero(np.abs(sums - 1.0) > normalization_tolerance) + start)
+
+    names_a = set(a.influences)
+    names_b = set(b.influences)
+    changed_vertices = np.flatnonzero(max_abs_delta > tolerance)
+    missing_rows = np.arange(min(num_vertices_a, num_vertices_b), num_vertices)
+    changed_vertices = np.union1d(changed_vertices, missing_rows)
+
+    return SkinWeightsDiff(
+        influences=influences,
+        num_vertices=num_vertices,
+        tolerance=tolerance,
+        max_abs_delta=max_abs_delta,
+        changed_vertices=changed_vertices,
+        totals_a=totals_a,
+        totals_b=totals_b,
+        influence_max_abs_delta=influence_max_abs_delta,
+        unnormalized_a=np.concatenate(unnormalized_a) if unnormalized_a else np.zeros(0, dtype=np.int64),
+        unnormalized_b=np.concatenate(unnormalized_b) if unnormalized_b else np.zeros(0, dtype=np.int64),
+        missing_in_a=[name for name in b.influences if name not in names_a],
+        missing_in_b=[name for name in a.influences if name not in names_b],
+        num_vertices_a=num_vertices_a,
+        num_vertices_b=num_vertices_b,
+    )
+
+
+def compare_skin_weights_files(path_a, path_b, tolerance=1e-4, normalization_tolerance=1e-3, chunk_size=None):
+    # type: (Union[str, Path], Union[str, Path], Optional[float], Optional[float], Optional[int]) -> SkinWeightsDiff
+    """Compare two exported skin weights files, binary files are memory mapped when uncompressed."""
+    return compare_skin_weights(
+        load_skin_weights(path_a, mmap=True),
+        load_skin_weights(path_b, mmap=True),
+        tolerance=tolerance,
+        normalization_tolerance=normalization_tolerance,
+        chunk_size=chunk_size,
+    )
+
+
+def main(argv=None):
+    # type: (Optional[List[str]]) -> int
+    """Compare two skin weights files outside of maya, exits with 1 when they differ."""
+    parser = argparse.ArgumentParser(description="Compare two exported skin weights files.")
+    parser.add_argument("file_a")
+    parser.add_argument("file_b")
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    parser.add_argument("--normalization-tolerance", type=float, default=1e-3)
+    parser.add_argument("--strict", action="store_true", help="also fail on unnormalized vertices")
+    args = parser.parse_args(argv)
+
+    diff = compare_skin_weights_files(
+        args.file_a, args.file_b, tolerance=args.tolerance, normalization_tolerance=args.normalization_tolerance
+    )
+    print(json.dumps(diff.summary(), indent=4))
+    passed = diff.is_valid if args.strict else diff.is_equal
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
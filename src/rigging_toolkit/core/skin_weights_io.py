@@ -0,0 +1,376 @@
+from collections import namedtuple
+from typing import List, Optional, Tuple, Union, Iterable, TYPE_CHECKING
+from xml.etree import ElementTree
+import json
+import struct
+import zlib
+import logging
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from rigging_toolkit.core.filesystem import Path
+
+logger = logging.getLogger(__name__)
+
+SKIN_WEIGHTS_EXTENSION = "skw"
+
+MAGIC = b"RTSW"
+FORMAT_VERSION = 1
+
+FLAG_COMPRESSED = 1 << 0
+FLAG_HALF_PRECISION = 1 << 1
+FLAG_WIDE_INDICES = 1 << 2
+
+# magic, format version, flags, max influences, num influences, num vertices, num weights
+_HEADER = struct.Struct("<4sHHHIIQ")
+_STRING_LENGTH = struct.Struct("<H")
+_PAYLOAD_LENGTH = struct.Struct("<Q")
+
+SkinWeightsHeader = namedtuple(
+    "SkinWeightsHeader",
+    ["name", "influences", "max_influences", "num_vertices", "num_weights", "flags"],
+)
+
+SkinWeightsData = namedtuple(
+    "SkinWeightsData",
+    ["name", "influences", "max_influences", "indptr", "indices", "weights"],
+)
+
+
+def weights_to_csr(weights):
+    # type: (List[dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]
+    """Convert a list of per vertex {influence_index: weight} dicts to CSR arrays.
+
+    Keys may be ints or strings, as json turns the influence indices into strings.
+    """
+    counts = np.fromiter((len(w) for w in weights), dtype=np.int64, count=len(weights))
+    indptr = np.zeros(len(weights) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    num_weights = int(indptr[-1])
+    indices = np.empty(num_weights, dtype=np.int64)
+    values = np.empty(num_weights, dtype=np.float64)
+
+    start = 0
+    for vert_weights in weights:
+        end = start + len(vert_weights)
+        indices[start:end] = [int(k) for k in vert_weights.keys()]
+        values[start:end] = list(vert_weights.values())
+        start = end
+
+    return indptr, indices, values
+
+
+def csr_to_weights(indptr, indices, values):
+    # type: (np.ndarray, np.ndarray, np.ndarray) -> List[dict]
+    """Convert CSR arrays back to a list of per vertex {influence_index: weight} dicts."""
+    indices = np.asarray(indices).tolist()
+    values = np.asarray(values, dtype=np.float64).tolist()
+    indptr = np.asarray(indptr).tolist()
+    return [
+        dict(zip(indices[indptr[i]:indptr[i + 1]], values[indptr[i]:indptr[i + 1]]))
+        for i in range(len(indptr) - 1)
+    ]
+
+
+def _write_string(f, value):
+    # type: (...) -> None
+    data = value.encode("utf-8")
+    f.write(_STRING_LENGTH.pack(len(data)))
+    f.write(data)
+
+
+def _read_string(f):
+    # type: (...) -> str
+    (length,) = _STRING_LENGTH.unpack(f.read(_STRING_LENGTH.size))
+    return f.read(length).decode("utf-8")
+
+
+def write_skin_weights(
+    path,  # type: Union[str, Path]
+    name,  # type: str
+    influences,  # type: List[str]
+    indptr,  # type: np.ndarray
+    indices,  # type: np.ndarray
+    weights,  # type: np.ndarray
+    max_influences=8,  # type: Optional[int]
+    precision="float32",  # type: Optional[str]
+    compress=False,  # type: Optional[bool]
+):
+    # type: (...) -> None
+    """Write CSR skin weights to the binary skin weights format.
+
+    The file is a small header, the influence name table and then the
+    indptr, indices and weights arrays, optionally zlib compressed.
+    """
+    if precision not in ("float16", "float32"):
+        raise ValueError(f"Unsupported precision {precision}, expected float16 or float32")
+
+    indptr = np.asarray(indptr)
+    num_vertices = len(indptr) - 1
+    num_weights = int(indptr[-1])
+    if num_weights >= 2 ** 32:
+        raise ValueError(f"Too many weights to store: {num_weights}")
+
+    flags = 0
+    if compress:
+        flags |= FLAG_COMPRESSED
+    if precision == "float16":
+        flags |= FLAG_HALF_PRECISION
+    if len(influences) > np.iinfo(np.uint16).max:
+        flags |= FLAG_WIDE_INDICES
+
+    index_dtype = "<u4" if flags & FLAG_WIDE_INDICES else "<u2"
+    weight_dtype = "<f2" if flags & FLAG_HALF_PRECISION else "<f4"
+
+    payload = b"".join(
+        [
+            np.ascontiguousarray(indptr, dtype="<u4").tobytes(),
+            np.ascontiguousarray(indices, dtype=index_dtype).tobytes(),
+            np.ascontiguousarray(weights, dtype=weight_dtype).tobytes(),
+        ]
+    )
+
+    with open(str(path), "wb") as f:
+        f.write(
+            _HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                flags,
+                max_influences or 0,
+                len(influences),
+                num_vertices,
+                num_weights,
+            )
+        )
+        _write_string(f, name or "")
+        for influence in influences:
+            _write_string(f, influence)
+
+        if compress:
+            payload = zlib.compress(payload)
+            f.write(_PAYLOAD_LENGTH.pack(len(payload)))
+        f.write(payload)
+
+
+def _read_header(f):
+    # type: (...) -> SkinWeightsHeader
+    magic, version, flags, max_influences, num_influences, num_vertices, num_weights = _HEADER.unpack(
+        f.read(_HEADER.size)
+    )
+    if magic != MAGIC:
+        raise ValueError(f"{getattr(f, 'name', f)} is not a skin weights file")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Unsupported skin weights format version {version}")
+
+    name = _read_string(f)
+    influences = [_read_string(f) for _ in range(num_influences)]
+
+    return SkinWeightsHeader(name, influences, max_influences, num_vertices, num_weights, flags)
+
+
+def read_header(path):
+    # type: (Union[str, Path]) -> SkinWeightsHeader
+    """Read only the header and influence table of a binary skin weights file."""
+    with open(str(path), "rb") as f:
+        return _read_header(f)
+
+
+def read_influences(path):
+    # type: (Union[str, Path]) -> List[str]
+    """List the influences stored in a binary skin weights file without reading the weights."""
+    return read_header(path).influences
+
+
+def read_skin_weights(path, mmap=False):
+    # type: (Union[str, Path], Optional[bool]) -> SkinWeightsData
+    """Read a binary skin weights file into CSR arrays.
+
+    Weights are always returned as float32, regardless of the stored precision.
+    With mmap, uncompressed files are memory mapped instead, the arrays then keep
+    their stored dtypes and are only read from disk when they're accessed.
+    """
+    with open(str(path), "rb") as f:
+        header = _read_header(f)
+        if header.flags & FLAG_COMPRESSED:
+            (length,) = _PAYLOAD_LENGTH.unpack(f.read(_PAYLOAD_LENGTH.size))
+            payload = zlib.decompress(f.read(length))
+        elif mmap:
+            payload = None
+            payload_offset = f.tell()
+        else:
+            payload = f.read()
+
+    index_dtype = np.dtype("<u4" if header.flags & FLAG_WIDE_INDICES else "<u2")
+    weight_dtype = np.dtype("<f2" if header.flags & FLAG_HALF_PRECISION else "<f4")
+    counts = (header.num_vertices + 1, header.num_weights, header.num_weights)
+    dtypes = (np.dtype("<u4"), index_dtype, weight_dtype)
+
+    arrays = []
+    offset = 0
+    for count, dtype in zip(counts, dtypes):
+        if payload is None:
+            arrays.append(
+                np.memmap(str(path), dtype=dtype, mode="r", offset=payload_offset + offset, shape=(count,))
+                if count else np.zeros(0, dtype=dtype)
+            )
+        else:
+            arrays.append(np.frombuffer(payload, dtype=dtype, count=count, offset=offset))
+        offset += count * dtype.itemsize
+
+    indptr, indices, weights = arrays
+    if payload is not None:
+        indptr, indices, weights = indptr.astype(np.int64), indices.astype(np.int64), weights.astype(np.float32)
+
+    return SkinWeightsData(header.name, header.influences, header.max_influences, indptr, indices, weights)
+
+
+def load_skin_weights(path, mmap=False):
+    # type: (Union[str, Path], Optional[bool]) -> SkinWeightsData
+    """Read binary, SkinWeights json or maya deformerWeights xml skin weights into CSR arrays."""
+    suffix = str(path).rsplit(".", 1)[-1].lower()
+    if suffix == SKIN_WEIGHTS_EXTENSION:
+        return read_skin_weights(path, mmap=mmap)
+
+    if suffix == "json":
+        with open(str(path), "r") as f:
+            data = json.load(f)
+        indptr, indices, values = weights_to_csr(data["weights"]["weights"])
+        return SkinWeightsData(
+            data["name"], data["weights"]["influences"], data.get("max_influences", 8), indptr, indices, values
+        )
+
+    if suffix == "xml":
+        influences, indptr, indices, values = xml_to_csr(path)
+        return SkinWeightsData("", influences, 0, indptr, indices, values)
+
+    raise ValueError(f"Unsupported skin weights file {path}")
+
+
+def convert_json_to_binary(json_path, binary_path, precision="float32", compress=False):
+    # type: (Union[str, Path], Union[str, Path], Optional[str], Optional[bool]) -> None
+    """Convert a SkinWeights json file to the binary skin weights format."""
+    with open(str(json_path), "r") as f:
+        data = json.load(f)
+
+    indptr, indices, values = weights_to_csr(data["weights"]["weights"])
+    write_skin_weights(
+        binary_path,
+        data["name"],
+        data["weights"]["influences"],
+        indptr,
+        indices,
+        values,
+        max_influences=data.get("max_influences", 8),
+        precision=precision,
+        compress=compress,
+    )
+
+
+def iter_xml_influences(xml_path):
+    # type: (Union[str, Path]) -> Iterable[Tuple[str, np.ndarray, np.ndarray]]
+    """Stream the (influence, vertex ids, weights) of a deformerWeights xml file.
+
+    Elements are cleared as soon as they're read so the whole tree is never held in memory.
+    """
+    indices = None  # type: Optional[List[int]]
+    values = None  # type: Optional[List[float]]
+    for event, element in ElementTree.iterparse(str(xml_path), events=("start", "end")):
+        if element.tag == "weights":
+            if event == "start":
+                indices, values = [], []
+                continue
+            source = element.attrib.get("source")
+            if source:
+                yield (
+                    source,
+                    np.array(indices, dtype=np.int64),
+                    np.array(values, dtype=np.float64),
+                )
+            indices, values = None, None
+            element.clear()
+        elif event == "end" and element.tag == "point":
+            # shape points live outside of the weights elements, skip those
+            if indices is not None:
+                indices.append(int(element.attrib["index"]))
+                values.append(float(element.attrib["value"]))
+            element.clear()
+
+
+def read_xml_influences(xml_path):
+    # type: (Union[str, Path]) -> List[str]
+    """List the influences of a deformerWeights xml file without reading any weights.
+
+    The influences are the sources of the top level weights elements, the file is parsed up to the
+    first top level element after them and the points in between are dropped as soon as they're read.
+    """
+    influences = []  # type: List[str]
+    depth = 0
+    for event, element in ElementTree.iterparse(str(xml_path), events=("start", "end")):
+        if event == "end":
+            depth -= 1
+            element.clear()
+            continue
+        depth += 1
+        if depth != 2:
+            continue
+        if element.tag == "weights":
+            if element.attrib.get("source"):
+                influences.append(element.attrib["source"])
+        elif influences:
+            break
+    return influences
+
+
+def xml_to_csr(xml_path):
+    # type: (Union[str, Path]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]
+    """Read a deformerWeights xml file into (influences, indptr, indices, weights).
+
+    The xml is streamed one influence at a time, but it is stored per influence while the rows
+    are per vertex, so the weights of all the influences are kept as arrays until the last one is read.
+    """
+    influences = []  # type: List[str]
+    vertex_ids = []  # type: List[np.ndarray]
+    weights = []  # type: List[np.ndarray]
+    counts = np.zeros(0, dtype=np.int64)
+
+    for source, ids, values in iter_xml_influences(xml_path):
+        influences.append(source)
+        vertex_ids.append(ids)
+        weights.append(values)
+        if len(ids):
+            counts = np.pad(counts, (0, max(0, int(ids.max()) + 1 - len(counts))))
+            counts[ids] += 1
+
+    indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.zeros(indptr[-1], dtype=np.int64)
+    values = np.zeros(indptr[-1])
+
+    # fill the rows influence by influence, so the influences of every vertex stay sorted
+    fill = indptr[:-1].copy()
+    for i, (ids, influence_weights) in enumerate(zip(vertex_ids, weights)):
+        positions = fill[ids]
+        indices[positions] = i
+        values[positions] = influence_weights
+        fill[ids] += 1
+
+    return influences, indptr, indices, values
+
+
+def convert_xml_to_binary(xml_path, binary_path, name=None, max_influences=8, precision="float32", compress=False):
+    # type: (Union[str, Path], Union[str, Path], Optional[str], Optional[int], Optional[str], Optional[bool]) -> None
+    """Convert a maya deformerWeights xml file to the binary skin weights format."""
+    influences, indptr, indices, weights = xml_to_csr(xml_path)
+    write_skin_weights(
+        binary_path,
+        name or "",
+        influences,
+        indptr,
+        indices,
+        weights,
+        max_influences=max_influences,
+        precision=precision,
+        compress=compress,
+    )
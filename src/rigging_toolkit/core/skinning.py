@@ -0,0 +1,209 @@
+from typing import Optional, Union
+
+import numpy as np
+
+from rigging_toolkit.core.sparse import CSRMatrix
+
+# upper bound on the number of temporary elements, frames x vertices x joints, created per chunk
+CHUNK_ELEMENTS = 1 << 23
+
+LINEAR = "linear"
+DUAL_QUATERNION = "dual_quaternion"
+
+
+def skinning_matrices(bind_pre_matrices, joint_matrices, geom_matrix=None):
+    # type: (np.ndarray, np.ndarray, Optional[np.ndarray]) -> np.ndarray
+    """
+    Combine (J, 4, 4) bind pre matrices and (F, J, 4, 4) or (J, 4, 4) joint world matrices
+    into (F, J, 4, 4) skinning matrices.
+
+    Matrices follow the maya row vector convention, a point is transformed as p * M, so the
+    skinning matrix of a joint is geomMatrix * bindPreMatrix * worldMatrix.
+    """
+    bind_pre_matrices = np.asarray(bind_pre_matrices, dtype=np.float64)
+    joint_matrices = np.asarray(joint_matrices, dtype=np.float64)
+    if joint_matrices.ndim == 3:
+        joint_matrices = joint_matrices[np.newaxis]
+
+    matrices = np.matmul(bind_pre_matrices[np.newaxis], joint_matrices)
+    if geom_matrix is not None:
+        matrices = np.matmul(np.asarray(geom_matrix, dtype=np.float64), matrices)
+    return matrices
+
+
+def _weight_rows(weights, start, stop):
+    # type: (Union[np.ndarray, CSRMatrix], int, int) -> np.ndarray
+    if isinstance(weights, CSRMatrix):
+        rows = weights.take_rows(np.arange(start, stop))
+        dense = np.zeros(rows.shape)
+        dense[rows.row_ids(), rows.indices] = rows.data
+        return dense
+    return np.asarray(weights[start:stop], dtype=np.float64)
+
+
+def _chunk_size(num_frames, num_joints):
+    # type: (int, int) -> int
+    return max(CHUNK_ELEMENTS // max(num_frames * max(num_joints, 12), 1), 1)
+
+
+def _flatten_matrices(matrices):
+    # type: (np.ndarray) -> np.ndarray
+    """(J, F * 12) upper 4x3 part of every (F, J, 4, 4) matrix, so blending is a single product."""
+    num_frames, num_joints = matrices.shape[:2]
+    return matrices[:, :, :, :3].transpose(1, 0, 2, 3).reshape(num_joints, num_frames * 12)
+
+
+def _blend_rows(flat_matrices, weights, start, stop):
+    # type: (np.ndarray, Union[np.ndarray, CSRMatrix], int, int) -> np.ndarray
+    if isinstance(weights, CSRMatrix):
+        blended = weights.take_rows(np.arange(start, stop)).dot(flat_matrices)
+    else:
+        blended = np.asarray(weights[start:stop], dtype=np.float64).dot(flat_matrices)
+    return blended.reshape(stop - start, -1, 4, 3).transpose(1, 0, 2, 3)
+
+
+def blend_matrices(matrices, weights, start=0, stop=None):
+    # type: (np.ndarray, Union[np.ndarray, CSRMatrix], Optional[int], Optional[int]) -> np.ndarray
+    """
+    Blend (F, J, 4, 4) skinning matrices by the rows [start, stop) of a (V, J) weight matrix,
+    returns the (F, V, 4, 3) linear blend transform of every vertex.
+    """
+    matrices = np.asarray(matrices, dtype=np.float64)
+    stop = weights.shape[0] if stop is None else stop
+    return _blend_rows(_flatten_matrices(matrices), weights, start, stop)
+
+
+def linear_blend_skinning(rest_points, matrices, weights):
+    # type: (np.ndarray, np.ndarray, Union[np.ndarray, CSRMatrix]) -> np.ndarray
+    """
+    Deform (V, 3) rest points by (F, J, 4, 4) skinning matrices and a (V, J) weight matrix,
+    returns the (F, V, 3) deformed points. Chunked over vertices to bound the memory.
+    """
+    rest_points = np.asarray(rest_points, dtype=np.float64).reshape(-1, 3)
+    matrices = np.asarray(matrices, dtype=np.float64)
+    num_frames, num_joints = matrices.shape[:2]
+    num_vertices = len(rest_points)
+    flat_matrices = _flatten_matrices(matrices)
+
+    result = np.empty((num_frames, num_vertices, 3))
+    chunk_size = _chunk_size(num_frames, num_joints)
+    for start in range(0, num_vertices, chunk_size):
+        stop = min(start + chunk_size, num_vertices)
+        blended = _blend_rows(flat_matrices, weights, start, stop)
+
+        points = rest_points[start:stop]
+        result[:, start:stop] = np.einsum("vi,fvij->fvj", points, blended[:, :, :3]) + blended[:, :, 3]
+
+    return result
+
+
+def matrices_to_quaternions(matrices):
+    # type: (np.ndarray) -> np.ndarray
+    """
+    Convert (..., 4, 4) or (..., 3, 3) row vector rotation matrices to (..., 4) unit (w, x, y, z) quaternions.
+    """
+    # transpose to the column vector convention the conversion below is written for
+    rotation = np.swapaxes(np.asarray(matrices, dtype=np.float64)[..., :3, :3], -1, -2)
+    m00, m01, m02 = rotation[..., 0, 0], rotation[..., 0, 1], rotation[..., 0, 2]
+    m10, m11, m12 = rotation[..., 1, 0], rotation[..., 1, 1], rotation[..., 1, 2]
+    m20, m21, m22 = rotation[..., 2, 0], rotation[..., 2, 1], rotation[..., 2, 2]
+    trace = m00 + m11 + m22
+
+    # pick the numerically stable branch per matrix
+    candidates = np.stack(
+        [
+            np.stack([1.0 + trace, m21 - m12, m02 - m20, m10 - m01], axis=-1),
+            np.stack([m21 - m12, 1.0 + m00 - m11 - m22, m01 + m10, m02 + m20], axis=-1),
+            np.stack([m02 - m20, m01 + m10, 1.0 - m00 + m11 - m22, m12 + m21], axis=-1),
+            np.stack([m10 - m01, m02 + m20, m12 + m21, 1.0 - m00 - m11 + m22], axis=-1),
+        ],
+        axis=-2,
+    )
+    branch = np.argmax(np.stack([trace, m00, m11, m22], axis=-1), axis=-1)
+    quaternions = np.take_along_axis(candidates, branch[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+    quaternions /= np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    return quaternions
+
+
+def _quaternion_multiply(a, b):
+    # type: (np.ndarray, np.ndarray) -> np.ndarray
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack(
+        [
+            aw * bw - ax * bx - ay * by - az * bz,
+            aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw,
+        ],
+        axis=-1,
+    )
+
+
+def matrices_to_dual_quaternions(matrices):
+    # type: (np.ndarray) -> np.ndarray
+    """Convert (..., 4, 4) rigid row vector matrices to (..., 8) dual quaternions, real part first."""
+    real = matrices_to_quaternions(matrices)
+    translation = np.zeros(real.shape)
+    translation[..., 1:] = np.asarray(matrices)[..., 3, :3]
+    dual = 0.5 * _quaternion_multiply(translation, real)
+    return np.concatenate([real, dual], axis=-1)
+
+
+def dual_quaternion_skinning(rest_points, matrices, weights):
+    # type: (np.ndarray, np.ndarray, Union[np.ndarray, CSRMatrix]) -> np.ndarray
+    """
+    Deform (V, 3) rest points by (F, J, 4, 4) skinning matrices and a (V, J) weight matrix with
+    dual quaternion blending, returns the (F, V, 3) deformed points.
+
+    Quaternions are flipped to the hemisphere of the most weighted joint of each vertex before blending.
+    The matrices are expected to be rigid, scale is not supported.
+    """
+    rest_points = np.asarray(rest_points, dtype=np.float64).reshape(-1, 3)
+    dual_quaternions = matrices_to_dual_quaternions(np.asarray(matrices, dtype=np.float64))
+    num_frames, num_joints = dual_quaternions.shape[:2]
+    num_vertices = len(rest_points)
+
+    result = np.empty((num_frames, num_vertices, 3))
+    chunk_size = _chunk_size(num_frames, num_joints)
+    for start in range(0, num_vertices, chunk_size):
+        stop = min(start + chunk_size, num_vertices)
+        chunk_weights = _weight_rows(weights, start, stop)
+
+        pivots = dual_quaternions[:, np.argmax(chunk_weights, axis=1), :4]
+        signs = np.sign(np.einsum("fvk,fjk->fvj", pivots, dual_quaternions[:, :, :4]))
+        signs[signs == 0] = 1.0
+        blended = np.einsum("vj,fvj,fjk->fvk", chunk_weights, signs, dual_quaternions)
+
+        norms = np.linalg.norm(blended[..., :4], axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        real = blended[..., :4] / norms
+        dual = blended[..., 4:] / norms
+
+        conjugate = real * np.array([1.0, -1.0, -1.0, -1.0])
+        translation = 2.0 * _quaternion_multiply(dual, conjugate)[..., 1:]
+
+        # rotate with v' = v + 2w(q x v) + 2q x (q x v)
+        vector = real[..., 1:]
+        points = np.broadcast_to(rest_points[start:stop], vector.shape)
+        cross = np.cross(vector, points)
+        rotated = points + 2.0 * real[..., :1] * cross + 2.0 * np.cross(vector, cross)
+        result[:, start:stop] = rotated + translation
+
+    return result
+
+
+def deform_points(rest_points, bind_pre_matrices, joint_matrices, weights, method=LINEAR, geom_matrix=None):
+    # type: (np.ndarray, np.ndarray, np.ndarray, Union[np.ndarray, CSRMatrix], Optional[str], Optional[np.ndarray]) -> np.ndarray
+    """
+    Evaluate a skinCluster outside of maya, returns the (F, V, 3) deformed points of every frame.
+
+    joint_matrices holds the (F, J, 4, 4) world matrices of the influences, or (J, 4, 4) for a single frame,
+    in the same order as the weight matrix columns and the bind pre matrices.
+    """
+    matrices = skinning_matrices(bind_pre_matrices, joint_matrices, geom_matrix=geom_matrix)
+    if method == LINEAR:
+        return linear_blend_skinning(rest_points, matrices, weights)
+    if method == DUAL_QUATERNION:
+        return dual_quaternion_skinning(rest_points, matrices, weights)
+    raise ValueError(f"Unknown skinning method {method}, expected {LINEAR} or {DUAL_QUATERNION}")
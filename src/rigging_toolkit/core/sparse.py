@@ -0,0 +1,194 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+# upper bound on the number of temporary elements created by a single chunk of a product
+CHUNK_ELEMENTS = 1 << 24
+
+
+def concatenate_ranges(starts, stops):
+    # type: (np.ndarray, np.ndarray) -> np.ndarray
+    """Vectorized np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)])."""
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(stops, dtype=np.int64) - starts
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    if not len(lengths):
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.cumsum(lengths)
+    result = np.ones(offsets[-1], dtype=np.int64)
+    result[0] = starts[0]
+    result[offsets[:-1]] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+    return np.cumsum(result)
+
+
+def unique_keys(keys):
+    # type: (np.ndarray) -> np.ndarray
+    """Sorted unique values of an int array, sort based which is much faster than np.unique for large key sets."""
+    keys = np.sort(keys, kind="stable") if len(keys) else np.asarray(keys, dtype=np.int64)
+    if len(keys) < 2:
+        return keys
+    keep = np.empty(len(keys), dtype=bool)
+    keep[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+
+class CSRMatrix(object):
+    """Minimal compressed sparse row matrix, enough for mesh operators without scipy."""
+
+    def __init__(self, indptr, indices, data, shape):
+        # type: (np.ndarray, np.ndarray, np.ndarray, Tuple[int, int]) -> None
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data)
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    @property
+    def nnz(self):
+        # type: () -> int
+        return len(self.indices)
+
+    @property
+    def row_lengths(self):
+        # type: () -> np.ndarray
+        return np.diff(self.indptr)
+
+    def row_ids(self):
+        # type: () -> np.ndarray
+        """Row index of every stored element."""
+        return np.repeat(np.arange(self.shape[0]), self.row_lengths)
+
+    @classmethod
+    def from_coo(cls, rows, cols, data, shape, sum_duplicates=True):
+        # type: (np.ndarray, np.ndarray, Optional[np.ndarray], Tuple[int, int], Optional[bool]) -> CSRMatrix
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if data is None:
+            data = np.ones(len(rows), dtype=np.float64)
+        data = np.asarray(data)
+
+        keys = rows * shape[1] + cols
+        order = np.argsort(keys, kind="stable")
+        keys, data = keys[order], data[order]
+        if sum_duplicates and len(keys) > 1:
+            starts = np.concatenate([[0], np.nonzero(keys[1:] != keys[:-1])[0] + 1])
+            keys = keys[starts]
+            data = np.add.reduceat(data, starts)
+
+        rows, cols = np.divmod(keys, shape[1])
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+        return cls(indptr, cols, data, shape)
+
+    @classmethod
+    def identity(cls, size):
+        # type: (int) -> CSRMatrix
+        return cls(np.arange(size + 1), np.arange(size), np.ones(size), (size, size))
+
+    def copy(self):
+        # type: () -> CSRMatrix
+        return CSRMatrix(self.indptr.copy(), self.indices.copy(), self.data.copy(), self.shape)
+
+    def transpose(self):
+        # type: () -> CSRMatrix
+        return CSRMatrix.from_coo(
+            self.indices, self.row_ids(), self.data, (self.shape[1], self.shape[0]), sum_duplicates=False
+        )
+
+    def take_rows(self, rows):
+        # type: (np.ndarray) -> CSRMatrix
+        """Return the sub matrix made of the given rows, in the given order."""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, stops = self.indptr[rows], self.indptr[rows + 1]
+        positions = concatenate_ranges(starts, stops)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(stops - starts, out=indptr[1:])
+        return CSRMatrix(indptr, self.indices[positions], self.data[positions], (len(rows), self.shape[1]))
+
+    def dot(self, dense):
+        # type: (np.ndarray) -> np.ndarray
+        """Sparse x dense product, chunked over rows to bound the temporary memory."""
+        dense = np.asarray(dense)
+        squeeze = dense.ndim == 1
+        if squeeze:
+            dense = dense[:, np.newaxis]
+
+        result = np.zeros((self.shape[0], dense.shape[1]), dtype=np.result_type(self.data, dense))
+        max_nnz = max(CHUNK_ELEMENTS // max(dense.shape[1], 1), 1)
+
+        start = 0
+        while start < self.shape[0]:
+            stop = int(np.searchsorted(self.indptr, self.indptr[start] + max_nnz, side="right")) - 1
+            stop = min(max(stop, start + 1), self.shape[0])
+
+            lo, hi = self.indptr[start], self.indptr[stop]
+            if hi > lo:
+                products = self.data[lo:hi, np.newaxis] * dense[self.indices[lo:hi]]
+                lengths = np.diff(self.indptr[start:stop + 1])
+                non_empty = np.nonzero(lengths)[0]
+                offsets = self.indptr[start:stop][non_empty] - lo
+                result[start + non_empty] = np.add.reduceat(products, offsets, axis=0)
+            start = stop
+
+        return result[:, 0] if squeeze else result
+
+    def pattern_dot(self, other):
+        # type: (CSRMatrix) -> CSRMatrix
+        """Boolean product, the result holds a 1.0 wherever self x other is structurally non zero."""
+        rows_result = []
+        cols_result = []
+        other_lengths = other.row_lengths
+
+        # number of pairs each row expands to, used to split the rows in bounded chunks
+        expanded = np.bincount(self.row_ids(), weights=other_lengths[self.indices], minlength=self.shape[0])
+        cumulative = np.concatenate([[0], np.cumsum(expanded)])
+
+        start = 0
+        while start < self.shape[0]:
+            stop = int(np.searchsorted(cumulative, cumulative[start] + CHUNK_ELEMENTS, side="right")) - 1
+            stop = min(max(stop, start + 1), self.shape[0])
+
+            lo, hi = self.indptr[start], self.indptr[stop]
+            rows = np.repeat(np.arange(start, stop), np.diff(self.indptr[start:stop + 1]))
+            cols = self.indices[lo:hi]
+            lengths = other_lengths[cols]
+            positions = concatenate_ranges(other.indptr[cols], other.indptr[cols + 1])
+            keys = unique_keys(np.repeat(rows, lengths) * other.shape[1] + other.indices[positions])
+            chunk_rows, chunk_cols = np.divmod(keys, other.shape[1])
+            rows_result.append(chunk_rows)
+            cols_result.append(chunk_cols)
+            start = stop
+
+        rows = np.concatenate(rows_result) if rows_result else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(cols_result) if cols_result else np.zeros(0, dtype=np.int64)
+        return CSRMatrix.from_coo(rows, cols, None, (self.shape[0], other.shape[1]), sum_duplicates=False)
+
+    def _keys(self):
+        # type: () -> np.ndarray
+        return self.row_ids() * self.shape[1] + self.indices
+
+    def pattern_union(self, other):
+        # type: (CSRMatrix) -> CSRMatrix
+        keys = unique_keys(np.concatenate([self._keys(), other._keys()]))
+        rows, cols = np.divmod(keys, self.shape[1])
+        return CSRMatrix.from_coo(rows, cols, None, self.shape, sum_duplicates=False)
+
+    def pattern_difference(self, other):
+        # type: (CSRMatrix) -> CSRMatrix
+        """Keep the elements of self that are not stored in other."""
+        keys = self._keys()
+        other_keys = other._keys()
+        if len(other_keys):
+            positions = np.minimum(np.searchsorted(other_keys, keys), len(other_keys) - 1)
+            keys = keys[other_keys[positions] != keys]
+        rows, cols = np.divmod(keys, self.shape[1])
+        return CSRMatrix.from_coo(rows, cols, None, self.shape, sum_duplicates=False)
+
+    def row_normalized(self):
+        # type: () -> CSRMatrix
+        """Scale each row to sum to one, empty rows stay empty."""
+        sums = np.bincount(self.row_ids(), weights=self.data, minlength=self.shape[0])
+        sums[sums == 0] = 1.0
+        data = self.data / np.repeat(sums, self.row_lengths)
+        return CSRMatrix(self.indptr, self.indices, data, self.shape)
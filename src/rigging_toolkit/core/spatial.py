@@ -0,0 +1,233 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from rigging_toolkit.core.sparse import concatenate_ranges
+
+AXIS_INDEX = {"x": 0, "y": 1, "z": 2}
+
+# number of grid rings searched for nearest neighbours before falling back to a brute force search
+MAX_SEARCH_RINGS = 8
+
+# upper bound on the number of query x point distances computed at once by the brute force fallback
+CHUNK_ELEMENTS = 1 << 22
+
+
+class SpatialIndex(object):
+    """
+    Uniform grid hash over a fixed point set, built once and queried in batch.
+
+    Points are bucketed in cubic cells, each query only looks at the cells around it.
+    """
+
+    def __init__(self, points, cell_size=None):
+        # type: (np.ndarray, Optional[float]) -> None
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+        if not len(self.points):
+            raise ValueError("Cannot build a SpatialIndex without points")
+
+        self._origin = self.points.min(axis=0)
+        extent = self.points.max(axis=0) - self._origin
+
+        if cell_size is None:
+            # aim for a handful of points per occupied cell on a surface
+            area = max(extent[0] * extent[1], extent[1] * extent[2], extent[0] * extent[2], 1e-12)
+            cell_size = np.sqrt(area / len(self.points)) * 2.0
+        self.cell_size = max(float(cell_size), 1e-9)
+
+        cells = self._cells(self.points)
+        # one empty cell of padding on each side keeps neighbour keys unique
+        self._dims = cells.max(axis=0) + 3
+
+        keys = self._keys(cells)
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+
+    @property
+    def num_points(self):
+        # type: () -> int
+        return len(self.points)
+
+    def _cells(self, points):
+        # type: (np.ndarray) -> np.ndarray
+        return np.floor((points - self._origin) / self.cell_size).astype(np.int64) + 1
+
+    def _keys(self, cells):
+        # type: (np.ndarray) -> np.ndarray
+        cells = np.clip(cells, 0, self._dims - 1)
+        return (cells[:, 0] * self._dims[1] + cells[:, 1]) * self._dims[2] + cells[:, 2]
+
+    def _candidates(self, cells, offset, max_distances=None, queries=None):
+        # type: (np.ndarray, Tuple[int, int, int], Optional[np.ndarray], Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]
+        """
+        Return (query ids, point ids) for every point in the cell at offset from each query cell.
+
+        With max_distances, cells further away from their query than its max distance are skipped.
+        """
+        neighbour_cells = cells + np.asarray(offset, dtype=np.int64)
+        inside = np.all((neighbour_cells >= 0) & (neighbour_cells < self._dims), axis=1)
+        if max_distances is not None:
+            lower = self._origin + (neighbour_cells - 1) * self.cell_size
+            gaps = np.maximum(np.maximum(lower - queries, queries - lower - self.cell_size), 0.0)
+            inside &= np.linalg.norm(gaps, axis=1) <= max_distances
+        query_ids = np.nonzero(inside)[0]
+        keys = self._keys(neighbour_cells[query_ids])
+        starts = np.searchsorted(self._sorted_keys, keys, side="left")
+        stops = np.searchsorted(self._sorted_keys, keys, side="right")
+        point_ids = self._order[concatenate_ranges(starts, stops)]
+        return np.repeat(query_ids, stops - starts), point_ids
+
+    def _unsearched_distances(self, queries, cells, ring):
+        # type: (np.ndarray, np.ndarray, int) -> np.ndarray
+        """Lower bound of the distance from each query to the grid cells more than ring cells away from its cell."""
+        grid_lower = self._origin
+        grid_upper = self._origin + (self._dims - 2) * self.cell_size
+        result = np.full(len(queries), np.inf)
+        for axis in range(3):
+            for side in (-1, 1):
+                bound_cells = cells[:, axis] + side * (ring + 1)
+                exists = (bound_cells >= 1) & (bound_cells <= self._dims[axis] - 2)
+                lower = np.broadcast_to(grid_lower, queries.shape).copy()
+                upper = np.broadcast_to(grid_upper, queries.shape).copy()
+                plane = self._origin[axis] + (bound_cells - 1 + (side < 0)) * self.cell_size
+                if side > 0:
+                    lower[:, axis] = plane
+                else:
+                    upper[:, axis] = plane
+                gaps = np.maximum(np.maximum(lower - queries, queries - upper), 0.0)
+                distances = np.where(exists, np.linalg.norm(gaps, axis=1), np.inf)
+                np.minimum(result, distances, out=result)
+        return result
+
+    @staticmethod
+    def _shell_offsets(ring):
+        # type: (int) -> np.ndarray
+        """Cell offsets at exactly ring cells (chebyshev distance) from the center cell."""
+        span = np.arange(-ring, ring + 1)
+        offsets = np.stack(np.meshgrid(span, span, span, indexing="ij"), axis=-1).reshape(-1, 3)
+        return offsets[np.abs(offsets).max(axis=1) == ring]
+
+    def query_pairs(self, radius):
+        # type: (float) -> Tuple[np.ndarray, np.ndarray]
+        """Return every (i, j), i < j, pair of indexed points closer than radius."""
+        first, second = self.query_radius(self.points, radius)
+        keep = first < second
+        return first[keep], second[keep]
+
+    def query_radius(self, queries, radius):
+        # type: (np.ndarray, float) -> Tuple[np.ndarray, np.ndarray]
+        """
+        Return (query ids, point ids) of every indexed point within radius of each query,
+        sorted by query id.
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        cells = self._cells(queries)
+        rings = int(np.ceil(radius / self.cell_size))
+        span = np.arange(-rings, rings + 1)
+        offsets = np.stack(np.meshgrid(span, span, span, indexing="ij"), axis=-1).reshape(-1, 3)
+
+        query_result = []
+        point_result = []
+        for offset in offsets:
+            query_ids, point_ids = self._candidates(cells, offset)
+            distances = np.linalg.norm(queries[query_ids] - self.points[point_ids], axis=1)
+            close = distances <= radius
+            query_result.append(query_ids[close])
+            point_result.append(point_ids[close])
+
+        query_ids = np.concatenate(query_result)
+        point_ids = np.concatenate(point_result)
+        order = np.lexsort((point_ids, query_ids))
+        return query_ids[order], point_ids[order]
+
+    def query_nearest(self, queries, k=1):
+        # type: (np.ndarray, Optional[int]) -> Tuple[np.ndarray, np.ndarray]
+        """
+        Return the (num_queries, k) distances and indices of the k nearest indexed points.
+
+        Missing neighbours, when k is larger than the point count, have an index of -1.
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        num_queries = len(queries)
+        # queries outside of the grid start from the closest occupied cell, which keeps the ring bound valid
+        cells = np.clip(self._cells(queries), 1, self._dims - 2)
+
+        distances = np.full((num_queries, k), np.inf)
+        indices = np.full((num_queries, k), -1, dtype=np.int64)
+        active = np.arange(num_queries)
+
+        ring = 0
+        while len(active) and ring <= MAX_SEARCH_RINGS:
+            for offset in self._shell_offsets(ring):
+                # skip the offsets leaving the grid on every query, planar meshes only have one layer of cells
+                if np.any(np.abs(offset) > self._dims - 3):
+                    continue
+                query_ids, point_ids = self._candidates(
+                    cells[active], offset, max_distances=distances[active, -1], queries=queries[active]
+                )
+                query_ids = active[query_ids]
+                candidate_distances = np.linalg.norm(queries[query_ids] - self.points[point_ids], axis=1)
+                _merge_nearest(distances, indices, query_ids, point_ids, candidate_distances)
+
+            unsearched = self._unsearched_distances(queries[active], cells[active], ring)
+            active = active[distances[active, -1] > unsearched]
+            ring += 1
+
+        if len(active):
+            self._brute_force_nearest(queries, active, distances, indices)
+
+        return distances, indices
+
+    def _brute_force_nearest(self, queries, query_ids, distances, indices):
+        # type: (np.ndarray, np.ndarray, np.ndarray, np.ndarray) -> None
+        chunk = max(CHUNK_ELEMENTS // self.num_points, 1)
+        count = min(distances.shape[1], self.num_points)
+        for start in range(0, len(query_ids), chunk):
+            ids = query_ids[start:start + chunk]
+            all_distances = np.linalg.norm(queries[ids, np.newaxis] - self.points[np.newaxis], axis=2)
+            nearest = np.argpartition(all_distances, count - 1, axis=1)[:, :count]
+            nearest_distances = np.take_along_axis(all_distances, nearest, axis=1)
+            order = np.argsort(nearest_distances, axis=1)
+            distances[ids, :count] = np.take_along_axis(nearest_distances, order, axis=1)
+            indices[ids, :count] = np.take_along_axis(nearest, order, axis=1)
+
+    def mirror_indices(self, axis="x", tolerance=None):
+        # type: (Optional[str], Optional[float]) -> np.ndarray
+        """
+        Return the index of the point closest to the mirrored position of every indexed point.
+
+        When a tolerance is given, points whose mirrored position has no point within
+        tolerance get an index of -1.
+        """
+        mirrored = self.points.copy()
+        mirrored[:, AXIS_INDEX[axis.lower()]] *= -1.0
+        distances, indices = self.query_nearest(mirrored, k=1)
+        indices = indices[:, 0]
+        if tolerance is not None:
+            indices[distances[:, 0] > tolerance] = -1
+        return indices
+
+
+def _merge_nearest(distances, indices, query_ids, point_ids, candidate_distances):
+    # type: (np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray) -> None
+    """Merge candidate neighbours into the per query sorted (distances, indices) arrays in place."""
+    if not len(query_ids):
+        return
+    k = distances.shape[1]
+    touched = np.unique(query_ids)
+
+    all_queries = np.concatenate([np.repeat(touched, k), query_ids])
+    all_points = np.concatenate([indices[touched].ravel(), point_ids])
+    all_distances = np.concatenate([distances[touched].ravel(), candidate_distances])
+
+    order = np.lexsort((all_distances, all_queries))
+    all_queries, all_points, all_distances = all_queries[order], all_points[order], all_distances[order]
+
+    group_starts = np.searchsorted(all_queries, touched)
+    ranks = np.arange(len(all_queries)) - np.repeat(group_starts, np.diff(np.append(group_starts, len(all_queries))))
+    keep = ranks < k
+
+    rows = np.searchsorted(touched, all_queries[keep])
+    distances[touched[rows], ranks[keep]] = all_distances[keep]
+    indices[touched[rows], ranks[keep]] = all_points[keep]
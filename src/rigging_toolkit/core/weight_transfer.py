@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+import hashlib
+import logging
+
+import numpy as np
+
+from rigging_toolkit.core.closest_point import SurfaceCorrespondence, TriangleGrid
+from rigging_toolkit.core.mesh_topology import MeshTopology
+
+logger = logging.getLogger(__name__)
+
+# engine used by the worker processes of transfer_to_targets, set once per process
+_WORKER_TRANSFER = None  # type: Optional[WeightTransfer]
+
+
+def points_digest(points):
+    # type: (np.ndarray) -> str
+    """Hash of a point array, used to find the correspondences of a target that hasn't moved."""
+    points = np.ascontiguousarray(points, dtype=np.float64)
+    return hashlib.sha1(points.tobytes()).hexdigest()
+
+
+class WeightTransfer(object):
+    """
+    Closest point transfer of per vertex weights from a source mesh to any number of targets.
+
+    The source triangle grid is built once, the correspondences of every target are cached
+    by point positions so weights can be transferred again after edits without any search.
+    """
+
+    def __init__(self, points, triangles, cell_size=None):
+        # type: (np.ndarray, np.ndarray, Optional[float]) -> None
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self._cell_size = cell_size
+        self._grid = None  # type: Optional[TriangleGrid]
+        self._correspondences = {}  # type: Dict[str, SurfaceCorrespondence]
+
+    @classmethod
+    def from_topology(cls, topology, cell_size=None):
+        # type: (MeshTopology, Optional[float]) -> WeightTransfer
+        return cls(topology.points, topology.triangles(), cell_size=cell_size)
+
+    def __getstate__(self):
+        # the cache is not sent to worker processes
+        state = self.__dict__.copy()
+        state["_correspondences"] = {}
+        return state
+
+    @property
+    def grid(self):
+        # type: () -> TriangleGrid
+        if self._grid is None:
+            self._grid = TriangleGrid(self.points, self.triangles, cell_size=self._cell_size)
+        return self._grid
+
+    def correspondence(self, target_points):
+        # type: (np.ndarray) -> SurfaceCorrespondence
+        digest = points_digest(target_points)
+        correspondence = self._correspondences.get(digest)
+        if correspondence is None:
+            correspondence = self.grid.correspondence(target_points)
+            self._correspondences[digest] = correspondence
+        return correspondence
+
+    def add_correspondence(self, target_points, correspondence):
+        # type: (np.ndarray, SurfaceCorrespondence) -> None
+        """Register correspondences computed elsewhere, e.g. loaded from disk or by a worker process."""
+        self._correspondences[points_digest(target_points)] = correspondence
+
+    def clear_cache(self):
+        # type: () -> None
+        self._correspondences.clear()
+
+    def transfer(self, weights, target_points):
+        # type: (np.ndarray, np.ndarray) -> np.ndarray
+        """Interpolate a (num_source_vertices, n) weight matrix at the target points."""
+        return self.correspondence(target_points).interpolate(weights)
+
+    def transfer_to_targets(self, weights, targets, processes=None):
+        # type: (np.ndarray, Dict[str, np.ndarray], Optional[int]) -> Dict[str, np.ndarray]
+        """
+        Transfer the weights to every {name: target points}.
+
+        With processes the correspondences of the uncached targets are computed in a process pool,
+        the source is sent once to each worker. In a maya gui session the pool needs
+        multiprocessing.set_executable to point to mayapy.
+        """
+        missing = {
+            name: points for name, points in targets.items()
+            if points_digest(points) not in self._correspondences
+        }
+
+        if processes and processes > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(self,)) as pool:
+                names = list(missing)
+                results = pool.map(_worker_correspondence, [missing[name] for name in names])
+                for name, correspondence in zip(names, results):
+                    self.add_correspondence(missing[name], correspondence)
+                    logger.info(f"Computed the correspondences of {name}")
+
+        return {name: self.transfer(weights, points) for name, points in targets.items()}
+
+
+def _init_worker(transfer):
+    # type: (WeightTransfer) -> None
+    global _WORKER_TRANSFER
+    _WORKER_TRANSFER = transfer
+
+
+def _worker_correspondence(target_points):
+    # type: (np.ndarray) -> SurfaceCorrespondence
+    return _WORKER_TRANSFER.grid.correspondence(target_points)
@@ -1,5 +1,5 @@
 from rigging_toolkit.maya.rigging.eyes import build_eye_rig
-from rigging_toolkit.maya.utils.deformers.skincluster import import_skin_weights
+from rigging_toolkit.maya.utils.deformers.skincluster import import_skin_weights, get_skin_cluster, transfer_skin_weights
 from rigging_toolkit.maya.utils.deformers.general import deformers_by_type
 from rigging_toolkit.maya.shaders import setup_shaders
 from rigging_toolkit.maya.shapes.shape_graph import ShapeGraph
@@ -7,9 +7,10 @@ from rigging_toolkit.maya.assets.asset_manager import import_asset, import_chara
 from rigging_toolkit.maya.utils.rigging_utils import create_follicle_jnts_at_vertices
 from rigging_toolkit.maya.utils.mesh_utils import order_vertices_by_axis
 from rigging_toolkit.core import Context, find_latest, find_new_version
+from rigging_toolkit.core.config_store import ConfigStore
+from rigging_toolkit.core.build_plan import BuildPlan, FACE_RIG_IGNORED_ASSETS, WEIGHTS_SOURCE, plan_file
 from maya import cmds
-from typing import Optional
-import json
+from typing import List, Optional
 import time
 import logging
 
@@ -17,11 +18,21 @@ logger = logging.getLogger(__name__)
 
 class FaceRig(object):
 
-    def __init__(self, context, save_build=False):
-        # type: (Context, Optional[bool]) -> None
+    # asset whose weights are transferred to the weights_transfer_targets
+    WEIGHTS_SOURCE = WEIGHTS_SOURCE
+
+    def __init__(self, context, save_build=False, plan=None, weights_transfer_targets=None):
+        # type: (Context, Optional[bool], Optional[BuildPlan], Optional[List[str]]) -> None
+        """
+        When a plan of BuildPlanner.plan_face_rig is given, the shapes and weights are built from it.
+        Assets without a weights xml are left unskinned, unless listed in weights_transfer_targets.
+        """
         self.context = context
         self._save_build = save_build
+        self.plan = plan
+        self.weights_transfer_targets = list(weights_transfer_targets or [])
         self._assets = []
+        self.configs = ConfigStore.of(context)
         self.build()
         if self._save_build:
             self.save()
@@ -31,7 +42,7 @@ class FaceRig(object):
         cmds.file(new=True, f=True)
         self.import_assets()
         self.import_body_rig()
-        ShapeGraph(self.context, load_neutral=False)
+        ShapeGraph(self.context, load_neutral=False, plan=self.plan)
         self.import_teeth_eyes_module()
         self.import_UI()
         self.setup_UI()
@@ -92,58 +103,66 @@ class FaceRig(object):
     def import_assets(self):
         # type: () -> None
 
-        assets = import_character_assets(self.context, ignore_list=["eyelashes", "baseBody"], return_nodes=True)
+        assets = import_character_assets(self.context, ignore_list=FACE_RIG_IGNORED_ASSETS, return_nodes=True)
         assets = [x.replace("|", "") for x in assets if "Shape" not in x]
         self._assets.extend(assets)
         setup_shaders(self.context)
 
     def import_weights(self):
         # type: () -> None
+        if self.plan is not None:
+            for op in self.plan.of_kind("import_weights"):
+                if op.name in self._assets:
+                    import_skin_weights(op.name, plan_file(self.context, op.inputs[0]))
+            self.transfer_weights([op.name for op in self.plan.of_kind("transfer_weights") if op.name in self._assets])
+            return
+
+        unweighted = []
         for asset in self._assets:
             weights_path = self.context.rigs_path / "weights"
             weights, _ = find_latest(weights_path, asset, "xml")
             if weights is None:
+                if asset in self.weights_transfer_targets:
+                    unweighted.append(asset)
                 continue
             import_skin_weights(asset, weights)
 
+        self.transfer_weights(unweighted)
+
+    def transfer_weights(self, assets):
+        # type: (List[str]) -> None
+        targets = [x for x in assets if x != self.WEIGHTS_SOURCE]
+        if not targets or not cmds.objExists(self.WEIGHTS_SOURCE) or not get_skin_cluster(self.WEIGHTS_SOURCE):
+            return
+        # the source triangle grid is built once and shared by all the targets
+        transfer_skin_weights(self.WEIGHTS_SOURCE, targets)
+
     def setup_UI(self):
         # type: () -> None
 
-        data_path = self.context.rigs_path / "data"
-
-        ui_setup_json, _ = find_latest(data_path, "ui_setup", "json")
+        ui_setup = self.configs.ui_setup()
+        if ui_setup is None:
+            return
 
         blendshape = deformers_by_type("geo_head_L1", "blendShape")[0]
-        
-        with open(ui_setup_json, "r") as f:
-            data = json.load(f)
-
-        for connection in data["shape_connections"]:
-            for shp, values in connection.items():
-                cmds.setDrivenKeyframe(blendshape, at=shp, v=0, dv=values["neutral_value"], cd=f"{values['control']}.{values['axis']}", itt="linear", ott="linear")
-                cmds.setDrivenKeyframe(blendshape, at=shp, v=1, dv=values["driver_value"], cd=f"{values['control']}.{values['axis']}", itt="linear", ott="linear")
-
-        for connection in data["joint_connections"]:
-            for jnt, values in connection.items():
-                cmds.setDrivenKeyframe(jnt, at=values["jnt_axis"], v=values["neutral_jnt_value"], dv=values["neutral_value"], cd=f"{values['control']}.{values['axis']}", itt="linear", ott="linear")
-                cmds.setDrivenKeyframe(jnt, at=values["jnt_axis"], v=values["driver_jnt_value"], dv=values["driver_value"], cd=f"{values['control']}.{values['axis']}", itt="linear", ott="linear")
+
+        for c in ui_setup.shape_connections:
+            cmds.setDrivenKeyframe(blendshape, at=c.target, v=0, dv=c.neutral_value, cd=f"{c.control}.{c.axis}", itt="linear", ott="linear")
+            cmds.setDrivenKeyframe(blendshape, at=c.target, v=1, dv=c.driver_value, cd=f"{c.control}.{c.axis}", itt="linear", ott="linear")
+
+        for c in ui_setup.joint_connections:
+            cmds.setDrivenKeyframe(c.joint, at=c.joint_axis, v=c.neutral_joint_value, dv=c.neutral_value, cd=f"{c.control}.{c.axis}", itt="linear", ott="linear")
+            cmds.setDrivenKeyframe(c.joint, at=c.joint_axis, v=c.driver_joint_value, dv=c.driver_value, cd=f"{c.control}.{c.axis}", itt="linear", ott="linear")
         
 
     def setup_eyebrows(self):
         # type: () -> None
-        data_path = self.context.rigs_path / "data"
-
-        eyebrow_json, _ = find_latest(data_path, "eyebrow_data", "json")
-
-        with open(eyebrow_json, "r") as f:
-            data = json.load(f)
-
-        main_key = list(data.keys())[0]
-
-        lower_keys_dict = data[main_key]
+        eyebrows = self.configs.eyebrows()
+        if eyebrows is None:
+            return
 
-        mesh = lower_keys_dict["mesh"]
-        vertices = lower_keys_dict["vertices"]
+        mesh = eyebrows.mesh
+        vertices = list(eyebrows.vertices)
 
         left_vertices, right_vertices = order_vertices_by_axis(vertices)
 
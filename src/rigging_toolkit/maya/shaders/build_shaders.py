@@ -1,11 +1,11 @@
 from maya import cmds
 from rigging_toolkit.maya.utils import import_node_network, export_node_network, get_shaders_from_meshes, assign_shader
-from rigging_toolkit.core import Context, find_new_version, find_file, find_latest
+from rigging_toolkit.core import Context, find_new_version, find_latest
+from rigging_toolkit.core.config_store import ConfigStore
 from dataclasses import dataclass, field, asdict, fields
 from typing import List, Dict, Optional
 from rigging_toolkit.core.filesystem import Path
 import logging
-import json
 
 logger = logging.getLogger(__name__)
 
@@ -54,13 +54,11 @@ def import_shader(file_path):
 
 def setup_shaders(context):
     # type: (Context) -> None
-    shader_json = find_file(context.config_path, "setup_shaders", "json")
-    if shader_json is None:
+    shader_setup = ConfigStore.of(context).shaders()
+    if shader_setup is None:
         return
-    with open(str(shader_json)) as f:
-        setup_data = json.load(f)
 
-    for shader in setup_data.keys():
+    for shader in shader_setup.shaders:
         shader_file, _ = find_latest(context.shaders_path, shader, "json")
         import_shader(shader_file)
 
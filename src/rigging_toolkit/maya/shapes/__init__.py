@@ -1,7 +1,10 @@
-from .shapes_manager import export_blendshapes, import_shapes, export_shapes
+from .shapes_manager import export_blendshapes, import_shapes, export_shapes, export_shape_pack, import_shape_pack, load_shape_pack
 
 __all__ = [
     "export_blendshapes",
     "import_shapes",
-    "export_shapes"
+    "export_shapes",
+    "export_shape_pack",
+    "import_shape_pack",
+    "load_shape_pack",
 ]
\ No newline at end of file
@@ -1,25 +1,41 @@
 from maya import cmds
+import maya.api.OpenMaya as om2
 import re
 from collections import OrderedDict
 from rigging_toolkit.core.context import Context
 import logging
-from rigging_toolkit.core.filesystem import find_latest
-from rigging_toolkit.maya.utils import import_asset, add_blendshape_target, list_shapes, activate_blendshape_targets, reset_blendshape_targets, import_weight_map, delete_history, add_blendshape_targets
-from itertools import combinations
-from rigging_toolkit.maya.utils.delta import ExtractCorrectiveDelta
+from rigging_toolkit.core.filesystem import Path, find_latest
+from rigging_toolkit.maya.utils import import_asset, list_shapes, reset_blendshape_targets, delete_history, add_empty_blendshape_targets
+from rigging_toolkit.maya.utils.deformers.blendshape import read_target_data, write_target_data
+from rigging_toolkit.maya.utils.weightmap import WeightMap
+from rigging_toolkit.core.delta_stack import DeltaStack, WeightMapStack
+from rigging_toolkit.core.shape_lattice import ShapeLattice, shape_components, solve_combination_correctives, strip_shape_name
+from rigging_toolkit.core.corrective import sparse_offsets
+from rigging_toolkit.core.build_cache import BuildCache, combine_digests, file_digest
+from rigging_toolkit.core.config_store import ConfigStore
+from rigging_toolkit.core.build_plan import (
+    FULL_SPLIT_DIGEST, FULL_SPLIT_MASK, SHAPES_IGNORE_LIST, BuildPlan, plan_file, plan_splits, shape_graph_cache_path
+)
+from rigging_toolkit.core.weight_transfer import points_digest
+from rigging_toolkit.maya.utils.mesh_utils import get_mesh_points
 import json
 import os
-from typing import Optional
+import numpy as np
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 class ShapeGraph(object):
 
-    def __init__(self, context, load_neutral=True):
-        # type: (Context, Optional[bool]) -> None
+    def __init__(self, context, load_neutral=True, use_cache=True, plan=None):
+        # type: (Context, Optional[bool], Optional[bool], Optional[BuildPlan]) -> None
+        """When a plan of the BuildPlanner is given, the shapes, files and splits are read from it instead of being resolved again"""
 
         self.context = context
         self.load_neutral = load_neutral
+        self.use_cache = use_cache
+        self.plan = plan
+        self.configs = ConfigStore.of(context)
         self.shape_dic = { 
                         "base_shapes": {"": ""},
                         "combo_shapes": {"": ""}
@@ -32,27 +48,34 @@ class ShapeGraph(object):
         self.missing_base_shapes = []
         self.missing_base_shapes_from_combos = []
         self.expression_component_list = [] 
-        self.used_base_shapes = []
-        self.used_combo_shapes = []
+        self.lattice = None  # type: Optional[ShapeLattice]
         self.neutral = None
         self.blendshape = None
         self.full_shapes_grp = None
-        self._ignore_list = ["_archive"]
+        self._ignore_list = list(SHAPES_IGNORE_LIST)
         self.full_shapes_grp = "full_shapes_grp"
-        self.splitted_face_blendshapes_grp = cmds.group(n='splitted_face_blendshapes', em=True, w=True)
-        self.splitted_face_corrective_blendshapes_grp = cmds.group(n='splitted_face_corrective_blendshapes', em=True, w=True)
-        cmds.parent(self.splitted_face_corrective_blendshapes_grp, self.splitted_face_blendshapes_grp)
+        self.split_deltas = []  # type: List[DeltaStack]
+        self._split_names = set()
+        self._masks = {}  # type: Dict[str, WeightMap]
+        self._mask_paths = {}  # type: Dict[str, Path]
+        self._mask_digests = {FULL_SPLIT_MASK: FULL_SPLIT_DIGEST}  # type: Dict[str, str]
+
+        # digests of the inputs of every shape and produced target, they key the build caches
+        self.shape_digests = {}  # type: Dict[str, str]
+        self.target_digests = {}  # type: Dict[str, str]
+        self.split_digests = {}  # type: Dict[str, str]
+        self.changed_shapes = []  # type: List[str]
 
         self.retrieve_shapes()
         self.connect_expression()
         self.disable_viewport(disable_viewport=False)
 
     def retrieve_shapes(self):
-        shapes_path = self.context.shapes_path
-        for shape in shapes_path.iterdir():
-            if shape.stem in self._ignore_list:
-                continue
-            shape = shape.stem.replace("_L1", "")
+        if self.plan is not None:
+            shape_names = self.plan.metadata["shapes"]
+        else:
+            shape_names = [x.stem.replace("_L1", "") for x in self.context.shapes_path.iterdir() if x.stem not in self._ignore_list]
+        for shape in shape_names:
             self.analyse_shape(shape)
 
         # clean up of the empty key:value pair from initilisation
@@ -63,6 +86,9 @@ class ShapeGraph(object):
         logger.info(self.shape_dic["base_shapes"])
         logger.info(self.shape_dic["combo_shapes"])
 
+        self.lattice = ShapeLattice(
+            list(self.shape_dic["base_shapes"].values()) + list(self.shape_dic["combo_shapes"].values())
+        )
         self._evaluate_base_shapes()
         self._find_graph_children()
 
@@ -79,68 +105,25 @@ class ShapeGraph(object):
         del self.missing_base_shapes[:]
         del self.missing_base_shapes_from_combos[:]
         
-        for shape in self.shape_dic["combo_shapes"].values():
-            # find all the components in the combo shapes
-            
-            combo_component = self.get_shape_components(shape)
-            for component in combo_component:
-                component = 'shp_{}'.format(component)
-                if component in self.shape_dic["base_shapes"].values():
-                    pass
-                else:
-                    self.missing_base_shapes.append(component)
-                    self.missing_base_shapes_from_combos.append(shape) 
-
-        if self.missing_base_shapes is not []:
+        for shape in self.lattice.combo_shapes:
+            # find the components of the combo shapes without a base shape
+            for component in self.lattice.missing_components(shape):
+                self.missing_base_shapes.append('shp_{}'.format(component))
+                self.missing_base_shapes_from_combos.append(shape)
+
+        if self.missing_base_shapes:
             
-            self.remove_duplicates_from_list(self.missing_base_shapes)
+            self.missing_base_shapes = self.remove_duplicates_from_list(self.missing_base_shapes)
             logger.warning('the following base shapes: {} are used in combo shapes, but are missing in the shapes folder.'. format(self.missing_base_shapes))
             logger.warning('the following combo shapes: {} have missing components.'. format(self.missing_base_shapes_from_combos))
 
     def _find_graph_children(self):
         
-        for shape in self.shape_dic["combo_shapes"].values():     
-            child_shape_components = self.get_shape_components(shape)
-            
-            for component in child_shape_components:
-                shp_component = 'shp_{}'.format(component)
-                if shp_component in self.shape_dic["base_shapes"].values():
-                    self.used_base_shapes.append(shp_component) 
-
-            # find all the posible children to the active child components
-            number_of_combinations = len(child_shape_components) -1
-            if number_of_combinations <= 1:
-                pass
-            else:
-                parent_shapes = [x for x in combinations(child_shape_components, number_of_combinations)]
-                
-                parent_shapes_list = []
-                del parent_shapes_list[:]
-                
-                for index in range(2, number_of_combinations + 1):
-                    parent_shapes = [x for x in combinations(child_shape_components, index)]
-                    
-                    parent_shapes_list.extend(parent_shapes)
-                
-                for i in parent_shapes_list:
-                    parent_shape = self.convert_tuple_to_list(i)
-                    parent_shape = '_'.join(parent_shape)
-                    parent_shape = 'shp_{}'.format(parent_shape)
-                    if parent_shape in self.shape_dic["combo_shapes"].values():
-                        if parent_shape == shape:
-                            pass
-                        else:                   
-                            self.used_combo_shapes.extend([parent_shape])
-                                                                   
-            if len(child_shape_components) is not len(self.used_base_shapes):
-                del self.used_base_shapes[:]
-                    
-            if self.used_base_shapes is not []:
-                corrective_list = self.used_base_shapes + self.used_combo_shapes
-                self.combo_shape_dic["corrective_shapes"].update({shape:corrective_list})
-            
-            del self.used_base_shapes[:] 
-            del self.used_combo_shapes[:]
+        for shape in self.lattice.combo_shapes:
+            # the base shapes only drive the corrective when every component has one
+            base_shapes = [] if self.lattice.missing_components(shape) else self.lattice.base_shapes_of(shape)
+            corrective_list = base_shapes + self.lattice.sub_combinations(shape)
+            self.combo_shape_dic["corrective_shapes"].update({shape:corrective_list})
         
         logger.info('Processing corrective shapes....')    
         logger.info(self.combo_shape_dic)
@@ -185,296 +168,197 @@ class ShapeGraph(object):
         
         self.full_shapes_grp = cmds.createNode("transform", n="full_shapes_grp")
 
-        for _base_shp, shp in self.shape_dic["base_shapes"].items():
-            
-            latest_file, _ = find_latest(self.context.shapes_path / f"{shp}_L1", f"{shp}_L1", "abc")
-            print(self.context.shapes_path / f"{shp}_L1")
-            print(latest_file)
-            asset = import_asset(latest_file)[0]
-            print(asset)
-            add_blendshape_target(blendshape=self.blendshape, target=asset)
-            cmds.parent(f"{shp}_L1", self.full_shapes_grp)
-
-        for _combo_shp, combo_shp in self.shape_dic["combo_shapes"].items():
-            child_components = self.get_shape_components(combo_shp)
-            pattern = [c for c in child_components if 'shp_{}'.format(c) in self.missing_base_shapes]
-            if pattern:
-                pass
-            else:
-                latest_file, _ = find_latest(self.context.shapes_path / f"{combo_shp}_L1", f"{combo_shp}_L1", "abc")
-                print(self.context.shapes_path / f"{combo_shp}_L1")
-                asset = import_asset(latest_file)[0]
-                cmds.parent(f"{combo_shp}_L1", self.full_shapes_grp)  
-
-        sorted_combo_shapes_keys = sorted(self.shape_dic["combo_shapes"].values(), key=len)
-        completed_correctives = []
-        for combo_shp in sorted_combo_shapes_keys:
-            if combo_shp in completed_correctives:
-                continue
-            completed_correctives.append(combo_shp)
-            self.corrective_shape = self.calculate_delta(combo_shp)
-            if self.corrective_shape is None:
-                continue
-            if isinstance(self.corrective_shape, list):
-                add_blendshape_target(self.blendshape, self.corrective_shape[0])
-            else:
-                add_blendshape_target(self.blendshape, self.corrective_shape)
+        shapes = [shape for shape in self.lattice.evaluation_order() if not self.lattice.missing_components(shape)]
+        full_shapes = self.load_full_shapes(shapes)
+
+        base_shapes = [shape for shape in shapes if not self.lattice.is_combo(shape)]
+        base_targets = [f"{shape}_L1" for shape in base_shapes]
+        self.target_digests.update(zip(base_targets, [self.shape_digests[shape] for shape in base_shapes]))
+        write_target_data(self.blendshape, full_shapes[base_shapes].renamed(base_targets), create_missing=True)
+
+        self.solve_correctives(full_shapes)
             
         # cmds.delete(self.full_shapes_grp)
 
-    def calculate_delta(self, shape):
-        sorted_correction_shapes_keys = sorted(self.combo_shape_dic["corrective_shapes"].keys(), key=len)       
-        for key in sorted_correction_shapes_keys:        
-            if key in self.combo_shape_dic["corrective_shapes"] and key == shape:
-                
-                logger.info(f'calculate delta for shape {key}')   
-                logger.info(f'calculate using the shapes: {self.combo_shape_dic["corrective_shapes"][key]}') 
-                neutral_calculate_delta = cmds.duplicate(self.neutral, name=f'neutral_calculate_{key}')[0]
-                cmds.parent(neutral_calculate_delta, self.full_shapes_grp)
-                print(key)
-                
-                self.delta_bs_name = cmds.blendShape(neutral_calculate_delta, n=f'bs_calculate_delta_{key}')[0]
-                # add_blendshape_targets(self.delta_bs_name, "[f"{x}_L1" for x in self.combo_shape_dic["corrective_shapes"][key]]")
-                add_blendshape_target(self.delta_bs_name, f"{key}_L1")
-
-                target_shapes = self.combo_shape_dic["corrective_shapes"][key]
-
-                if len(self.combo_shape_dic["corrective_shapes"][key]) == 2:
-                    for corrective_shape in self.combo_shape_dic["corrective_shapes"][key]:
-                        add_blendshape_target(self.delta_bs_name, f"{corrective_shape}_L1")
-                        cmds.setAttr("{}.{}".format(self.delta_bs_name, f"{key}_L1"), 1)
-                        cmds.setAttr("{}.{}".format(self.delta_bs_name, f"{corrective_shape}_L1"), -1)
-                    self.corrective_shape = cmds.duplicate(neutral_calculate_delta, name= 'delta_{}_L1'.format(key))[0]
-                    
-                elif len(self.combo_shape_dic["corrective_shapes"][key]) > 2:
-
-                    for corrective_shape in (self.combo_shape_dic["corrective_shapes"][key]):
-                        component = self.get_shape_components(corrective_shape)
-                        if len(component) == 1:
-                            # this handles all the core shapes
-                            cmds.setAttr("{}.{}".format(self.delta_bs_name, f"{key}_L1"), 1)
-                            add_blendshape_target(self.delta_bs_name, f"{corrective_shape}_L1")
-                            cmds.setAttr("{}.{}".format(self.delta_bs_name, f"{corrective_shape}_L1"), -1)
-                            
-                        if len(component) >=2:
-                            # this adds all the combo shapes
-                            corrective_shape = 'delta_{}'.format(f"{corrective_shape}_L1")
-                            add_blendshape_target(self.delta_bs_name, f"{corrective_shape}")
-                            cmds.setAttr("{}.{}".format(self.delta_bs_name, f"{corrective_shape}"), -1)
-                        else:
-                            pass
-
-                    self.corrective_shape = cmds.duplicate(neutral_calculate_delta, name= 'delta_{}_L1'.format(key))[0]
-
-                # if target_shapes:
-                #     print([f"{x}_L1" for x in self.combo_shape_dic["corrective_shapes"][key]])
-                #     activate_blendshape_targets(self.delta_bs_name, [f"{x}_L1" for x in self.combo_shape_dic["corrective_shapes"][key]])
-
-                #     self.corrective_shape = ExtractCorrectiveDelta.calculate(neutral_calculate_delta, f"{key}_L1")
-                                            
-                #     self.corrective_shape = cmds.duplicate(neutral_calculate_delta, name= 'delta_{}_L1'.format(key))[0]
-
-                #     reset_blendshape_targets(self.delta_bs_name)
-
-                else:
-                    pass
-            else:
-                pass
-        
-        return self.corrective_shape
+    @property
+    def cache_path(self):
+        # type: () -> Path
+        return shape_graph_cache_path(self.context)
+
+    def _build_cache(self, name):
+        # type: (str) -> Optional[BuildCache]
+        return BuildCache(self.cache_path, name) if self.use_cache else None
+
+    def load_full_shapes(self, shapes):
+        # type: (List[str]) -> DeltaStack
+        """
+        Full deltas of the shapes from their latest abc, relative to the neutral. Only the shapes whose
+        file or neutral changed since the last build are imported, the others come from the build cache.
+        """
+        neutral_points = get_mesh_points(self.neutral, om2.MSpace.kObject)
+        neutral_digest = points_digest(neutral_points)
+        files = {}
+        if self.plan is not None:
+            files.update((op.name, plan_file(self.context, op.inputs[0])) for op in self.plan.of_kind("load_shape"))
+        for shape in shapes:
+            if files.get(shape) is None:
+                files[shape], _ = find_latest(self.context.shapes_path / f"{shape}_L1", f"{shape}_L1", "abc")
+            self.shape_digests[shape] = combine_digests([neutral_digest, file_digest(files[shape])])
+        digests = {shape: self.shape_digests[shape] for shape in shapes}
+
+        cache = self._build_cache("full_shapes")
+        cached = set(cache.reusable(digests)) if cache else set()
+        self.changed_shapes = [shape for shape in shapes if shape not in cached]
+        logger.info(f"importing {len(self.changed_shapes)} of {len(shapes)} shapes, the others are unchanged")
+
+        indices, offsets = [], []
+        for shape in self.changed_shapes:
+            logger.debug(f"importing {files[shape]}")
+            import_asset(files[shape])
+            cmds.parent(f"{shape}_L1", self.full_shapes_grp)
+            vertex_ids, shape_offsets = sparse_offsets(get_mesh_points(f"{shape}_L1", om2.MSpace.kObject) - neutral_points)[0]
+            indices.append(vertex_ids)
+            offsets.append(shape_offsets)
+        stacks = [DeltaStack.from_arrays(self.changed_shapes, indices, offsets, vertex_count=len(neutral_points))]
+        if cached:
+            stacks.append(cache.get([shape for shape in shapes if shape in cached]))
+
+        full_shapes = DeltaStack.concatenate(stacks)[shapes]
+        if cache and (self.changed_shapes or cache.inputs.get("neutral") != neutral_digest):
+            cache.save(digests, full_shapes, inputs={"neutral": neutral_digest})
+        return full_shapes
+
+    def solve_correctives(self, full_shapes):
+        # type: (DeltaStack) -> List[str]
+        """
+        Solve the corrective of every combo, each combo minus the correctives of all the shapes it contains,
+        and write them to the blendshape as delta_ targets. Only the dirty sub lattice, the combos containing
+        a changed shape, is solved, the other correctives come from the build cache.
+        """
+        # the corrective of a combo changes with its own shape or any shape it contains
+        digests = {}  # type: Dict[str, str]
+        for shape in self.lattice.evaluation_order():
+            if shape in full_shapes:
+                digests[shape] = combine_digests(
+                    [self.shape_digests[shape]] + [digests[sub] for sub in self.lattice.sub_shapes(shape) if sub in digests]
+                )
+        combos = [shape for shape in full_shapes.names if self.lattice.is_combo(shape)]
+        combo_digests = {combo: digests[combo] for combo in combos}
+
+        cache = self._build_cache("correctives")
+        cached = set(cache.reusable(combo_digests)) if cache else set()
+        dirty = [combo for combo in combos if combo not in cached]
+        logger.info(f"solving {len(dirty)} of {len(combos)} correctives, the others are unchanged")
+
+        # the dirty combos need the full deltas of all the shapes they contain
+        needed = set(dirty).union(*[self.lattice.sub_shapes(combo) for combo in dirty])
+        needed = [shape for shape in full_shapes.names if shape in needed]
+        solved = solve_combination_correctives(full_shapes[needed], ShapeLattice(needed))
+        stacks = [solved[dirty]]
+        if cached:
+            stacks.append(cache.get([combo for combo in combos if combo in cached]))
+        correctives = DeltaStack.concatenate(stacks, vertex_count=full_shapes.vertex_count)[combos]
+        if cache and dirty:
+            cache.save(combo_digests, correctives)
+
+        for combo in dirty:
+            logger.info(f'calculate delta for shape {combo}')
+            logger.info(f'calculate using the shapes: {self.combo_shape_dic["corrective_shapes"].get(combo)}')
+        targets = ['delta_{}_L1'.format(combo) for combo in combos]
+        self.target_digests.update(zip(targets, [combo_digests[combo] for combo in combos]))
+        return write_target_data(self.blendshape, correctives.renamed(targets), create_missing=True)
     
     def assign_splitting_groups(self):
 
-        splitting_json, _ = find_latest(self.context.rigs_path / "data", "face", "json")
-        with splitting_json.open() as f:
-            data = json.load(f)
-
-        shape_splitting_data = list(data.keys())[0]
-        self.splitting_neutral = self.import_splitting_neutral()
-        # self.split_bs_name = blendshape.create_blendshape(self.splitting_neutral, 'splitting_bs')
-        self.split_blendshape = cmds.blendShape(self.splitting_neutral, n="splitting_bs")[0]
-        # blendshape.add_blendshape_target(self.split_bs_name, self.splitting_neutral, self.neutral, index=0)
-        add_blendshape_target(self.split_blendshape, self.neutral)
-        cmds.blendShape(self.split_blendshape, edit=True, w=[(0, 1)])
-        split_target = self.neutral.replace("|", "")
-        cmds.setAttr(f"{self.split_blendshape}.{split_target}", 1)
-        print(f"data = {data[shape_splitting_data]}")
-        for i in data[shape_splitting_data]:
-            splitting_group, split_values = next(iter(i.items()))
-            print(splitting_group)
-            print(self.shape_dic["base_shapes"].values())
-            shapes = [x.replace("_L1", "") for x in i.get("shapes", [])]
-            for shape in self.shape_dic["base_shapes"].values():
-                if shape in shapes:
-                    print("shape in shapes")
-                    self.split_shape(shape, splitting_group)
-
-    def import_splitting_neutral(self):
-        latest_splitting_mesh, _ = find_latest(self.context.assets_path / "head" / "meshes", "geo_head_S1", "abc")
-        if latest_splitting_mesh is None:
-            latest_splitting_mesh, _ = find_latest(self.context.assets_path / "head" / "meshes", "geo_head_L1", "abc")
-
-            splitting_mesh = import_asset(latest_splitting_mesh)[0]
-            splitting_mesh = cmds.rename(splitting_mesh, "geo_head_S1")
-            print(splitting_mesh)
-            return splitting_mesh
-        splitting_mesh = import_asset(latest_splitting_mesh)[0]
-        return splitting_mesh
-    
+        if self.plan is not None:
+            splits = []
+            for op in self.plan.of_kind("split"):
+                target, mask, mask_file = op.inputs
+                if mask_file:
+                    self._mask_paths.setdefault(mask, plan_file(self.context, mask_file))
+                splits.append((target, mask, op.name))
+            self._create_splits([split for split in splits if split[2] not in self._split_names])
+            return
+
+        face_config = self.configs.face()
+        if face_config is None:
+            return
+        for shape in self.shape_dic["base_shapes"].values():
+            for group in face_config.shape_groups(f"{shape}_L1"):
+                self.split_shape(shape, group.name)
+
+    def _mask_path(self, mask):
+        # type: (str) -> Path
+        """The latest msk_{mask} weight map file of the utilities, with the digest of its content"""
+        if mask not in self._mask_paths:
+            self._mask_paths[mask], _ = find_latest(self.context.utilities_path / "masks", f"msk_{mask}", "wmap")
+        if mask not in self._mask_digests:
+            self._mask_digests[mask] = file_digest(self._mask_paths[mask])
+        return self._mask_paths[mask]
+
+    def _mask(self, mask):
+        # type: (str) -> WeightMap
+        """The latest msk_{mask} weight map of the utilities, loaded once"""
+        if mask not in self._masks:
+            mask_path = self._mask_path(mask)
+            with open(str(mask_path), "r") as f:
+                self._masks[mask] = WeightMap.load(json.load(f))
+            logger.info('using the map {}'.format(mask_path))
+        return self._masks[mask]
+
     def split_shape(self, shape, splitting_group):
         
         # splitting shapes
         facial_bs_targets = list_shapes(self.blendshape)
-        match = [x for x in facial_bs_targets if x == f"{shape}_L1"]
-        print("splitting_shape...")
-        print(shape)
-        print(splitting_group)
-        print(match)
-        corrective_matches = [x for x in facial_bs_targets if match[0].replace("shp_", "").replace("_L1", "") in x]
-        print(match)
-        print(corrective_matches)
-
-        splitting_json, _ = find_latest(self.context.rigs_path / "data", "face", "json")
-        with splitting_json.open() as f:
-            data = json.load(f)
-
-        mask_splitting_data = list(data.keys())[0]
-        
-        for corrective_match in corrective_matches:
-            logger.info('process Shape_Splitting:__{}__'.format(corrective_match))
-
-            for target in facial_bs_targets:
-                cmds.setAttr('{}.{}'.format(self.blendshape, target), 0)
-            # only activate the matching target    
-            cmds.setAttr('{}.{}'.format(self.blendshape, corrective_match), 1)
-            
-            # issue two
-            valid_splitting_groups = self.get_corrective_shape_splitting_group(corrective_match, splitting_group)
-            logger.info('{} __splitted__ {}'.format( corrective_match, valid_splitting_groups))
-            logger.info('starting:__...__')
-            for i in data[mask_splitting_data]:
-                splitting_group, masks = next(iter(i.items()))
-                shapes = i.get("shapes", [])
-                
-                if not splitting_group == valid_splitting_groups:
-                    print(f"Not this mask group {splitting_group}")
-                    continue
-                print(f"valid splitting groups: {valid_splitting_groups}\nsplitting group: {splitting_group}")
-                if masks:
-                    for mask in masks:
-                        shp = f"{corrective_match}_x{mask}"
-                        if cmds.objExists(shp):
-                            continue
-                        mask_path, _ = find_latest(self.context.utilities_path / "masks", f"msk_x{mask}", "wmap")
-                        full_mask_path, _ = find_latest(self.context.utilities_path / "masks", "msk_xFull", "wmap")
-                        import_weight_map(self.split_blendshape, self.neutral.replace("|", ""), mask_path)
-                        logger.info('splitted {} from {}'.format(corrective_match,valid_splitting_groups))
-                        logger.info('using the map {}'.format(mask_path))
-                        # duplicate the splitted shape
-                        cmds.setAttr(f'{self.splitting_neutral}.visibility', 0)
-                        split_target = cmds.duplicate(self.splitting_neutral, n=shp)[0]
-                        import_weight_map(self.split_blendshape, self.neutral.replace("|", ""), full_mask_path)
-                        if 'delta_' in split_target:
-                            cmds.parent(split_target, self.splitted_face_corrective_blendshapes_grp)
-                            logger.info('finished splitting:__{}__'.format(split_target))
-                            logger.info('__...__')
-                        else:
-                            cmds.parent(split_target, self.splitted_face_blendshapes_grp)
-                            logger.info('finished splitting:__{}__'.format(split_target))
-                            logger.info('__...__')
-                elif splitting_group == "full_split" and not masks:
-                    shp = f"{corrective_match}_xFullShape"
-                    if cmds.objExists(shp):
-                        continue
-                    split_target = cmds.duplicate(self.splitting_neutral, n='{}_xFullShape'.format(corrective_match))[0]
-                    if 'delta_' in split_target:
-                            cmds.parent(split_target, self.splitted_face_corrective_blendshapes_grp)
-                            logger.info('finished splitting:__{}__'.format(split_target))
-                            logger.info('__...__')
-                    else:
-                        cmds.parent(split_target, self.splitted_face_blendshapes_grp)
-                        logger.info('finished splitting:__{}__'.format(split_target))
-                        logger.info('__...__')
-
-            for target in facial_bs_targets:
-                cmds.setAttr('{}.{}'.format(self.blendshape, target), 0)
+        logger.info(f"splitting {shape}, {splitting_group}")
+
+        # collect every (shape, mask) split first, they are all computed in one pass on the deltas
+        splits = plan_splits(self.configs.face(), self.lattice, facial_bs_targets, shape, self._split_names)
+        for target, _, split_name in splits:
+            logger.info('splitted {} into {}'.format(target, split_name))
+        self._create_splits(splits)
+
+    def _create_splits(self, splits):
+        # type: (List[tuple]) -> None
+        """Split the (target, mask, split name) of the splits, the ones unchanged since the last build come from the build cache"""
+        if not splits:
+            return
+        pairs = [(target, mask) for target, mask, _ in splits]
+        split_names = [split_name for _, _, split_name in splits]
+
+        # a split changes with its target or its mask, the unchanged ones come from the build cache
+        for (target, mask), split_name in zip(pairs, split_names):
+            if mask != FULL_SPLIT_MASK:
+                self._mask_path(mask)
+            self.split_digests[split_name] = combine_digests([self.target_digests[target], self._mask_digests[mask]])
+        cache = self._build_cache("splits")
+        cached = set(cache.reusable({name: self.split_digests[name] for name in split_names})) if cache else set()
+        if cached:
+            self.split_deltas.append(cache.get([name for name in split_names if name in cached]))
+        pairs, split_names = (
+            [pair for pair, name in zip(pairs, split_names) if name not in cached],
+            [name for name in split_names if name not in cached],
+        )
+        self._split_names.update(cached)
+
+        if pairs:
+            deltas = read_target_data(self.blendshape, list(dict.fromkeys(target for target, _ in pairs)))
+            # a full split is a copy of its target, a factor of 1.0 on every vertex
+            mask_names = list(dict.fromkeys(mask for _, mask in pairs))
+            masks = WeightMapStack(mask_names, [
+                np.ones(deltas.vertex_count) if mask == FULL_SPLIT_MASK else self._mask(mask).values
+                for mask in mask_names
+            ])
+            self.split_deltas.append(deltas.split(masks, pairs=pairs, names=split_names))
+            self._split_names.update(split_names)
+        for split_name in split_names:
+            logger.info('finished splitting:__{}__'.format(split_name))
+        logger.info('__...__')
 
     def get_corrective_shape_splitting_group(self, shape, splitting_group):
-        
-        corrective_components = self.get_shape_components(shape)
-        splitting_json, _ = find_latest(self.context.rigs_path / "data", "face", "json")
-        with splitting_json.open() as f:
-            data = json.load(f)
-        
-        shape_splitting_data = list(data.keys())[0]
-        
-        # finds all the shapes matching the same splitting group
-        vertical_split = []
-        horizontal_split = []
-        four_split = []
-        full_shapes = []
-
-        print("corrective components...")
-        print(corrective_components)
-
-        for i in data[shape_splitting_data]:
-            splitting_group, splits = next(iter(i.items()))
-            print(splitting_group)
-            shapes = i.get("shapes", [])
-            print(shapes)
-            print([x for x in corrective_components if f"shp_{x}_L1" in shapes])
-            
-            if splitting_group == "vertical_split":
-                vertical_split.extend([x for x in corrective_components if f"shp_{x}_L1" in shapes])
-                print(vertical_split)
-            if splitting_group == "horizontal_split":
-                horizontal_split.extend([x for x in corrective_components if f"shp_{x}_L1" in shapes])
-                print(horizontal_split)
-            if splitting_group == "four_split":
-                four_split.extend([x for x in corrective_components if f"shp_{x}_L1" in shapes])
-                print(four_split)
-
-        print(vertical_split)
-        print(horizontal_split)
-        print(four_split)
-
-
-        if vertical_split and any(x in vertical_split for x in corrective_components):
-            return "vertical_split"
-        elif four_split and any(x in four_split for x in corrective_components):
-            return "four_split" 
-        elif horizontal_split and any(x in horizontal_split for x in corrective_components):
-            return "horizontal_split" 
-        else:  
-            return "full_split"
-                # full_shapes.append(corrective_component)
-           
-            # # asigns the splitting group if the number of components matches the number of shapes in the vertical_split
-            # if len(corrective_components) == len(vertical_split):
-            #     return splitting_group
-            
-            # # asigns the splitting group if the number of components matches the number of shapes in the horizontal_split
-            # if len(corrective_components) == len(horizontal_split):
-            #     return splitting_group
-            
-            # # asigns the splitting group if the number of components matches the number of shapes in the horizontal_split and vertical_split
-            # if len(horizontal_split) + len(vertical_split) == len(corrective_components):
-            #     splitting_group = 'vertical_split'
-            #     return splitting_group
-            
-            # # asigns the splitting group if the number of components matches the number of shapes in the full_shapes and vertical_split
-            # if len(full_shapes) + len(vertical_split) == len(corrective_components):
-            #     splitting_group = 'vertical_split'
-            #     return splitting_group
-            
-            # # asigns the splitting group if the number of components matches the number of shapes in the four_split
-            # elif len(four_split) >= 1:
-            #     splitting_group = 'four_split'
-            #     return splitting_group
-            
-            # else:
-            #     return splitting_group
-            
+        # the first of the vertical, four and horizontal splits of its components, full split otherwise
+        return self.configs.face().corrective_splitting_group(self.get_shape_components(shape))
+
     def create_facial_bs_expression(self, bs_node, target):
         
         shapes = self.get_shape_components(target)
@@ -565,47 +449,13 @@ class ShapeGraph(object):
         # logger.info(facial_bs_exp)
 
     def remove_patterns(self, input_string):
-        patterns_to_remove = ['delta_', '_x.*', 'shp_', '_L1']
-        for pattern in patterns_to_remove:
-            input_string = re.sub(pattern, '', input_string)
-        return input_string
+        return strip_shape_name(input_string)
     
     def get_shape_components(self, shape):
-        shape_name = self.remove_patterns(shape)
-        components = re.findall(r'(\d+|[A-Za-z]+(?:_[A-Za-z]+)*)', shape_name)
-
-        # this regex currently doesn't support shapes that contain a side
-        # must update at some point
-        if all(component in components for component in ["14", "L", "18"]):
-            components.append("14L18")
-            components = [x for x in components if x not in ["14", "L", "18"]]
-            
-        if all(component in components for component in ["14", "R", "18"]):
-            components.append("14R18")
-            components = [x for x in components if x not in ["14", "R", "18"]]
-
-        if all(component in components for component in ["30", "L"]):
-            components.append("30L")
-            components = [x for x in components if x not in ["30", "L"]]
-            
-        if all(component in components for component in ["30", "R"]):
-            components.append("30R")
-            components = [x for x in components if x not in ["30", "R"]]
-
-        return components
+        return shape_components(shape)
         
     def get_shape_split_types(self, shape_name):
-        splitting_json, _ = find_latest(self.context.rigs_path / "data", "face", "json")
-        with splitting_json.open() as f:
-            data = json.load(f)
-
-        shape_splitting_data = list(data.keys())[0]
-        for i in data[shape_splitting_data]:
-            splitting_group, masks = next(iter(i.items()))
-            shapes = i.get("shapes", [])
-            if not shape_name in shapes:
-                continue
-            return masks
+        return self.configs.face().shape_masks(shape_name)
             
     def connect_expression(self):
         
@@ -613,15 +463,9 @@ class ShapeGraph(object):
         base_shapes = [shp for shp in facial_bs_targets if 'delta' not in shp]            
         corrective_shapes = [shp for shp in facial_bs_targets if 'delta' in shp]
                 
-        splitting_json, _ = find_latest(self.context.rigs_path / "data", "face", "json")
-        with splitting_json.open() as f:
-            data = json.load(f)
-               
-        shape_splitting_data = list(data.keys())[0]
-        for i in data[shape_splitting_data]:
-            splitting_group, splits = next(iter(i.items()))
-            shapes = i.get("shapes", [])
-            result = [x for x in base_shapes for y in splits if y in x]
+        face_config = self.configs.face()
+        for group in face_config.groups if face_config else []:
+            result = [x for x in base_shapes for y in group.masks if y in x]
             self.expression_component_list.append(result)          
        
         for cor_shp in corrective_shapes:
@@ -630,34 +474,26 @@ class ShapeGraph(object):
 
     def cleanup(self):
         
-        if cmds.objExists(self.splitting_neutral):
-            cmds.delete(self.splitting_neutral)
-        
         if cmds.objExists(self.neutral):
             reset_blendshape_targets(self.blendshape)
             delete_history([self.neutral])
         
         self.blendshape = cmds.blendShape(self.neutral, n='facial_bs')[0]
         
-        base_shapes = cmds.listRelatives(self.splitted_face_blendshapes_grp)
-        base_shapes = sorted(base_shapes)
-        for target in base_shapes:
-            target = f"{target}"
-            if target == self.splitted_face_corrective_blendshapes_grp:
-                pass
-            else:
-                add_blendshape_target(self.blendshape, target)
-        
-        facial_bs_targets = list_shapes(self.blendshape)
-        target_len = len(facial_bs_targets)
-        corrective_shapes = cmds.listRelatives(self.splitted_face_corrective_blendshapes_grp)
-        for target in corrective_shapes:
-            if target not in list_shapes(self.blendshape):
-                target = f"{target}"
-                add_blendshape_target(self.blendshape, target)
+        # the split shapes go straight into the new blendshape, base shapes first then the correctives
+        split_names = sorted(self._split_names)
+        add_empty_blendshape_targets(
+            self.blendshape,
+            [target for target in split_names if 'delta_' not in target]
+            + [target for target in split_names if 'delta_' in target],
+        )
+        for split_deltas in self.split_deltas:
+            write_target_data(self.blendshape, split_deltas)
+
+        cache = self._build_cache("splits")
+        if cache and self.split_deltas:
+            cache.save(self.split_digests, DeltaStack.concatenate(self.split_deltas))
+        del self.split_deltas[:]
             
-        # delete the shapes folder for the split shapes
-        if cmds.objExists(self.splitted_face_blendshapes_grp):
-            cmds.delete(self.splitted_face_blendshapes_grp)
         if cmds.objExists(self.full_shapes_grp):
             cmds.delete(self.full_shapes_grp)
\ No newline at end of file
@@ -2,7 +2,10 @@ from maya import cmds
 from typing import Optional, List, Dict, Generator
 from rigging_toolkit.core.context import Context
 from rigging_toolkit.core.filesystem import find_latest, find_new_version, Path
-from rigging_toolkit.maya.utils import export_blendshape_targets, ls, export_versioned_mesh, import_asset, ExtractCorrectiveDelta, ls_all
+from rigging_toolkit.core.shape_pack import ShapePack, topology_digest
+from rigging_toolkit.maya.utils import export_blendshape_targets, ls, export_versioned_mesh, import_asset, ExtractCorrectiveDelta, ls_all, deformers_by_type
+from rigging_toolkit.maya.utils.deformers.blendshape import get_delta_stack, write_target_data
+from rigging_toolkit.maya.utils.mesh_utils import get_mesh_topology
 import json
 import logging
 from copy import copy
@@ -14,6 +17,9 @@ import re
 
 logger = logging.getLogger(__name__)
 
+# folder of the shapes folder holding the shape packs, one versioned file per series
+SHAPE_PACK_FOLDER = "_pack"
+
 def export_shapes(context):
     # type: (Context) -> None
     pattern = re.compile(r'^shp_.*L\d+$')
@@ -44,6 +50,8 @@ def import_shapes(context, ignore_list=None):
     shapes = []
     grp = cmds.createNode("transform", n="full_shapes_GRP")
     for shp_path in context.shapes_path.iterdir():
+        if shp_path.stem == SHAPE_PACK_FOLDER:
+            continue
         if ignore_list is not None and shp_path.stem in ignore_list:
             logger.warning(f"Ignoring {shp_path.stem} for import...")
             continue
@@ -53,6 +61,58 @@ def import_shapes(context, ignore_list=None):
         shapes.append(shp)
     return shapes
 
+def mesh_topology_digest(mesh):
+    # type: (str) -> str
+    topology = get_mesh_topology(mesh)
+    return topology_digest(topology.counts, topology.connects)
+
+def export_shape_pack(context, mesh=None, series="shapes"):
+    # type: (Context, Optional[str], Optional[str]) -> Optional[Path]
+    """Write all the targets of the blendshape of the mesh to a new version of the shape pack of the series"""
+    if mesh is None:
+        selection = ls()
+        if not selection:
+            return None
+        mesh = selection[0]
+    blendshapes = deformers_by_type(mesh, "blendShape")
+    if not blendshapes:
+        logger.warning(f"{mesh} has no blendshape to export")
+        return None
+
+    pack = ShapePack(get_delta_stack(blendshapes[0]), mesh_topology_digest(mesh))
+    pack_folder = Path.validate_path(context.shapes_path / SHAPE_PACK_FOLDER, create_missing=True)
+    path, _ = find_new_version(pack_folder, series, "npz")
+    pack.write(path)
+    logger.info(f"Exported {len(pack)} targets of {blendshapes[0]} to {path}")
+    return path
+
+def load_shape_pack(context, series="shapes"):
+    # type: (Context, Optional[str]) -> Optional[ShapePack]
+    pack_folder = Path.validate_path(context.shapes_path / SHAPE_PACK_FOLDER)
+    if pack_folder is None:
+        return None
+    latest, _ = find_latest(pack_folder, series, "npz")
+    if latest is None:
+        return None
+    return ShapePack.read(latest)
+
+def import_shape_pack(context, mesh, blendshape=None, series="shapes"):
+    # type: (Context, str, Optional[str], Optional[str]) -> List[str]
+    """
+    Write the targets of the latest shape pack of the series to the blendshape of the mesh, created
+    if it has none, without importing any mesh. Returns the names of the written targets.
+    """
+    pack = load_shape_pack(context, series)
+    if pack is None:
+        logger.warning(f"No shape pack found for {series} in {context.shapes_path / SHAPE_PACK_FOLDER}")
+        return []
+    pack.validate(mesh_topology_digest(mesh))
+
+    if blendshape is None:
+        blendshapes = deformers_by_type(mesh, "blendShape")
+        blendshape = blendshapes[0] if blendshapes else cmds.blendShape(mesh, n=f"{series}_BS")[0]
+    return write_target_data(blendshape, pack.deltas, create_missing=True)
+
 def import_head(context):
     # type: (Context) -> List[str]
     head_asset_path = context.assets_path / "head" / "meshes"
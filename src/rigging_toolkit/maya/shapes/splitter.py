@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import json
 import logging
@@ -9,7 +9,8 @@ import maya.mel as mel
 from rigging_toolkit.core.filesystem import Path
 
 from rigging_toolkit.core.filesystem import find_latest
-from rigging_toolkit.maya.utils.deformers.blendshape import apply_weightmap_to_base
+from rigging_toolkit.core.delta_stack import DeltaStack, WeightMapStack
+from rigging_toolkit.maya.utils.deformers.blendshape import apply_weightmap_to_base, read_target_data, read_weights, write_target_data
 from rigging_toolkit.maya.utils import WeightMap, has_uvset, set_current_uvset
 
 logger = logging.getLogger(__name__)
@@ -23,6 +24,7 @@ class Splitter(object):
 
     _masks = False # type: Dict[str, Path]
     _mask_data = False  # type: Dict[str, Tuple[str, str]]
+    _mask_stack = None  # type: Optional[WeightMapStack]
 
     def __attrs_post_init__(self):
         # type:() -> None
@@ -151,6 +153,40 @@ class Splitter(object):
 
         return []
 
+    def split_name(self, shape, split):
+        # type: (str, str) -> str
+        """shp_a_L1 split by xDown is shp_a_xDown_L1"""
+        parts = shape.split("_")
+        parts.insert(-1, split)
+        return "_".join(parts)
+
+    @property
+    def mask_stack(self):
+        # type: () -> WeightMapStack
+        """The weights of every mask, read once from the base weights of the mask blendshapes"""
+        if self._mask_stack is None:
+            names = list(self._mask_data)
+            self._mask_stack = WeightMapStack(
+                names, [read_weights(self._mask_data[name][1], [])[1] for name in names]
+            )
+        return self._mask_stack
+
+    def split_deltas(self, deltas, splits):
+        # type: (DeltaStack, Dict[str, List[str]]) -> DeltaStack
+        """Split the deltas of every shape by its splits, {shape: [split]}, in a single pass without any mesh"""
+        pairs = [(shape, split) for shape, shape_splits in splits.items() for split in shape_splits]
+        names = [self.split_name(shape, split) for shape, split in pairs]
+        return deltas.split(self.mask_stack, pairs=pairs, names=names)
+
+    def split_targets(self, source_blendshape, target_blendshape, splits):
+        # type: (str, str, Dict[str, List[str]]) -> List[str]
+        """
+        Split the targets of source_blendshape by their splits, {shape: [split]}, and write the split
+        shapes straight into target_blendshape, adding the targets it does not have yet.
+        """
+        deltas = read_target_data(source_blendshape, list(splits))
+        return write_target_data(target_blendshape, self.split_deltas(deltas, splits), create_missing=True)
+
     def split(self, shape, splits):
         # type: (str, List[str]) -> List[str]
         split_meshes = []
@@ -160,9 +196,7 @@ class Splitter(object):
         for split in splits:
             neutral, blendshape = self._mask_data[split]
 
-            parts = shape.split("_")
-            parts.insert(-1, split)
-            split_mesh_name = "_".join(parts)
+            split_mesh_name = self.split_name(shape, split)
 
             cmds.blendShape(blendshape, edit=True, t=(neutral, 1, shape, 1.0))
             cmds.setAttr("{0}.{1}".format(blendshape, shape), 1)
@@ -181,6 +215,7 @@ class Splitter(object):
             cmds.delete(mesh)
         self.masks = []
         self._mask_data = {}
+        self._mask_stack = None
 
     def cleanup_intermediate_shapes(self, transform):
         # type: (str) -> None
@@ -2,8 +2,11 @@ from .api_utils import get_mobject
 
 from .dag import get_dag_path_api_1, get_dag_path_api_2
 
+from .modifier_command import do_modifier
+
 __all__ = [
     "get_mobject",
     "get_dag_path_api_1",
-    "get_dag_path_api_2"
+    "get_dag_path_api_2",
+    "do_modifier",
 ]
\ No newline at end of file
@@ -0,0 +1,66 @@
+from typing import List
+import logging
+
+import maya.api.OpenMaya as om2
+from maya import cmds
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_NAME = "rigging_toolkit_modifier.py"
+COMMAND_NAME = "rtDoModifier"
+
+# modifiers handed over to the next rtDoModifier call
+_PENDING = []  # type: List[om2.MDGModifier]
+
+
+class ModifierCommand(om2.MPxCommand):
+    """
+    Undoable command running an MDGModifier built through the API,
+    so bulk plug writes go on the undo queue like any other edit.
+    """
+
+    def __init__(self):
+        super(ModifierCommand, self).__init__()
+        self._modifier = None  # type: om2.MDGModifier
+
+    @staticmethod
+    def creator():
+        return ModifierCommand()
+
+    def doIt(self, args):
+        if not _PENDING:
+            raise RuntimeError(f"{COMMAND_NAME} only runs the modifiers given to do_modifier")
+        self._modifier = _PENDING.pop()
+        self.redoIt()
+
+    def redoIt(self):
+        self._modifier.doIt()
+
+    def undoIt(self):
+        self._modifier.undoIt()
+
+    def isUndoable(self):
+        return True
+
+
+def initialize_plugin(plugin):
+    # type: (om2.MObject) -> None
+    om2.MFnPlugin(plugin, "rigging_toolkit", "1.0").registerCommand(COMMAND_NAME, ModifierCommand.creator)
+
+
+def uninitialize_plugin(plugin):
+    # type: (om2.MObject) -> None
+    om2.MFnPlugin(plugin).deregisterCommand(COMMAND_NAME)
+
+
+def do_modifier(modifier):
+    # type: (om2.MDGModifier) -> None
+    """Run the modifier as one undoable step"""
+    if not cmds.pluginInfo(PLUGIN_NAME, q=True, loaded=True):
+        cmds.loadPlugin(PLUGIN_NAME, quiet=True)
+    _PENDING.append(modifier)
+    try:
+        getattr(cmds, COMMAND_NAME)()
+    finally:
+        if modifier in _PENDING:
+            _PENDING.remove(modifier)
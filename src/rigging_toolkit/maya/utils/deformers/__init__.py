@@ -1,7 +1,7 @@
 from .general import deformers_by_type
 from .joint import clean_joint_rotation, clean_joint_rotation_for, clean_joint_rotation_for_selected
 from .skincluster import get_skin_cluster, check_max_influences, num_influences, prune_influences 
-from .blendshape import list_shapes, get_target_index, reset_blendshape_targets, export_blendshape_targets, vertex_ids_from_components_target, get_deltas, get_weights_from_blendshape, apply_weightmap_to_base, apply_weightmap_to_target, get_adjusted_weight_maps, export_all_weight_maps, export_weight_map, import_weight_map, get_all_blendshapes, get_delta, add_blendshape_target, set_delta, set_deltas, create_corrective_delta, activate_blendshape_target, activate_blendshape_targets, add_blendshape_targets, export_blendshape_targets_to_grp, import_weight_map_to_targets
+from .blendshape import list_shapes, get_target_index, reset_blendshape_targets, export_blendshape_targets, vertex_ids_from_components_target, get_deltas, get_weights_from_blendshape, apply_weightmap_to_base, apply_weightmap_to_target, get_adjusted_weight_maps, export_all_weight_maps, export_weight_map, import_weight_map, get_all_blendshapes, get_delta, add_blendshape_target, set_delta, set_deltas, create_corrective_delta, activate_blendshape_target, activate_blendshape_targets, add_blendshape_targets, add_empty_blendshape_targets, remove_blendshape_target, BlendShapeIndex, get_blendshape_index, write_weights, export_blendshape_targets_to_grp, import_weight_map_to_targets
 
 __all__ = [
     "deformers_by_type",
@@ -34,6 +34,11 @@ __all__ = [
     "activate_blendshape_target",
     "activate_blendshape_targets",
     "add_blendshape_targets",
+    "add_empty_blendshape_targets",
+    "remove_blendshape_target",
+    "BlendShapeIndex",
+    "get_blendshape_index",
+    "write_weights",
     "export_blendshape_targets_to_grp",
     "import_weight_map_to_targets"
 ]
\ No newline at end of file
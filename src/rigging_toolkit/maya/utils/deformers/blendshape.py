@@ -1,25 +1,204 @@
 from maya import cmds
-from typing import List, Optional
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
+from typing import Dict, Generator, List, Optional, Tuple, Union
+from contextlib import contextmanager
 import re
 from rigging_toolkit.maya.utils.deformers.general import deformers_by_type
 from rigging_toolkit.maya.utils.delta import Delta
 from rigging_toolkit.maya.utils.weightmap import WeightMap
 from rigging_toolkit.core.filesystem import find_new_version
-from rigging_toolkit.maya.utils.mesh_utils import get_all_meshes, mirror_vertex_by_pos, mirror_vertices_by_edge
-from rigging_toolkit.maya.utils.delta import ExtractCorrectiveDelta
+from rigging_toolkit.maya.utils.mesh_utils import get_all_meshes, get_mesh_points, set_mesh_points, mirror_vertices_by_pos, mirror_vertices_by_edge
 from rigging_toolkit.core.filesystem import Path
+from rigging_toolkit.core.delta_stack import DeltaStack, WeightMapStack
+from rigging_toolkit.core.component_list import decode_components, index_ranges
+from rigging_toolkit.core.blendshape_evaluator import BlendShapeEvaluator
+from rigging_toolkit.maya.utils.api import do_modifier, get_mobject
 import json
 import logging
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# logical index of the inputTargetItem holding the full weight shape of a target
+INPUT_TARGET_ITEM_INDEX = 6000
+
+def _target_indices(blendshape):
+    # type: (str) -> Dict[str, int]
+    """{target name: target index} of all the targets, from a single alias query"""
+    alias_list = cmds.aliasAttr(blendshape, query=True) or []
+    indices = {}
+    for alias, attr in zip(alias_list[::2], alias_list[1::2]):
+        match = re.findall(r"[0-9]+", attr)
+        if match:
+            indices[alias] = int(match[0])
+    return indices
+
+class BlendShapeIndex(object):
+    """
+    Target name <-> target index map of a blendshape node, read from a single alias query
+    and kept up to date by the add, duplicate and remove helpers of this module.
+    """
+
+    def __init__(self, blendshape):
+        # type: (str) -> None
+        self.blendshape = blendshape
+        self._index_by_name = {}  # type: Dict[str, int]
+        self._name_by_index = {}  # type: Dict[int, str]
+        self.refresh()
+
+    def refresh(self):
+        # type: () -> None
+        self._index_by_name = _target_indices(self.blendshape)
+        self._name_by_index = {index: name for name, index in self._index_by_name.items()}
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._index_by_name)
+
+    def __contains__(self, name):
+        # type: (str) -> bool
+        return name in self._index_by_name
+
+    def names(self):
+        # type: () -> List[str]
+        """Target names in index order"""
+        return [self._name_by_index[index] for index in sorted(self._name_by_index)]
+
+    def index(self, name):
+        # type: (str) -> int
+        if name not in self._index_by_name:
+            raise ValueError(f"{name} is not a target of {self.blendshape}")
+        return self._index_by_name[name]
+
+    def name(self, index):
+        # type: (int) -> str
+        return self._name_by_index[index]
+
+    def indices(self):
+        # type: () -> Dict[str, int]
+        return dict(self._index_by_name)
+
+    @property
+    def next_index(self):
+        # type: () -> int
+        """First index after the last target, targets are never added at 0"""
+        return max(self._name_by_index, default=0) + 1
+
+    def add(self, name, index):
+        # type: (str, int) -> None
+        self.remove(self._name_by_index.get(index, ""))
+        self._index_by_name[name] = index
+        self._name_by_index[index] = name
+
+    def remove(self, name):
+        # type: (str) -> None
+        index = self._index_by_name.pop(name, None)
+        if index is not None:
+            self._name_by_index.pop(index, None)
+
+class BlendShapeIndexCache(object):
+    """
+    Keeps the BlendShapeIndex of blendshape nodes, by node so an entry doesn't outlive its node.
+
+    An entry is trusted until the aliases or the weights of its node are added or removed outside of
+    the edits of this module, tracked through maya node callbacks that only live as long as the entry,
+    it is then read again on the next get. The edits of this module run in editing, which keeps the
+    index in sync itself.
+    """
+
+    ALIAS_ATTRIBUTE = "attributeAliasList"
+
+    def __init__(self):
+        self._entries = {}  # type: dict
+
+    def _key(self, node):
+        # type: (om2.MObject) -> int
+        return om2.MObjectHandle(node).hashCode()
+
+    def get(self, blendshape):
+        # type: (str) -> BlendShapeIndex
+        node = get_mobject(blendshape)
+        key = self._key(node)
+        entry = self._entries.get(key)
+        if entry is None or not entry["handle"].isValid() or entry["handle"].object() != node:
+            self._drop(key)
+            callbacks = [
+                om2.MNodeMessage.addAttributeChangedCallback(node, self._on_attribute_changed, key),
+                om2.MNodeMessage.addNodePreRemovalCallback(node, self._on_removed, key),
+            ]
+            entry = self._entries[key] = {
+                "handle": om2.MObjectHandle(node),
+                "index": BlendShapeIndex(blendshape),
+                "callbacks": callbacks,
+                "dirty": False,
+                "editing": 0,
+            }
+        index = entry["index"]
+        # the node may have been renamed since
+        index.blendshape = blendshape
+        if entry["dirty"]:
+            index.refresh()
+            entry["dirty"] = False
+        return index
+
+    @contextmanager
+    def editing(self, blendshape):
+        # type: (str) -> Generator[BlendShapeIndex, None, None]
+        """The index of the node, for an edit that keeps it in sync, its own alias and weight changes are ignored"""
+        index = self.get(blendshape)
+        entry = self._entries[self._key(get_mobject(blendshape))]
+        entry["editing"] += 1
+        try:
+            yield index
+        finally:
+            entry["editing"] -= 1
+
+    def _drop(self, key):
+        # type: (int) -> None
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            om2.MMessage.removeCallbacks(entry["callbacks"])
+
+    def _on_attribute_changed(self, message, plug, other_plug, key):
+        entry = self._entries.get(key)
+        if entry is None or entry["editing"]:
+            return
+        name = plug.partialName(useLongNames=True)
+        if message & om2.MNodeMessage.kAttributeSet and name.startswith(self.ALIAS_ATTRIBUTE):
+            entry["dirty"] = True
+        elif message & (om2.MNodeMessage.kAttributeArrayAdded | om2.MNodeMessage.kAttributeArrayRemoved):
+            if name.startswith("weight"):
+                entry["dirty"] = True
+
+    def _on_removed(self, node, key):
+        self._drop(key)
+
+    def invalidate(self, blendshape):
+        # type: (str) -> None
+        if not cmds.objExists(blendshape):
+            return
+        self._drop(self._key(get_mobject(blendshape)))
+
+    def clear(self):
+        # type: () -> None
+        for key in list(self._entries):
+            self._drop(key)
+
+
+BLENDSHAPE_INDEX_CACHE = BlendShapeIndexCache()
+
+
+def get_blendshape_index(blendshape):
+    # type: (str) -> BlendShapeIndex
+    """Cached BlendShapeIndex of the node, see BlendShapeIndexCache"""
+    return BLENDSHAPE_INDEX_CACHE.get(blendshape)
+
 def list_shapes(blendshape, exact_type=None):
     # type: (str, Optional[str]) -> List[str]
     """Get list of shapes for given blendshape node"""
     shapes = []
-    for attr in cmds.ls("{}.w[*]".format(blendshape)):
-        _, target = attr.split(".")
+    for target in get_blendshape_index(blendshape).names():
         if exact_type and exact_type not in target:
             continue
         shapes.append(target)
@@ -28,35 +207,58 @@ def list_shapes(blendshape, exact_type=None):
 def get_target_index(blendshape, target_name):
     # type: (str, str) -> int
     """Get the target index for the given target name"""
-    target_index = -1
-    alias_list = cmds.aliasAttr(blendshape, query=True)
-    alias_index = alias_list.index(target_name)
-    alias_attr = alias_list[alias_index + 1]
-    match = re.findall(r"[0-9]+", alias_attr)
-    if match:
-        target_index = int(match[0])
-    return target_index
+    return get_blendshape_index(blendshape).index(target_name)
 
-def add_blendshape_target(blendshape, target):
-    # type: (str, str) -> str
-    shapes = list_shapes(blendshape)
+def _blendshape_geometry(blendshape):
+    # type: (str) -> str
     mesh = cmds.blendShape(blendshape, q=True, geometry=True)[0]
-    geo = cmds.listRelatives(mesh, p=True)[0]
-    last_index = 0
+    return cmds.listRelatives(mesh, p=True)[0]
 
-    if len(shapes) > 0:
-        last_shape = list_shapes(blendshape)[-1]
-        last_index = get_target_index(blendshape, last_shape)
-        new_index = last_index + 1
-    else:
-        new_index = last_index + 1
-    cmds.blendShape(blendshape, edit=True, target=(geo, new_index, target, 1.0))
+def add_blendshape_target(blendshape, target):
+    # type: (str, str) -> str
+    with BLENDSHAPE_INDEX_CACHE.editing(blendshape) as index:
+        new_index = index.next_index
+        cmds.blendShape(blendshape, edit=True, target=(_blendshape_geometry(blendshape), new_index, target, 1.0))
+        # maya names the alias after the target, read it back in case it had to be made unique
+        index.add(cmds.aliasAttr(f"{blendshape}.weight[{new_index}]", query=True) or target, new_index)
     return target
 
 def add_blendshape_targets(blendshape, targets):
     # type: (str, List[str]) -> List[str]
-    for target in targets:
-        add_blendshape_target(blendshape, target)
+    """Add all the targets with a single blendShape edit, after the last target"""
+    if not targets:
+        return []
+    with BLENDSHAPE_INDEX_CACHE.editing(blendshape) as index:
+        geo = _blendshape_geometry(blendshape)
+        first_index = index.next_index
+        cmds.blendShape(
+            blendshape,
+            edit=True,
+            target=[(geo, first_index + i, target, 1.0) for i, target in enumerate(targets)],
+        )
+        index.refresh()
+    return list(targets)
+
+def add_empty_blendshape_targets(blendshape, targets):
+    # type: (str, List[str]) -> List[str]
+    """Add targets without any geometry after the last target, their data is written afterwards, e.g. by write_target_data"""
+    with BLENDSHAPE_INDEX_CACHE.editing(blendshape) as index:
+        for target in targets:
+            new_index = index.next_index
+            cmds.setAttr(f"{blendshape}.weight[{new_index}]", 0.0)
+            cmds.aliasAttr(target, f"{blendshape}.weight[{new_index}]")
+            index.add(target, new_index)
+    return list(targets)
+
+def remove_blendshape_target(blendshape, target):
+    # type: (str, str) -> None
+    """Remove a target, its weight and its data, without needing the target geometry"""
+    with BLENDSHAPE_INDEX_CACHE.editing(blendshape) as index:
+        target_index = index.index(target)
+        cmds.aliasAttr(f"{blendshape}.{target}", remove=True)
+        cmds.removeMultiInstance(f"{blendshape}.weight[{target_index}]", b=True)
+        cmds.removeMultiInstance(f"{blendshape}.inputTarget[0].inputTargetGroup[{target_index}]", b=True)
+        index.remove(target)
 
 def reset_blendshape_targets(blendshape_name):
     # type: (str) -> None
@@ -131,184 +333,246 @@ def export_blendshape_targets_to_grp(mesh):
     return shapes_grp
 
 def vertex_ids_from_components_target(components_target):
-    # type: (List[str]) -> List[int]
-    """Returns a flattened list of vertex ids from a components target list.
+    # type: (List[str]) -> np.ndarray
+    """Returns a flattened array of vertex ids from a components target list, in the order of the components.
 
     The components target list typically comes from getting the following attribute:
     f"{blendshape}.inputTarget[0].inputTargetGroup[{i}].inputTargetItem[6000].inputComponentsTarget"
     """
-    verts = []
-    for vert_id in components_target:
-        match = re.findall(r"\d+", vert_id)
-        if match:
-            if len(match) == 1:
-                target_index = int(match[0])
-                verts.append(target_index)
-            elif len(match) == 2:
-                start = int(match[0])
-                end = int(match[1])
-                flatten = list(range(start, end + 1))
-                verts.extend(flatten)
-    return list(set(verts))
+    return decode_components(components_target)
+
+def _input_target_group_plug(blendshape_name):
+    # type: (str) -> Tuple[om2.MFnDependencyNode, om2.MPlug]
+    fn_node = om2.MFnDependencyNode(get_mobject(blendshape_name))
+    input_target = fn_node.findPlug("inputTarget", False).elementByLogicalIndex(0)
+    return fn_node, input_target.child(fn_node.attribute("inputTargetGroup"))
+
+def _read_target_item(fn_node, group_plug, target_index):
+    # type: (om2.MFnDependencyNode, om2.MPlug, int) -> Tuple[np.ndarray, np.ndarray]
+    """Read the (indices, offsets) stored on the full weight item of a target"""
+    empty = np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.float32)
+    if target_index not in group_plug.getExistingArrayAttributeIndices():
+        return empty
+    items = group_plug.elementByLogicalIndex(target_index).child(fn_node.attribute("inputTargetItem"))
+    if INPUT_TARGET_ITEM_INDEX not in items.getExistingArrayAttributeIndices():
+        return empty
+    item = items.elementByLogicalIndex(INPUT_TARGET_ITEM_INDEX)
+
+    points_object = item.child(fn_node.attribute("inputPointsTarget")).asMObject()
+    components_object = item.child(fn_node.attribute("inputComponentsTarget")).asMObject()
+    if points_object.isNull() or components_object.isNull():
+        return empty
+
+    points = om2.MFnPointArrayData(points_object).array()
+    offsets = np.array([[p.x, p.y, p.z] for p in points], dtype=np.float32).reshape(-1, 3)
+    components = om2.MFnComponentListData(components_object)
+    indices = [
+        np.array(om2.MFnSingleIndexedComponent(components.get(i)).getElements(), dtype=np.int64)
+        for i in range(components.length())
+    ]
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+    if len(indices) != len(offsets):
+        logger.warning(f"{fn_node.name()} target {target_index} has {len(indices)} components for {len(offsets)} points")
+        return empty
+    return indices, offsets
+
+def read_target_data(blendshape_name, targets=None):
+    # type: (str, Optional[List[str]]) -> DeltaStack
+    """
+    Read the points and components of the targets in bulk through the API, all the targets if not provided,
+    instead of two getAttr calls and an alias query per target.
+    """
+    target_indices = get_blendshape_index(blendshape_name).indices()
+    targets = targets if targets is not None else list_shapes(blendshape_name)
+    fn_node, group_plug = _input_target_group_plug(blendshape_name)
+
+    indices = []
+    offsets = []
+    for target in targets:
+        if target not in target_indices:
+            raise ValueError(f"{target} is not a target of {blendshape_name}")
+        target_ids, target_offsets = _read_target_item(fn_node, group_plug, target_indices[target])
+        indices.append(target_ids)
+        offsets.append(target_offsets)
+
+    vertex_count = _blendshape_vertex_count(blendshape_name)
+    return DeltaStack.from_arrays(targets, indices, offsets, vertex_count=vertex_count)
+
+def write_target_data(blendshape_name, deltas, create_missing=False):
+    # type: (str, DeltaStack, Optional[bool]) -> List[str]
+    """
+    Write the points and components of every target of the stack in bulk through the API, as a single undo step.
+    Targets missing on the blendshape are added as empty targets when create_missing is set,
+    skipped otherwise. Returns the names of the written targets.
+    """
+    written = []
+    cmds.undoInfo(openChunk=True, chunkName="write_target_data")
+    try:
+        if create_missing:
+            index = get_blendshape_index(blendshape_name)
+            add_empty_blendshape_targets(blendshape_name, [name for name in deltas.names if name not in index])
+        target_indices = get_blendshape_index(blendshape_name).indices()
+        fn_node, group_plug = _input_target_group_plug(blendshape_name)
+        modifier = om2.MDGModifier()
+
+        for name, indices, offsets in deltas.targets():
+            if name not in target_indices:
+                continue
+            items = group_plug.elementByLogicalIndex(target_indices[name]).child(fn_node.attribute("inputTargetItem"))
+            item = items.elementByLogicalIndex(INPUT_TARGET_ITEM_INDEX)
+
+            points_data = om2.MFnPointArrayData()
+            points_object = points_data.create(om2.MPointArray(offsets.astype(np.float64).tolist()))
+            modifier.newPlugValue(item.child(fn_node.attribute("inputPointsTarget")), points_object)
+
+            fn_components = om2.MFnSingleIndexedComponent()
+            component = fn_components.create(om2.MFn.kMeshVertComponent)
+            fn_components.addElements(indices.tolist())
+            components_data = om2.MFnComponentListData()
+            components_object = components_data.create()
+            components_data.add(component)
+            modifier.newPlugValue(item.child(fn_node.attribute("inputComponentsTarget")), components_object)
+            written.append(name)
+
+        # an MDGModifier isn't undoable on its own, the command puts it on the undo queue
+        do_modifier(modifier)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    return written
 
 def get_deltas(blendshape_name):
     # type: (str) -> List[Delta]
     """Get the deltas for all targets in a blendshape node"""
-    deltas = []  # type: List[Delta]
-    shapes = list_shapes(blendshape_name)
-    for shape in shapes:
-        shape_idx = get_target_index(blendshape_name, shape)
-        delta = {"name": shape, "indices": None, "deltas": None}  # type: dict
-        offsets = cmds.getAttr(
-            "{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000].inputPointsTarget".format(
-                blendshape_name, shape_idx
-            )
-        )
-        if offsets:
-            offsets = [o[:3] for o in offsets]
-        else:
-            offsets = []
-        delta["deltas"] = offsets
-        vtx_indices = cmds.getAttr(
-            "{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000].inputComponentsTarget".format(
-                blendshape_name, shape_idx
-            )
-        )
-        if not vtx_indices:
-            vtx_indices = []
-        indices = vertex_ids_from_components_target(vtx_indices)
-        delta["indices"] = indices
-        deltas.append(Delta.load(delta))
-    return deltas
+    return read_target_data(blendshape_name).to_deltas(Delta)
+
+def get_delta_stack(blendshape_name):
+    # type: (str) -> DeltaStack
+    """Get the deltas for all targets in a blendshape node as a single DeltaStack"""
+    return read_target_data(blendshape_name)
 
 def get_delta(blendshape_name, target):
     # type: (str, str) -> Delta
-    shape_idx = get_target_index(blendshape_name, target)
-    if shape_idx < 0:
+    if target not in get_blendshape_index(blendshape_name):
         return None
-    delta = {"name": target, "indices": None, "deltas": None}  # type: dict
-    offsets = cmds.getAttr(
-        "{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000].inputPointsTarget".format(
-            blendshape_name, shape_idx
-        )
-    )
-    if offsets:
-        offsets = [o[:3] for o in offsets]
-    else:
-        offsets = []
-    delta["deltas"] = offsets
-    vtx_indices = cmds.getAttr(
-        "{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000].inputComponentsTarget".format(
-            blendshape_name, shape_idx
-        )
-    )
-    if not vtx_indices:
-        vtx_indices = []
-    indices = vertex_ids_from_components_target(vtx_indices)
-    delta["indices"] = indices
-    return Delta.load(delta)
+    return read_target_data(blendshape_name, [target]).to_deltas(Delta)[0]
 
 def set_deltas(blendshape_name, deltas):
     # type: (str, List[Delta]) -> List[Delta]
     """Set the deltas for all targets in a blendshape node"""
-    shapes = list_shapes(blendshape_name)
-    applied_deltas = []  # type: List[Delta]
-    for delta in deltas:
-        if delta.name not in shapes:
-            continue
-        shape_idx = get_target_index(blendshape_name, delta.name)
-        delta_vectors = [d for d in delta.deltas.tolist()]
-
-        # fmt: off
-        cmds.setAttr(
-            "{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000].inputPointsTarget".format(
-                blendshape_name, shape_idx
-            ),
-            len(delta_vectors),
-            *delta_vectors,
-            type="pointArray"
-        )
-        # fmt: on
-        component_list = [f"vtx[{idx}]" for idx in delta.indices]
-
-        # fmt: off
-        cmds.setAttr(
-            "{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000].inputComponentsTarget".format(
-                blendshape_name, shape_idx
-            ),
-            len(delta.indices),
-            *component_list,
-            type="componentList"
-        )
-        # fmt: on
-        applied_deltas.append(delta)
-
+    shapes = set(list_shapes(blendshape_name))
+    applied_deltas = [delta for delta in deltas if delta.name in shapes]  # type: List[Delta]
+    write_target_data(blendshape_name, DeltaStack.from_deltas(applied_deltas))
     return applied_deltas
 
 def set_delta(blendshape_name, delta, target_name=None):
     # type: (str, Delta, Optional[str]) -> Delta
     shapes = list_shapes(blendshape_name)
     if delta.name not in shapes and target_name is None:
-        print("returning None")
+        logger.warning(f"{delta.name} is not a target of {blendshape_name}, the delta isn't set")
         return None
     if target_name is not None and target_name not in shapes:
-        print("returning None")
+        logger.warning(f"{target_name} is not a target of {blendshape_name}, the delta isn't set")
         return None
-    if target_name is not None:
-        shape_idx = get_target_index(blendshape_name, target_name)
-    else:
-        shape_idx = get_target_index(blendshape_name, delta.name)
-    delta_vectors = [d for d in delta.deltas.tolist()]
-
-    # fmt: off
-    cmds.setAttr(
-        "{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000].inputPointsTarget".format(
-            blendshape_name, shape_idx
-        ),
-        len(delta_vectors),
-        *delta_vectors,
-        type="pointArray"
-    )
-    # fmt: on
-    component_list = [f"vtx[{idx}]" for idx in delta.indices]
-
-    # fmt: off
-    cmds.setAttr(
-        "{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000].inputComponentsTarget".format(
-            blendshape_name, shape_idx
-        ),
-        len(delta.indices),
-        *component_list,
-        type="componentList"
-    )
-    # fmt: on
+    name = target_name if target_name is not None else delta.name
+    write_target_data(blendshape_name, DeltaStack.from_arrays([name], [delta.indices], [delta.deltas]))
     return delta
 
-def get_weights_from_blendshape(blendshape_name, remove_unused_maps=False):
-    # type: (str, Optional[bool]) -> List[WeightMap]
-    targets = list_shapes(blendshape_name)
-    target_indices = [get_target_index(blendshape_name, target) for target in targets]
-    weights = []
-
+def _blendshape_vertex_count(blendshape_name):
+    # type: (str) -> int
     mesh = cmds.blendShape(blendshape_name, q=True, geometry=True)
-    vertex_count = cmds.polyEvaluate(mesh, v=True)
-    for shape_name, shape_idx in zip(targets, target_indices):
-        values = cmds.getAttr(
-            f"{blendshape_name}.inputTarget[0].inputTargetGroup[{shape_idx}].targetWeights[0:{vertex_count-1}]"
-        )
-        if all(i == 1 for i in values) and remove_unused_maps is True:
+    return cmds.polyEvaluate(mesh, v=True)
+
+def _read_weight_array(array_plug, attr, vertex_count):
+    # type: (om2.MPlug, str, int) -> np.ndarray
+    """
+    Read a sparse weight multi, elements that were never set keep their 1.0 default.
+    Only the runs of existing elements are fetched, a single getAttr for a painted map.
+    """
+    values = np.ones(vertex_count, dtype=np.float32)
+    existing = np.asarray(array_plug.getExistingArrayAttributeIndices(), dtype=np.int64)
+    for first, last in index_ranges(np.sort(existing[existing < vertex_count])).tolist():
+        values[first:last + 1] = cmds.getAttr(f"{attr}[{first}:{last}]")
+    return values
+
+def read_weights(blendshape_name, targets=None):
+    # type: (str, Optional[List[str]]) -> Tuple[WeightMapStack, np.ndarray]
+    """
+    Read the target weights of the targets, all the targets if not provided, as a (T, V) WeightMapStack
+    and the (V,) base weights, in a single pass over the plugs of the node.
+    """
+    target_indices = get_blendshape_index(blendshape_name).indices()
+    targets = targets if targets is not None else list_shapes(blendshape_name)
+    vertex_count = _blendshape_vertex_count(blendshape_name)
+    fn_node, group_plug = _input_target_group_plug(blendshape_name)
+    existing_groups = set(group_plug.getExistingArrayAttributeIndices())
+
+    values = np.ones((len(targets), vertex_count), dtype=np.float32)
+    for row, target in enumerate(targets):
+        if target not in target_indices:
+            raise ValueError(f"{target} is not a target of {blendshape_name}")
+        target_index = target_indices[target]
+        if target_index not in existing_groups:
             continue
-        weights.append(WeightMap(shape_name, values))
+        weights_plug = group_plug.elementByLogicalIndex(target_index).child(fn_node.attribute("targetWeights"))
+        values[row] = _read_weight_array(
+            weights_plug,
+            f"{blendshape_name}.inputTarget[0].inputTargetGroup[{target_index}].targetWeights",
+            vertex_count,
+        )
+
+    input_target = fn_node.findPlug("inputTarget", False).elementByLogicalIndex(0)
+    base_weights = _read_weight_array(
+        input_target.child(fn_node.attribute("baseWeights")),
+        f"{blendshape_name}.inputTarget[0].baseWeights",
+        vertex_count,
+    )
+    return WeightMapStack(targets, values), base_weights
+
+def get_weight_map_stack(blendshape_name, remove_unused_maps=False):
+    # type: (str, Optional[bool]) -> WeightMapStack
+    """Get the target weights of a blendshape node as a single WeightMapStack"""
+    weights, _ = read_weights(blendshape_name)
+    if remove_unused_maps:
+        weights = weights[np.flatnonzero(~weights.is_default())]
     return weights
 
+def get_weights_from_blendshape(blendshape_name, remove_unused_maps=False):
+    # type: (str, Optional[bool]) -> List[WeightMap]
+    return get_weight_map_stack(blendshape_name, remove_unused_maps).to_weight_maps(WeightMap)
+
+def get_blendshape_base_points(blendshape_name):
+    # type: (str) -> np.ndarray
+    """Returns the (V, 3) points of the geometry going into the blendshape node."""
+    fn_filter = oma2.MFnGeometryFilter(get_mobject(blendshape_name))
+    input_mesh = om2.MFnMesh(fn_filter.getInputGeometry()[0])
+    return np.array([[p.x, p.y, p.z] for p in input_mesh.getPoints()], dtype=np.float64)
+
+def get_blendshape_weights(blendshape_name, targets=None):
+    # type: (str, Optional[List[str]]) -> np.ndarray
+    """Returns the current weight of the targets, all the targets if not provided."""
+    targets = targets if targets is not None else list_shapes(blendshape_name)
+    return np.array([cmds.getAttr(f"{blendshape_name}.{target}") for target in targets], dtype=np.float64)
+
+def get_blendshape_evaluator(blendshape_name):
+    # type: (str) -> BlendShapeEvaluator
+    """
+    Snapshot a blendshape node into a BlendShapeEvaluator, to evaluate
+    or bake any number of frames of target weights without maya.
+    """
+    deltas = get_delta_stack(blendshape_name)
+    target_weights, base_weights = read_weights(blendshape_name, deltas.names)
+    return BlendShapeEvaluator(
+        get_blendshape_base_points(blendshape_name),
+        deltas,
+        target_weights=target_weights,
+        base_weights=base_weights,
+        envelope=cmds.getAttr(f"{blendshape_name}.envelope"),
+    )
+
 def get_weights_from_blendshape_target(blendshape_name, target):
     # type: (str, str) -> WeightMap
-    mesh = cmds.blendShape(blendshape_name, q=True, geometry=True)
-    vertex_count = cmds.polyEvaluate(mesh, v=True)
-    target_index = get_target_index(blendshape_name, target)
-    values = cmds.getAttr(f"{blendshape_name}.inputTarget[0].inputTargetGroup[{target_index}].targetWeights[0:{vertex_count-1}]")
-    weights = WeightMap(target, values)
-    return weights
+    weights, _ = read_weights(blendshape_name, [target])
+    return weights.to_weight_maps(WeightMap)[0]
 
 def export_weight_map(blendshape_name, target, folder_path, name_overwrite=None):
     # type: (str, str, Path, Optional[str]) -> None
@@ -331,20 +595,85 @@ def export_all_weight_maps(blendshape_name, folder_path):
         with open(str(new_file), "w") as f:
             json.dump(wm.data(), f)
 
+def _write_weight_array(array_plug, attr, values, cache=None):
+    # type: (om2.MPlug, str, np.ndarray, Optional[Dict[Tuple[int, int], List[float]]]) -> None
+    """
+    Write a sparse weight multi. Only the runs of non default values and of the existing elements
+    are set, so a mask on a target that was never painted writes just the masked vertices.
+    """
+    existing = np.asarray(array_plug.getExistingArrayAttributeIndices(), dtype=np.int64)
+    written = values != 1.0
+    written[existing[existing < len(values)]] = True
+    for first, last in index_ranges(np.flatnonzero(written)).tolist():
+        if cache is None or (first, last) not in cache:
+            run = values[first:last + 1].tolist()
+            if cache is not None:
+                cache[(first, last)] = run
+        else:
+            run = cache[(first, last)]
+        cmds.setAttr(f"{attr}[{first}:{last}]", *run, size=len(run))
+
+def write_weights(blendshape_name, weights, targets=None):
+    # type: (str, Union[WeightMap, WeightMapStack], Optional[List[str]]) -> List[str]
+    """
+    Write the target weights of many targets as a single undo step, returns the targets written.
+
+    A WeightMap is applied to every target in targets, a WeightMapStack writes every map to the
+    target of the same name, or to the targets in order when provided.
+    """
+    if isinstance(weights, WeightMapStack):
+        targets = targets if targets is not None else list(weights.names)
+        if len(targets) != len(weights):
+            raise ValueError(f"Got {len(weights)} weight maps for {len(targets)} targets")
+        values = weights.values
+    else:
+        targets = targets or []
+        values = np.asarray(weights.get_weights(), dtype=np.float32)[np.newaxis]
+
+    target_indices = get_blendshape_index(blendshape_name).indices()
+    vertex_count = _blendshape_vertex_count(blendshape_name)
+    if values.shape[1] != vertex_count:
+        raise ValueError(f"The weight maps have {values.shape[1]} vertices, {blendshape_name} has {vertex_count}")
+    for target in targets:
+        if target not in target_indices:
+            raise ValueError(f"{target} is not a target of {blendshape_name}")
+
+    fn_node, group_plug = _input_target_group_plug(blendshape_name)
+    # a broadcast map is converted to lists once for all the targets
+    caches = [{} for _ in range(len(values))]
+    cmds.undoInfo(openChunk=True, chunkName="write_weights")
+    try:
+        for row, target in enumerate(targets):
+            row = row if len(values) > 1 else 0
+            target_index = target_indices[target]
+            weights_plug = group_plug.elementByLogicalIndex(target_index).child(fn_node.attribute("targetWeights"))
+            _write_weight_array(
+                weights_plug,
+                f"{blendshape_name}.inputTarget[0].inputTargetGroup[{target_index}].targetWeights",
+                values[row],
+                caches[row],
+            )
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    return targets
+
 def apply_weightmap_to_base(blendshape_name, weight_map):
     # type: (str, WeightMap) -> None
-    values = weight_map.get_weights()
-    target_weights_attr = (
-        f"{blendshape_name}.inputTarget[0].baseWeights[0:{len(values) - 1}]"
-    )
-    cmds.setAttr(target_weights_attr, *values, size=len(values))
+    fn_node, _ = _input_target_group_plug(blendshape_name)
+    input_target = fn_node.findPlug("inputTarget", False).elementByLogicalIndex(0)
+    cmds.undoInfo(openChunk=True, chunkName="apply_weightmap_to_base")
+    try:
+        _write_weight_array(
+            input_target.child(fn_node.attribute("baseWeights")),
+            f"{blendshape_name}.inputTarget[0].baseWeights",
+            np.asarray(weight_map.get_weights(), dtype=np.float32),
+        )
+    finally:
+        cmds.undoInfo(closeChunk=True)
 
 def apply_weightmap_to_target(blendshape_name, target_name, weight_map):
     # type: (str, str, WeightMap) -> None
-    target_index = get_target_index(blendshape_name, target_name)
-    values = weight_map.get_weights()
-    target_weights_attr = f"{blendshape_name}.inputTarget[0].inputTargetGroup[{target_index}].targetWeights[0:{len(values) - 1}]"
-    cmds.setAttr(target_weights_attr, *values, size=len(values))
+    write_weights(blendshape_name, weight_map, [target_name])
 
 # Not really worth using, too slow
 def get_adjusted_weight_maps(blendshape_name):
@@ -375,8 +704,7 @@ def import_weight_map_to_targets(blendshape_name, targets, file_path):
         data = json.load(f)
 
     weight_map = WeightMap.load(data)
-    for target in targets:
-        apply_weightmap_to_target(blendshape_name, target, weight_map)
+    write_weights(blendshape_name, weight_map, targets)
 
 def get_all_blendshapes():
     # type: () -> List[str]
@@ -398,6 +726,17 @@ def apply_default_weightmap_to_target(blendshape_name, target_name):
     return default_weightmap
 
 def create_corrective_delta(blendshape, full_shapes, corrective):
+    # type: (str, List[str], str) -> Delta
+    """
+    Extract the corrective target on top of the full shapes as a delta before the skinCluster,
+    the extracted shape is created as a mesh named after the corrective.
+    """
+    # skincluster imports this module
+    from rigging_toolkit.maya.utils.deformers.skincluster import (
+        extract_corrective_deltas,
+        get_skin_cluster,
+        get_skin_cluster_rest_points,
+    )
 
     mesh = cmds.blendShape(blendshape, q=True, geometry=True)[0]
     dummy_mesh = cmds.duplicate(mesh, n="splitting_mesh")[0]
@@ -406,17 +745,27 @@ def create_corrective_delta(blendshape, full_shapes, corrective):
 
     activate_blendshape_target(blendshape, corrective)
 
-    corrective_shape = cmds.duplicate(mesh, name=f"{corrective}_corrective")[0]
+    sculpted_points = get_mesh_points(mesh)
 
     reset_blendshape_target(blendshape, corrective)
 
     activate_blendshape_targets(blendshape, full_shapes)
 
-    extracted_delta = ExtractCorrectiveDelta.calculate(mesh, corrective_shape)
+    delta = extract_corrective_deltas(mesh, {corrective: sculpted_points})[0]
+
+    # the delta is relative to the points going into the skinCluster, to the posed points without one
+    skin_cluster = get_skin_cluster(mesh)
+    if skin_cluster is None:
+        base_points, space = get_mesh_points(mesh), om2.MSpace.kWorld
+    else:
+        base_points, space = get_skin_cluster_rest_points(skin_cluster), om2.MSpace.kObject
+    extracted_delta = cmds.duplicate(dummy_mesh, name=f"{corrective}_delta")[0]
+    set_mesh_points(extracted_delta, base_points + delta.to_dense(len(base_points)), space)
 
     dummy_bsn = cmds.blendShape(extracted_delta, dummy_mesh)
 
     cmds.rename(extracted_delta, corrective)
+    return delta
 
 def set_delta_weightmap_to_target(blendshape_name, target):
     default_weight_map = apply_default_weightmap_to_target(blendshape_name, target)
@@ -454,20 +803,19 @@ def mirror_weight_map_by_pos(blendshape_name, target, mirror_type="world", mirro
     current_weight_map = get_weights_from_blendshape_target(blendshape_name, target)
     current_weights = current_weight_map.weights
     indicies = current_weight_map.indices
-    mirrored_weights_dict = {}
-    mirrored_values = []
-    for idx, weight in current_weights.items():
-        mirrored_idx = mirror_vertex_by_pos(mesh, idx, mirror_axis, mirror_type)
-        mirrored_weights_dict[mirrored_idx] = weight
-
-    non_mirrored_verticies = []
-
-    for vtx in indicies:
-        vtx_weights = mirrored_weights_dict.get(vtx)
-        if vtx_weights is None:
-            vtx_weights = 0.0
-            non_mirrored_verticies.append(vtx)
-        mirrored_values.append(vtx_weights)
+    source_ids = np.fromiter(current_weights.keys(), dtype=np.int64, count=len(current_weights))
+    source_values = np.fromiter(current_weights.values(), dtype=np.float64, count=len(current_weights))
+    mirrored_ids = mirror_vertices_by_pos(mesh, source_ids, mirror_axis, mirror_type)
+
+    num_vertices = max(len(indicies), int(mirrored_ids.max()) + 1 if len(mirrored_ids) else 0)
+    mirrored_weights = np.zeros(num_vertices, dtype=np.float64)
+    is_mirrored = np.zeros(num_vertices, dtype=bool)
+    mirrored_weights[mirrored_ids] = source_values
+    is_mirrored[mirrored_ids] = True
+
+    indicies = np.asarray(indicies, dtype=np.int64)
+    mirrored_values = mirrored_weights[indicies].tolist()
+    non_mirrored_verticies = indicies[~is_mirrored[indicies]].tolist()
 
     mirrored_weight_map = WeightMap(f"{current_weight_map.name}_mirrored", mirrored_values)
     apply_default_weightmap_to_target(blendshape_name, target)
@@ -1,16 +1,30 @@
 import maya.api.OpenMaya as om2
 import maya.api.OpenMayaAnim as oma2
 from maya import cmds
-from typing import Optional, Union, List, Text
+from typing import Dict, Optional, Union, List, Text, Tuple
 from .general import deformers_by_type
 from rigging_toolkit.core.filesystem import Path
-from xml.etree import ElementTree
+from rigging_toolkit.core.skin_weights_io import SKIN_WEIGHTS_EXTENSION, read_influences, read_xml_influences
+from rigging_toolkit.maya.utils.skin_weights import SkinWeights
+from rigging_toolkit.maya.utils.api import get_mobject
 import numpy as np
-from rigging_toolkit.maya.utils.mesh_utils import get_vertex_neighbours
+from rigging_toolkit.maya.utils.mesh_utils import get_mesh_points, get_mesh_topology
+from rigging_toolkit.maya.utils.smooth_skin_weights import smooth_weight_matrix
+from rigging_toolkit.maya.utils.prune_skin_weights import InfluenceReport, audit_weight_matrix, prune_weight_matrix
+from rigging_toolkit.core.component_list import decode_components
+from rigging_toolkit.core.mesh_topology import MeshTopology
+from rigging_toolkit.core.sparse import CSRMatrix
+from rigging_toolkit.core.weight_transfer import WeightTransfer, points_digest
+from rigging_toolkit.core.skinning import skinning_matrices
+from rigging_toolkit.core.corrective import OFFSET_TOLERANCE, corrective_offsets, sparse_offsets
+from rigging_toolkit.maya.utils.delta import Delta
 import logging
 
 logger = logging.getLogger(__name__)
 
+# closest point transfer engines by (mesh, points digest, topology digest)
+_WEIGHT_TRANSFERS = {}  # type: dict
+
 def get_skin_cluster(mesh):
     # type: (str) -> Optional[str]
     """Return the skincluster node attached to the mesh."""
@@ -21,6 +35,27 @@ def get_skin_cluster(mesh):
     return None
 
 
+def audit_skin_cluster(skin_cluster, max_influences=8, mesh=None):
+    # type: (str, Optional[int], Optional[str]) -> InfluenceReport
+    """Report the vertices weighted to more than max_influences, from a single weight matrix read."""
+    mesh = mesh or get_mesh_from_skincluster(skin_cluster)
+    _, weights = get_cached_skin_weight_matrix(skin_cluster)
+    return audit_weight_matrix(weights, max_influences, mesh=mesh, skin_cluster=skin_cluster)
+
+
+def audit_max_influences(max_influences=8):
+    # type: (Optional[int]) -> List[InfluenceReport]
+    """Audit every skinCluster in the scene, returns the reports of the meshes violating max_influences."""
+    reports = []
+    for cluster in cmds.ls(type="skinCluster"):
+        if not cmds.skinCluster(cluster, q=True, geometry=True):
+            continue
+        report = audit_skin_cluster(cluster, max_influences)
+        if not report.is_valid:
+            reports.append(report)
+    return reports
+
+
 def check_max_influences(max_influences=8):
     # type: (Optional[int]) -> list
     """
@@ -30,22 +65,17 @@ def check_max_influences(max_influences=8):
     """
 
     cmds.select(clear=True)
-    skin_clusters = cmds.ls(type="skinCluster")
     max_influences_violated_meshes = []
-    for cluster in skin_clusters:
-        cluster_geo = cmds.skinCluster(cluster, q=True, geometry=True)
-        if cluster_geo:
-            for mesh in cluster_geo:
-                influences = num_influences(cluster, mesh, max_influences)
-                if influences > max_influences:
-                    max_influences_violated_meshes.append(mesh)
-                    logger.warning(
-                        "Mesh {0} has up to {1} influences per vertex, only {2} allowed.".format(
-                            mesh,
-                            influences,
-                            max_influences,
-                        )
-                    )
+    for report in audit_max_influences(max_influences):
+        max_influences_violated_meshes.append(report.mesh)
+        logger.warning(
+            "Mesh {0} has up to {1} influences per vertex on {2} vertices, only {3} allowed.".format(
+                report.mesh,
+                report.max_count,
+                len(report.vertex_ids),
+                max_influences,
+            )
+        )
 
     return max_influences_violated_meshes
 
@@ -56,61 +86,43 @@ def num_influences(cluster, mesh, show_above):
     Returns the max influence of the passed skinCluster per vertex.
 
     """
-    vertices = cmds.polyListComponentConversion(mesh, toVertex=True)
-    vertices = cmds.filterExpand(vertices, selectionMask=31)  # polygon vertex
-    max_count = 0
-
-    if vertices:
-        for vert in vertices:
-            joints = cmds.skinPercent(
-                cluster, vert, query=True, ignoreBelow=0.00001, transform=None
+    report = audit_skin_cluster(cluster, show_above, mesh=mesh)
+    if not report.is_valid:
+        logger.warning(
+            "mesh {0} has {1} vertices with more than {2} influences per vertex: {3}".format(
+                mesh, len(report.vertex_ids), show_above, report.vertex_ids.tolist()
             )
+        )
 
-            count = len(joints)
-            if count > max_count:
-                max_count = count
-            if count > show_above:
-                logger.warning("mesh {0} vertex {1} has {2} influences per vertex.".format(mesh, vert, count))
-
-    return max_count
+    return report.max_count
 
 
 def prune_influences(meshes, max_influence=8):
-    # type: (list, Optional[int]) -> None
+    # type: (list, Optional[int]) -> List[InfluenceReport]
     """
     Prunes influences to match the provided max influence for each
     mesh in the provided list.
 
+    The weights of each mesh are read once, pruned and renormalized in numpy and set back in one call.
+    Returns the reports of the vertices that have been pruned.
     """
-
+    reports = []
     for mesh in meshes:
         skin = get_skin_cluster(mesh)
-        verts = cmds.ls(mesh + ".vtx[*]", fl=True)
-
-        for vtx in verts:
-            weights = cmds.skinPercent(
-                skin, vtx, ignoreBelow=0.00001, query=True, value=True
-            )
-            if weights is not None and len(weights) > max_influence:
-                max_weights = [0.0] * len(weights)
-
-                for weight in weights:
-                    # Find the index where the current weight should be inserted
-                    # in max_weights
-                    j = len(weights) - 1
-                    while j >= 0 and weight > max_weights[j]:
-                        j -= 1
-                    j += 1
+        if not skin:
+            logger.warning(f"No skinCluster found on {mesh}, cannot prune influences.")
+            continue
 
-                    for k in range(len(weights) - 1, j - 1, -1):
-                        max_weights[k] = max_weights[k - 1]
+        _, weights = get_cached_skin_weight_matrix(skin)
+        report = audit_weight_matrix(weights, max_influence, mesh=mesh, skin_cluster=skin)
+        if report.is_valid:
+            continue
 
-                    max_weights[j] = weight
+        logger.info(f"Pruning {len(report.vertex_ids)} vertices of {mesh} to {max_influence} influences")
+        set_skin_weight_matrix(skin, prune_weight_matrix(weights, max_influence))
+        reports.append(report)
 
-                prune_value = max_weights[max_influence] + 0.001
-                logger.info(prune_value)
-
-                cmds.skinPercent(skin, vtx, pruneWeights=prune_value)
+    return reports
 
 def export_skin_weights(mesh, path):
     # type: (str, Union[str, Path]) -> Path
@@ -124,11 +136,17 @@ def export_skin_weights(mesh, path):
         )
         return
     
+    if weights_path.suffix == f".{SKIN_WEIGHTS_EXTENSION}":
+        skin_weights = SkinWeights(mesh, get_skin_weights(skin_clusters[0]))
+        skin_weights.to_binary(weights_path, compress=True)
+        return weights_path
+
     weights_folder = str(weights_path.parent)
 
     cmds.deformerWeights(
         weights_path.name, path=weights_folder, ex=True, deformer=skin_clusters[0]
     )
+    return weights_path
 
 def bind_skin(mesh, joints):
     # type: (Text, List[Text]) -> Text
@@ -156,7 +174,7 @@ def bind_skin(mesh, joints):
 
 def import_skin_weights(mesh, weights_path):
     # type: (str, Path) -> None
-    """Import the maya skin weights on the mesh.
+    """Import the maya or binary skin weights on the mesh.
 
     This will automatically bind the mesh to the relevant joints if it has no skincluster.
     """
@@ -171,6 +189,12 @@ def import_skin_weights(mesh, weights_path):
         joints = joints_from_weights(weights_path)
         skin_cluster = bind_skin(mesh, joints)
 
+    if weights_path.suffix == f".{SKIN_WEIGHTS_EXTENSION}":
+        skin_weights = SkinWeights.from_binary(weights_path)
+        set_skin_weights(skin_cluster, skin_weights.weights)
+        cmds.skinCluster(skin_cluster, edit=True, forceNormalizeWeights=True)
+        return
+
     cmds.deformerWeights(
         weights_file, im=True, method="index", deformer=skin_cluster, path=weights_dir
     )
@@ -178,15 +202,76 @@ def import_skin_weights(mesh, weights_path):
 
 def joints_from_weights(weights_path):
     # type: (Path) -> List[str]
-    """List the joints used in an maya skin weights file."""
-    joints = []
-    tree = ElementTree.parse(str(weights_path))
-    root = tree.getroot()
-    for element in root:
-        joint = element.attrib.get("source")
-        if joint:
-            joints.append(joint)
-    return joints
+    """List the joints used in a maya or binary skin weights file."""
+    if Path(weights_path).suffix == f".{SKIN_WEIGHTS_EXTENSION}":
+        return read_influences(weights_path)
+    return read_xml_influences(weights_path)
+
+def _bind_to_influences(mesh, influences):
+    # type: (str, List[str]) -> str
+    """Return the skinCluster of the mesh, bound to or extended with the given influences."""
+    skin_cluster = get_skin_cluster(mesh)
+
+    if not skin_cluster:
+        return bind_skin(mesh, influences)
+
+    # make sure all the influences are in the skin cluster
+    current_influences = [path.partialPathName() for path in _get_skin_cluster_fn(skin_cluster).influenceObjects()]
+    for joint in influences:
+        if joint not in current_influences:
+            cmds.skinCluster(skin_cluster, edit=True, addInfluence=joint, weight=0.0)
+    return skin_cluster
+
+
+def get_weight_transfer(mesh):
+    # type: (str) -> WeightTransfer
+    """
+    Returns the closest point weight transfer engine of the mesh.
+
+    Engines, and the target correspondences they hold, are reused until the mesh topology or points change.
+    """
+    topology = get_mesh_topology(mesh)
+    key = (mesh, points_digest(topology.points), points_digest(topology.connects))
+    transfer = _WEIGHT_TRANSFERS.get(key)
+    if transfer is None:
+        for stale_key in [k for k in _WEIGHT_TRANSFERS if k[0] == mesh]:
+            del _WEIGHT_TRANSFERS[stale_key]
+        transfer = WeightTransfer.from_topology(topology)
+        _WEIGHT_TRANSFERS[key] = transfer
+    return transfer
+
+
+def transfer_skin_weights(source_mesh, target_meshes, processes=None):
+    # type: (str, List[str], Optional[int]) -> None
+    """
+    Transfer the skin weights of the source mesh to every target by closest point on surface.
+
+    The source weight matrix is read once and interpolated at the targets' closest points,
+    the correspondences of the targets are computed in a process pool when processes is given.
+    Targets are bound to, or extended with, the source influences when needed.
+    """
+    source_skin_cluster = get_skin_cluster(source_mesh)
+
+    if not source_skin_cluster:
+        raise RuntimeError("Source mesh has no skin cluster attached.")
+
+    influences, weights = get_cached_skin_weight_matrix(source_skin_cluster)
+    # the weight matrix columns follow influenceObjects, matched to the targets by full dag path
+    source_paths = _influence_paths(source_skin_cluster)
+    transfer = get_weight_transfer(source_mesh)
+
+    targets = {mesh: get_mesh_points(mesh) for mesh in target_meshes}
+    transferred = transfer.transfer_to_targets(weights, targets, processes=processes)
+
+    for mesh, matrix in transferred.items():
+        target_skin_cluster = _bind_to_influences(mesh, influences)
+        target_index = {path: i for i, path in enumerate(_influence_paths(target_skin_cluster))}
+
+        target_weights = np.zeros((len(matrix), len(target_index)))
+        target_weights[:, [target_index[path] for path in source_paths]] = matrix
+        set_skin_weight_matrix(target_skin_cluster, target_weights)
+        logger.info(f"Transferred the skin weights of {source_mesh} to {mesh}")
+
 
 def transfer_skin_cluster(source_mesh, target_mesh):
     # type: (str, str) -> None
@@ -195,35 +280,228 @@ def transfer_skin_cluster(source_mesh, target_mesh):
     If the target mesh isn't bound, it will be bound to the joints deforming the source mesh.
     If the target mesh is missing some joints from the source mesh, they will automatically be added.
     """
-    source_skin_cluster = get_skin_cluster(source_mesh)
+    transfer_skin_weights(source_mesh, [target_mesh])
 
-    if not source_skin_cluster:
-        raise RuntimeError("Source mesh has no skin cluster attached.")
+def _get_skin_cluster_fn(skin_cluster):
+    # type: (str) -> oma2.MFnSkinCluster
+    return oma2.MFnSkinCluster(get_mobject(skin_cluster))
 
-    source_joints = cmds.skinCluster(source_skin_cluster, query=True, influence=True)
 
-    target_skin_cluster = get_skin_cluster(target_mesh)
+def _influence_paths(skin_cluster):
+    # type: (str) -> List[str]
+    """Full dag paths of the influences, in the order of the weight matrix columns"""
+    return [path.fullPathName() for path in _get_skin_cluster_fn(skin_cluster).influenceObjects()]
 
-    if not target_skin_cluster:
-        target_skin_cluster = bind_skin(target_mesh, source_joints)
-    else:
-        # make sure all the source joints are in the target skin cluster
-        target_joints = cmds.skinCluster(
-            target_skin_cluster, query=True, influence=True
+
+def _get_vertex_components(fn_skin, num_vertices=None):
+    # type: (oma2.MFnSkinCluster, Optional[int]) -> Tuple[om2.MDagPath, om2.MObject]
+    """Return the skinned mesh path and a component holding the first num_vertices vertices."""
+    mesh_path = fn_skin.getPathAtIndex(0)
+    if num_vertices is None:
+        num_vertices = om2.MFnMesh(mesh_path).numVertices
+    fn_component = om2.MFnSingleIndexedComponent()
+    components = fn_component.create(om2.MFn.kMeshVertComponent)
+    fn_component.setCompleteData(num_vertices)
+    return mesh_path, components
+
+
+def get_skin_weight_matrix(skin_cluster):
+    # type: (str) -> Tuple[List[str], np.ndarray]
+    """
+    Returns the influences and the full (num_vertices, num_influences) weight matrix
+    of the skinCluster, read with a single MFnSkinCluster.getWeights call.
+
+    The columns follow the order of the influences returned by
+    cmds.skinCluster(q=True, influence=True).
+    """
+    fn_skin = _get_skin_cluster_fn(skin_cluster)
+    influences = [path.partialPathName() for path in fn_skin.influenceObjects()]
+
+    mesh_path, components = _get_vertex_components(fn_skin)
+    weights, num_influences = fn_skin.getWeights(mesh_path, components)
+
+    matrix = np.fromiter(weights, dtype=np.float64, count=len(weights))
+    return influences, matrix.reshape(-1, num_influences)
+
+
+def set_skin_weight_matrix(skin_cluster, weights, normalize=False):
+    # type: (str, np.ndarray, Optional[bool]) -> None
+    """
+    Sets a (num_vertices, num_influences) weight matrix on the skinCluster with a single
+    MFnSkinCluster.setWeights call. The columns must follow the skinCluster influence order.
+    """
+    fn_skin = _get_skin_cluster_fn(skin_cluster)
+    weights = np.asarray(weights, dtype=np.float64)
+    num_vertices, num_influences = weights.shape
+
+    if num_influences != len(fn_skin.influenceObjects()):
+        raise RuntimeError(
+            f"{skin_cluster} has {len(fn_skin.influenceObjects())} influences, got weights for {num_influences}"
         )
-        for joint in source_joints:
-            if joint not in target_joints:
-                cmds.skinCluster(
-                    target_skin_cluster, edit=True, addInfluence=joint, weight=0.0
-                )
-
-    cmds.copySkinWeights(
-        sourceSkin=source_skin_cluster,
-        destinationSkin=target_skin_cluster,
-        noMirror=True,
-        surfaceAssociation="closestPoint",
-        influenceAssociation="closestJoint",
-    )
+
+    mesh_path, components = _get_vertex_components(fn_skin, num_vertices)
+    influence_indices = om2.MIntArray(list(range(num_influences)))
+    values = om2.MDoubleArray(weights.ravel().tolist())
+
+    fn_skin.setWeights(mesh_path, components, influence_indices, values, normalize)
+    SKIN_WEIGHT_MATRIX_CACHE.invalidate(skin_cluster)
+
+
+class SkinWeightMatrixCache(object):
+    """
+    Keeps the weight matrix of skinClusters read with get_skin_weight_matrix.
+
+    An entry is dropped as soon as the weights or influence connections of its skinCluster change,
+    or the node is deleted, through maya node callbacks that only live as long as the entry.
+    """
+
+    WATCHED_ATTRIBUTES = ("weightList", "matrix")
+
+    def __init__(self):
+        self._entries = {}  # type: dict
+
+    def _key(self, node):
+        # type: (om2.MObject) -> int
+        return om2.MObjectHandle(node).hashCode()
+
+    def get(self, skin_cluster):
+        # type: (str) -> Tuple[List[str], np.ndarray]
+        node = get_mobject(skin_cluster)
+        key = self._key(node)
+        entry = self._entries.get(key)
+        if entry is not None and entry["handle"].isValid() and entry["handle"].object() == node:
+            return entry["influences"], entry["weights"]
+
+        self.invalidate(skin_cluster)
+        influences, weights = get_skin_weight_matrix(skin_cluster)
+        weights.flags.writeable = False
+
+        callbacks = [
+            om2.MNodeMessage.addNodeDirtyPlugCallback(node, self._on_dirty_plug, key),
+            om2.MNodeMessage.addAttributeChangedCallback(node, self._on_attribute_changed, key),
+            om2.MNodeMessage.addNodePreRemovalCallback(node, self._on_removed, key),
+        ]
+        self._entries[key] = {
+            "handle": om2.MObjectHandle(node),
+            "influences": influences,
+            "weights": weights,
+            "callbacks": callbacks,
+        }
+        return influences, weights
+
+    def _drop(self, key):
+        # type: (int) -> None
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            om2.MMessage.removeCallbacks(entry["callbacks"])
+
+    def _on_dirty_plug(self, node, plug, key):
+        if plug.partialName(useLongNames=True).startswith("weightList"):
+            self._drop(key)
+
+    def _on_attribute_changed(self, message, plug, other_plug, key):
+        if message & (om2.MNodeMessage.kConnectionMade | om2.MNodeMessage.kConnectionBroken):
+            if plug.partialName(useLongNames=True).startswith(self.WATCHED_ATTRIBUTES):
+                self._drop(key)
+
+    def _on_removed(self, node, key):
+        self._drop(key)
+
+    def invalidate(self, skin_cluster):
+        # type: (str) -> None
+        if not cmds.objExists(skin_cluster):
+            return
+        self._drop(self._key(get_mobject(skin_cluster)))
+
+    def clear(self):
+        # type: () -> None
+        for key in list(self._entries):
+            self._drop(key)
+
+
+SKIN_WEIGHT_MATRIX_CACHE = SkinWeightMatrixCache()
+
+
+def get_cached_skin_weight_matrix(skin_cluster):
+    # type: (str) -> Tuple[List[str], np.ndarray]
+    """
+    Same as get_skin_weight_matrix, but the result is reused until the skinCluster changes.
+
+    The returned matrix is read only, copy it before editing it.
+    """
+    return SKIN_WEIGHT_MATRIX_CACHE.get(skin_cluster)
+
+
+def _matrix_to_array(matrix):
+    # type: (om2.MMatrix) -> np.ndarray
+    return np.array([matrix[i] for i in range(16)], dtype=np.float64).reshape(4, 4)
+
+
+def get_skin_cluster_matrices(skin_cluster):
+    # type: (str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]
+    """
+    Returns the (J, 4, 4) bind pre matrices, the (J, 4, 4) current world matrices of the influences
+    and the (4, 4) geom matrix of the skinCluster, in the influence order of get_skin_weight_matrix.
+
+    Together with the weight matrix and the rest points they're everything
+    rigging_toolkit.core.skinning needs to evaluate the skinCluster outside of maya.
+    """
+    fn_skin = _get_skin_cluster_fn(skin_cluster)
+    bind_pre_plug = fn_skin.findPlug("bindPreMatrix", False)
+
+    bind_pre_matrices = []
+    world_matrices = []
+    for path in fn_skin.influenceObjects():
+        index = fn_skin.indexForInfluenceObject(path)
+        data = om2.MFnMatrixData(bind_pre_plug.elementByLogicalIndex(index).asMObject())
+        bind_pre_matrices.append(_matrix_to_array(data.matrix()))
+        world_matrices.append(_matrix_to_array(path.inclusiveMatrix()))
+
+    geom_data = om2.MFnMatrixData(fn_skin.findPlug("geomMatrix", False).asMObject())
+    return np.array(bind_pre_matrices), np.array(world_matrices), _matrix_to_array(geom_data.matrix())
+
+
+def get_skin_cluster_rest_points(skin_cluster):
+    # type: (str) -> np.ndarray
+    """Returns the (V, 3) points of the geometry going into the skinCluster, before deformation."""
+    fn_skin = _get_skin_cluster_fn(skin_cluster)
+    input_mesh = om2.MFnMesh(fn_skin.getInputGeometry()[0])
+    return np.array([[p.x, p.y, p.z] for p in input_mesh.getPoints()], dtype=np.float64)
+
+
+def extract_corrective_deltas(mesh, sculpted_shapes, tolerance=OFFSET_TOLERANCE):
+    # type: (str, Dict[str, np.ndarray], Optional[float]) -> List[Delta]
+    """
+    Solve the pre-deformation deltas of {name: (V, 3) sculpted world points} at the current pose,
+    all the correctives in one batch, without the invertShape plugin.
+
+    The deltas are relative to the points going into the skinCluster of the mesh, so they can be added
+    as targets of a blendshape before it. Without a skinCluster they're the difference with the current points.
+    """
+    names = list(sculpted_shapes)
+    sculpted_points = np.stack([np.asarray(sculpted_shapes[name], dtype=np.float64).reshape(-1, 3) for name in names])
+
+    skin_cluster = get_skin_cluster(mesh)
+    if skin_cluster is None:
+        offsets = sculpted_points - get_mesh_points(mesh)
+    else:
+        _, weights = get_cached_skin_weight_matrix(skin_cluster)
+        bind_pre_matrices, world_matrices, geom_matrix = get_skin_cluster_matrices(skin_cluster)
+        matrices = skinning_matrices(bind_pre_matrices, world_matrices, geom_matrix=geom_matrix)
+        offsets = corrective_offsets(get_skin_cluster_rest_points(skin_cluster), sculpted_points, matrices, weights)
+
+    return [
+        Delta(name, vertex_ids, values)
+        for name, (vertex_ids, values) in zip(names, sparse_offsets(offsets, tolerance))
+    ]
+
+
+def get_skin_weights_data(skin_cluster, max_influences=8):
+    # type: (str, Optional[int]) -> SkinWeights
+    """Returns the weights of a skinCluster as a SkinWeights object, read in bulk."""
+    influences, matrix = get_skin_weight_matrix(skin_cluster)
+    return SkinWeights.from_matrix(skin_cluster, influences, matrix, max_influences=max_influences)
+
 
 def get_skin_weights(name):
     # type: (str) -> dict
@@ -243,43 +521,7 @@ def get_skin_weights(name):
         ]
     }
     """
-    # get the influence names as a list with cmds because its dramatically easier than with om2
-    influences = cmds.skinCluster(name, q=True, influence=True)
-
-    # get the weight list plug. This is an array with one plug per vert of the skinned mesh
-    msel = om2.MSelectionList()
-    msel.add(f"{name}.weightList")
-    weight_list_p = msel.getPlug(0)
-    num_points = weight_list_p.numElements()
-
-    # this list will hold the weights. The index of each element corresponds to the
-    # vert id on the mesh. The list is pre-populated because its faster than appending
-    # on large meshes
-    weights = [{}] * num_points
-
-    # iterate over each vert weight
-    for i in range(num_points):
-        weight_list_element_p = weight_list_p.elementByPhysicalIndex(i)
-
-        # each weight list element has a single child plug that is a sparse array
-        # for the weights. The plug index corresponds to the index of the influence.
-        weight_p = weight_list_element_p.child(0)
-
-        # holds the weights for the current vert
-        vert_weights = {}
-
-        # get the influence indices used for this vert
-        indices = weight_p.getExistingArrayAttributeIndices()
-        for index in indices:
-            weight_element_p = weight_p.elementByLogicalIndex(index)
-            value = weight_element_p.asDouble()
-
-            # index represents the index of the influence
-            vert_weights[index] = value
-
-        weights[i] = vert_weights
-
-    return {"influences": influences, "weights": weights}
+    return get_skin_weights_data(name).weights
 
 
 def set_skin_weights(name, weight_data):
@@ -306,50 +548,34 @@ def set_skin_weights(name, weight_data):
     weight_data (dict): The weight data to apply to the skinCluster
     """
 
-    skin_influences = cmds.skinCluster(name, q=True, influence=True)
+    # the same influence names and order as the columns of set_skin_weight_matrix
+    skin_influences = [path.partialPathName() for path in _get_skin_cluster_fn(name).influenceObjects()]
+    skin_influence_index = {inf: i for i, inf in enumerate(skin_influences)}
 
-    # create a lookup table that maps the index of the skinClusters influence with the index of
-    # the influences in the passed weight_data.This will be used to determine which weight plug
-    # index to apply the weight_data to
-    inf_table = {}
+    # create a lookup table that maps the index of the influences in the passed weight_data
+    # to the index of the skinClusters influence, this is used to scatter the weights
+    # into the right column of the weight matrix
+    inf_table = np.zeros(len(weight_data["influences"]), dtype=np.int64)
     for i, inf in enumerate(weight_data["influences"]):
-        if inf not in skin_influences:
+        if inf not in skin_influence_index:
             raise RuntimeError(
-                f"{name} has is missing influence {inf}, unable to set weights"
+                f"{name} is missing the influence {inf}, unable to set weights"
             )
-        inf_table[i] = skin_influences.index(inf)
-
-    # get the weight list plug. This is an array with one plug per vert of the skinned mesh
-    msel = om2.MSelectionList()
-    msel.add(f"{name}.weightList")
-    weight_list_p = msel.getPlug(0)
-    num_points = weight_list_p.numElements()
-
-    # iterate over the weights
-    for i, weights in enumerate(weight_data["weights"]):
-        weight_list_element_p = weight_list_p.elementByPhysicalIndex(i)
-
-        # get the weight plug from the weight list element
-        weight_p = weight_list_element_p.child(0)
-
-        # Before applying the new weights, any existing weights on the vert need to be removed.
-        indices = weight_p.getExistingArrayAttributeIndices()
-        for index in indices:
-            weight_element_p = weight_p.elementByLogicalIndex(index)
-            weight_element_p.setDouble(0)
+        inf_table[i] = skin_influence_index[inf]
 
-        # apply the weights to the plugs
-        for index, weight in weights.items():
-            # get the plug using logical index because the index must correspond with the joints
-            # index on the skinCluster.
-            # The inf_table is used incase the influence order is different from the passed
-            # weight data than the influence order on the skin_cluster
-            weight_element_p = weight_p.elementByLogicalIndex(inf_table[index])
+    skin_weights = SkinWeights(name, weight_data)
+    matrix = skin_weights.to_matrix(num_influences=len(skin_influences), influence_map=inf_table)
 
-            weight_element_p.setDouble(weight)
+    set_skin_weight_matrix(name, matrix)
 
 
 class SmoothSkinWeights(object):
+    """
+    Smooths the weights of a skinCluster.
+
+    The mesh topology, k-ring neighbourhoods and overlapping vertices are precomputed once
+    into a sparse averaging operator, each iteration is then a single sparse x weight matrix product.
+    """
 
     def __init__(
         self,
@@ -364,7 +590,7 @@ class SmoothSkinWeights(object):
     ):
 
         self._skinCluster = skinCluster
-        self._vertices = vertices or self._get_vertices_from_skincluster()
+        self._vertices = vertices
         self._iterations = iterations
         self._depth = depth
         self._use_faces = use_faces
@@ -372,7 +598,10 @@ class SmoothSkinWeights(object):
         self._distance_threshold = distance_threshold
         self._smooth_factor = smooth_factor
 
-        self._initial_weights = get_skin_weights(self._skinCluster)
+        self._topology = None  # type: Optional[MeshTopology]
+        self._operator = None  # type: Optional[CSRMatrix]
+
+        self._influences, self._initial_weights = get_skin_weight_matrix(self._skinCluster)
         self._new_weights = self._initial_weights
 
     @property
@@ -382,6 +611,10 @@ class SmoothSkinWeights(object):
     @skinCluster.setter
     def skinCluster(self, skin_cluster):
         self._skinCluster = skin_cluster
+        self._topology = None
+        self._operator = None
+        self._influences, self._initial_weights = get_skin_weight_matrix(self._skinCluster)
+        self._new_weights = self._initial_weights
 
     @property
     def vertices(self):
@@ -389,7 +622,7 @@ class SmoothSkinWeights(object):
 
     @vertices.setter
     def vertices(self, v_ids):
-        self._vertices = v_ids or self._get_vertices_from_skincluster()
+        self._vertices = v_ids
 
     @property
     def iterations(self):
@@ -406,6 +639,7 @@ class SmoothSkinWeights(object):
     @depth.setter
     def depth(self, depth):
         self._depth = depth
+        self._operator = None
 
     @property
     def use_faces(self):
@@ -414,6 +648,7 @@ class SmoothSkinWeights(object):
     @use_faces.setter
     def use_faces(self, use_faces):
         self._use_faces = use_faces
+        self._operator = None
 
     @property
     def include_overlap(self):
@@ -422,6 +657,7 @@ class SmoothSkinWeights(object):
     @include_overlap.setter
     def include_overlap(self, include_overlap):
         self._include_overlap = include_overlap
+        self._operator = None
 
     @property
     def distance_threshold(self):
@@ -430,6 +666,7 @@ class SmoothSkinWeights(object):
     @distance_threshold.setter
     def distance_threshold(self, distance_threshold):
         self._distance_threshold = distance_threshold
+        self._operator = None
 
     @property
     def smooth_factor(self):
@@ -439,8 +676,14 @@ class SmoothSkinWeights(object):
     def smooth_factor(self, smooth_factor):
         self._smooth_factor = smooth_factor
 
+    @property
+    def influences(self):
+        # type: () -> List[str]
+        return self._influences
+
     @property
     def initial_weights(self):
+        # type: () -> np.ndarray
         return self._initial_weights
 
     @initial_weights.setter
@@ -449,12 +692,33 @@ class SmoothSkinWeights(object):
 
     @property
     def new_weights(self):
+        # type: () -> np.ndarray
         return self._new_weights
 
     @new_weights.setter
     def new_weights(self, new_weights):
         self._new_weights = new_weights
 
+    @property
+    def topology(self):
+        # type: () -> MeshTopology
+        if self._topology is None:
+            shape = cmds.skinCluster(self._skinCluster, q=True, g=True)[0]
+            self._topology = get_mesh_topology(shape)
+        return self._topology
+
+    @property
+    def operator(self):
+        # type: () -> CSRMatrix
+        if self._operator is None:
+            self._operator = self.topology.smoothing_operator(
+                depth=self.depth,
+                use_faces=self.use_faces,
+                include_overlap=self.include_overlap,
+                distance_threshold=self.distance_threshold,
+            )
+        return self._operator
+
     @classmethod
     def new(
         self,
@@ -478,74 +742,24 @@ class SmoothSkinWeights(object):
             smooth_factor=smooth_factor,
         )
 
-    def _get_vertices_from_skincluster(self):
-        return cmds.ls(
-            f"{cmds.listRelatives(cmds.skinCluster(self._skinCluster, q=True, g=True), p=True)[0]}.vtx[*]",
-            fl=True,
-        )
-
-    def normalize_weights(self, weights):
-        total_weight = np.sum(weights)
-        normalized_weights = weights / total_weight
-        return normalized_weights
-
-    def smooth_weight(self, current_weight, neighbor_weights, smooth_factor):
-        all_joints = set(current_weight.keys())
-        for neighbor_weight in neighbor_weights:
-            all_joints.update(neighbor_weight.keys())
-
-        all_joints = sorted(all_joints)
-        joint_index = {joint: idx for idx, joint in enumerate(all_joints)}
+    def _get_vertex_ids(self):
+        # type: () -> Optional[np.ndarray]
+        """Vertex ids of the selected components, e.g. ["geo_head_L1.vtx[12]", "geo_head_L1.vtx[20:24]"]"""
+        if not self._vertices:
+            return None
+        return decode_components(self._vertices)
 
-        current_weight_array = np.zeros(len(all_joints))
-        for joint, weight in current_weight.items():
-            current_weight_array[joint_index[joint]] = weight
-
-        neighbor_weight_arrays = []
-        for neighbor_weight in neighbor_weights:
-            neighbor_weight_array = np.zeros(len(all_joints))
-            for joint, weight in neighbor_weight.items():
-                neighbor_weight_array[joint_index[joint]] = weight
-            neighbor_weight_arrays.append(neighbor_weight_array)
-
-        neighbor_weight_arrays = np.array(neighbor_weight_arrays)
-
-        smoothed_weight_array = np.zeros(len(all_joints))
+    def run(self):
 
-        smoothed_weight_array += (1 - smooth_factor) * np.sum(
-            neighbor_weight_arrays, axis=0
+        self._new_weights = smooth_weight_matrix(
+            self.operator,
+            self._new_weights,
+            vertex_ids=self._get_vertex_ids(),
+            iterations=self.iterations,
+            smooth_factor=self.smooth_factor,
         )
 
-        smoothed_weight_array += smooth_factor * current_weight_array
-
-        smoothed_weight_array = self.normalize_weights(smoothed_weight_array)
-
-        smoothed_weight = {
-            joint: smoothed_weight_array[idx] for joint, idx in joint_index.items()
-        }
-
-        return smoothed_weight
-
-    def run(self):
-
-        for i in range(self.iterations):
-            for vtx in self._vertices:
-                v_id, neighbour_vertices = get_vertex_neighbours(
-                    [vtx],
-                    depth=self.depth,
-                    use_faces=self.use_faces,
-                    include_overlap=self.include_overlap,
-                    distance_threshold=self.distance_threshold,
-                )
-                current_weight = self._new_weights["weights"][v_id[0]]
-                neighbour_weights = [
-                    self._new_weights["weights"][x] for x in neighbour_vertices
-                ]
-                self._new_weights["weights"][v_id[0]] = self.smooth_weight(
-                    current_weight, neighbour_weights, self.smooth_factor
-                )
-
-        set_skin_weights(self.skinCluster, self._new_weights)
+        set_skin_weight_matrix(self.skinCluster, self._new_weights)
 
 
 def get_mesh_from_skincluster(skin_cluster):
@@ -556,28 +770,41 @@ def get_mesh_from_skincluster(skin_cluster):
     return mesh
 
 
-def get_influenced_vertices_from_skincluster(
-    skin_cluster, joint_list=[], weight_threshold=0.01
-):
-    # type: (str, Optional[List[str]], Optional[float]) -> None
-
-    mesh = get_mesh_from_skincluster(skin_cluster)
-
-    num_vertices = cmds.polyEvaluate(mesh, vertex=True)
+def get_influenced_vertices(skin_cluster, joint_list=None, weight_threshold=0.01):
+    # type: (str, Optional[List[str]], Optional[float]) -> dict
+    """
+    Returns a {joint: vertex ids} map of the vertices weighted to each joint at or above the threshold.
 
-    affected_vertices = []
+    All the joints are answered from a single, cached, weight matrix read.
+    """
+    influences, weights = get_cached_skin_weight_matrix(skin_cluster)
+    influence_index = {inf: i for i, inf in enumerate(influences)}
 
     if not joint_list:
-        joint_list = cmds.skinCluster(skin_cluster, q=True, inf=True)
+        joint_list = influences
 
+    influenced_vertices = {}
     for joint in joint_list:
+        column = influence_index.get(joint)
+        if column is None and cmds.objExists(joint):
+            # long or namespaced names resolve to the short unique names used for the columns
+            column = influence_index.get(cmds.ls(joint)[0])
+        if column is None:
+            raise RuntimeError(f"{joint} is not an influence of {skin_cluster}")
+        influenced_vertices[joint] = np.flatnonzero(weights[:, column] >= weight_threshold)
+
+    return influenced_vertices
 
-        for i in range(num_vertices):
-            weight = cmds.skinPercent(
-                skin_cluster, f"{mesh}.vtx[{i}]", transform=joint, query=True
-            )
 
-            if weight >= weight_threshold:
-                affected_vertices.append(i)
+def get_influenced_vertices_from_skincluster(
+    skin_cluster, joint_list=[], weight_threshold=0.01
+):
+    # type: (str, Optional[List[str]], Optional[float]) -> List[int]
+    """Returns the sorted unique ids of the vertices weighted to any of the joints at or above the threshold."""
+
+    if not joint_list:
+        _, weights = get_cached_skin_weight_matrix(skin_cluster)
+        return np.flatnonzero(weights.max(axis=1, initial=0.0) >= weight_threshold).tolist()
 
-    return affected_vertices
+    influenced_vertices = get_influenced_vertices(skin_cluster, joint_list, weight_threshold)
+    return np.unique(np.concatenate(list(influenced_vertices.values()))).tolist()
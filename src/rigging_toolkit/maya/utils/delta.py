@@ -1,4 +1,4 @@
-from typing import List, Optional, Generator, Tuple
+from typing import Iterable, List, Optional, Generator, Sequence, Tuple, Union, TYPE_CHECKING
 
 import numpy as np
 
@@ -7,56 +7,102 @@ import logging
 logger = logging.getLogger(__name__)
 from contextlib import contextmanager
 
+if TYPE_CHECKING:
+    from rigging_toolkit.maya.utils.weightmap import WeightMap
+
+
 class Delta(object):
+    """
+    Sparse per vertex offsets of a shape, stored as numpy arrays of sorted int32 vertex indices
+    and the matching float32 (n, 3) offsets.
+    """
+
     def __init__(self, name, indices, deltas):
-        # type: (str, List, List) -> None
+        # type: (str, Union[List, np.ndarray], Union[List, np.ndarray]) -> None
         self.name = name
-        self.indices = indices
-        self.deltas = np.array(deltas)
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        deltas = np.asarray(deltas, dtype=np.float32).reshape(-1, 3)
+        if len(indices) != len(deltas):
+            raise ValueError(f"Delta {name} has {len(indices)} indices but {len(deltas)} offsets")
 
-    def __sub__(self, other):
-        # type: (Delta) -> Optional[Delta]
-        # compare the indices of the delta objects
-        all_indices = list(set.union(set(self.indices), set(other.indices)))
-        if len(all_indices) == 0:
-            return None
+        if len(indices) > 1 and not np.all(indices[1:] > indices[:-1]):
+            # sort the indices and sum the offsets of duplicated ones
+            indices, inverse = np.unique(indices, return_inverse=True)
+            summed = np.zeros((len(indices), 3))
+            np.add.at(summed, inverse.ravel(), deltas)
+            deltas = summed.astype(np.float32)
 
-        values1 = np.zeros(shape=(len(all_indices), 3))
-        indices1 = [all_indices.index(idx) for idx in self.indices]
-        values1[indices1] = self.deltas
+        self.indices = indices.astype(np.int32)
+        self.deltas = deltas
 
-        values2 = np.zeros(shape=(len(all_indices), 3))
-        indices2 = [all_indices.index(idx) for idx in other.indices]
-        values2[indices2] = other.deltas
+    def __len__(self):
+        # type: () -> int
+        return len(self.indices)
 
-        nvalues = values1 - values2
-        return Delta(f"{self.name}-{other.name}", all_indices, nvalues)
+    @staticmethod
+    def sum(deltas, scales=None, name=None):
+        # type: (Sequence[Delta], Optional[Iterable[float]], Optional[str]) -> Delta
+        """
+        Sum any number of deltas, each multiplied by its scale, in a single merge
+        over the union of their indices.
+        """
+        deltas = list(deltas)
+        scales = [1.0] * len(deltas) if scales is None else list(scales)
+        if name is None:
+            name = "+".join(d.name for d in deltas)
+
+        if not deltas:
+            return Delta(name, [], [])
+        indices = np.unique(np.concatenate([d.indices for d in deltas]))
+        values = np.zeros((len(indices), 3))
+        for delta, scale in zip(deltas, scales):
+            values[np.searchsorted(indices, delta.indices)] += scale * delta.deltas.astype(np.float64)
+        return Delta(name, indices, values)
+
+    def __sub__(self, other):
+        # type: (Delta) -> Optional[Delta]
+        if not len(self) and not len(other):
+            return None
+        return Delta.sum([self, other], scales=[1.0, -1.0], name=f"{self.name}-{other.name}")
 
     def __add__(self, other):
         # type: (Delta) -> Optional[Delta]
-        # compare the indices of the delta objects
-        all_indices = list(set.union(set(self.indices), set(other.indices)))
-        if len(all_indices) == 0:
+        if not len(self) and not len(other):
             return None
+        return Delta.sum([self, other], name=f"{self.name}+{other.name}")
+
+    def __mul__(self, other):
+        # type: (Union[float, WeightMap]) -> Delta
+        if hasattr(other, "values"):
+            return self.weighted(other)
+        return Delta(self.name, self.indices, self.deltas * np.float32(other))
+
+    __rmul__ = __mul__
 
-        values1 = np.zeros(shape=(len(all_indices), 3))
-        indices1 = [all_indices.index(idx) for idx in self.indices]
-        values1[indices1] = self.deltas
+    def __neg__(self):
+        # type: () -> Delta
+        return self * -1.0
 
-        values2 = np.zeros(shape=(len(all_indices), 3))
-        indices2 = [all_indices.index(idx) for idx in other.indices]
-        values2[indices2] = other.deltas
+    def weighted(self, weight_map):
+        # type: (WeightMap) -> Delta
+        """Multiply the offset of every vertex by its weight in the weight map."""
+        weights = np.asarray(weight_map.values, dtype=np.float32)[self.indices]
+        return Delta(f"{self.name}_{weight_map.name}", self.indices, self.deltas * weights[:, np.newaxis])
 
-        nvalues = values1 + values2
-        return Delta(f"{self.name}+{other.name}", all_indices, nvalues)
+    def to_dense(self, vertex_count):
+        # type: (int) -> np.ndarray
+        """Offsets of all the vertices as a (vertex_count, 3) array."""
+        dense = np.zeros((vertex_count, 3), dtype=np.float32)
+        dense[self.indices] = self.deltas
+        return dense
 
     def __eq__(self, other):
         # type: (object) -> bool
         if not isinstance(other, Delta):
             return False
-        if not self.indices == other.indices:
+        if not np.array_equal(self.indices, other.indices):
             return False
-        return np.all(self.deltas == other.deltas)
+        return bool(np.array_equal(self.deltas, other.deltas))
 
     def __ne__(self, other):
         # type: (object) -> bool
@@ -64,9 +110,10 @@ class Delta(object):
 
     def data(self):
         # type: () -> dict
+        """Json serialisable data, the arrays as python lists"""
         return {
             "name": self.name,
-            "indices": self.indices,
+            "indices": self.indices.tolist(),
             "deltas": self.deltas.tolist(),
         }
 
@@ -9,6 +9,8 @@ from rigging_toolkit.core.filesystem import find_new_version
 from rigging_toolkit.maya.utils.api.dag import get_dag_path_api_2
 import maya.api.OpenMaya as om2
 from rigging_toolkit.maya.utils.delta import Delta
+from rigging_toolkit.core.mesh_topology import MeshTopology
+from rigging_toolkit.core.spatial import SpatialIndex
 
 TEMPLATE_OFF = 0
 TEMPLATE_ON = 1
@@ -351,6 +353,53 @@ def mirror_vertex_by_pos(mesh, vtx, mirror_axis="x", space="world"):
     closest_vertex = closest_vertex_from_point(mesh, mirrored_point)
     return closest_vertex
 
+def get_mesh_points(mesh, space=om2.MSpace.kWorld):
+    # type: (str, om2.MSpace) -> np.ndarray
+    """Read all the points of the mesh in one call as a (num_vertices, 3) array."""
+    fn_mesh = om2.MFnMesh(get_dag_path_api_2(mesh))
+    return np.array([[p.x, p.y, p.z] for p in fn_mesh.getPoints(space)], dtype=np.float64)
+
+def set_mesh_points(mesh, points, space=om2.MSpace.kWorld):
+    # type: (str, np.ndarray, om2.MSpace) -> None
+    """Set all the points of the mesh in one call from a (num_vertices, 3) array."""
+    fn_mesh = om2.MFnMesh(get_dag_path_api_2(mesh))
+    fn_mesh.setPoints(om2.MPointArray(np.asarray(points, dtype=np.float64).tolist()), space)
+
+def get_mesh_spatial_index(mesh, space=om2.MSpace.kWorld, cell_size=None):
+    # type: (str, om2.MSpace, Optional[float]) -> SpatialIndex
+    return SpatialIndex(get_mesh_points(mesh, space), cell_size=cell_size)
+
+def closest_vertices_from_points(mesh, points, space=om2.MSpace.kWorld, spatial_index=None):
+    # type: (str, np.ndarray, om2.MSpace, Optional[SpatialIndex]) -> np.ndarray
+    """Batch version of closest_vertex_from_point, returns the closest vertex id of every point."""
+    spatial_index = spatial_index or get_mesh_spatial_index(mesh, space)
+    _, indices = spatial_index.query_nearest(points, k=1)
+    return indices[:, 0]
+
+def mirror_vertices_by_pos(mesh, vertices=None, mirror_axis="x", space="world", tolerance=None, spatial_index=None):
+    # type: (str, Optional[List[int]], Optional[str], Optional[str], Optional[float], Optional[SpatialIndex]) -> np.ndarray
+    '''
+    Batch version of mirror_vertex_by_pos using a spatial index built once for the mesh
+
+    Args:
+        mesh -> string representing mesh name
+        vertices -> vertex ids to mirror, all the vertices of the mesh if not provided
+        mirror axis -> string representing a valid axis, "x", "y" or "z"
+        space -> string representing valid space position, "object" or "world"
+        tolerance -> max distance between a mirrored position and its closest vertex,
+                vertices without a match within tolerance are mirrored to -1
+
+    Return:
+        mirrored_ids -> array of the mirrored vertex id of every vertex
+    '''
+    if spatial_index is None:
+        mspace = om2.MSpace.kObject if space.lower() == "object" else om2.MSpace.kWorld
+        spatial_index = get_mesh_spatial_index(mesh, mspace)
+    mirrored_ids = spatial_index.mirror_indices(axis=mirror_axis, tolerance=tolerance)
+    if vertices is None:
+        return mirrored_ids
+    return mirrored_ids[np.asarray(vertices, dtype=np.int64)]
+
 def mirror_vertices_by_edge(mesh, edge_id, v_ids):
     # type: (str, int, List[int]) -> List[int]
     
@@ -432,44 +481,14 @@ def get_vertex_neighbours(
         neighbouring_vertices = _get_neighbours(it_vtx, fn_mesh, vert_ids, use_faces)
 
         all_vertex_positions = np.array(
-            [
-                [
-                    fn_mesh.getPoint(v, om2.MSpace.kWorld).x,
-                    fn_mesh.getPoint(v, om2.MSpace.kWorld).y,
-                    fn_mesh.getPoint(v, om2.MSpace.kWorld).z,
-                ]
-                for v in range(fn_mesh.numVertices)
-            ]
+            [[p.x, p.y, p.z] for p in fn_mesh.getPoints(om2.MSpace.kWorld)], dtype=np.float64
         )
-
-        vert_positions = np.array(
-            [
-                [
-                    fn_mesh.getPoint(vtx, om2.MSpace.kWorld).x,
-                    fn_mesh.getPoint(vtx, om2.MSpace.kWorld).y,
-                    fn_mesh.getPoint(vtx, om2.MSpace.kWorld).z,
-                ]
-                for vtx in vert_ids
-            ]
-        )
-
-        def _find_nearby_vertices(
-            vert_positions, all_vertex_positions, distance_threshold
-        ):
-            distances = np.linalg.norm(
-                all_vertex_positions[:, np.newaxis, :]
-                - vert_positions[np.newaxis, :, :],
-                axis=2,
-            )
-            within_threshold = np.where(distances <= distance_threshold)
-            nearby_indices = within_threshold[0]
-            return nearby_indices
-
-        nearby_indices = _find_nearby_vertices(
-            vert_positions, all_vertex_positions, distance_threshold
+        spatial_index = SpatialIndex(all_vertex_positions, cell_size=distance_threshold or None)
+        _, nearby_indices = spatial_index.query_radius(
+            all_vertex_positions[list(vert_ids)], distance_threshold
         )
         unique_nearby_indices = (
-            set(nearby_indices) - set(vert_ids) - set(neighbouring_vertices)
+            set(nearby_indices.tolist()) - set(vert_ids) - set(neighbouring_vertices)
         )
 
         overlap_ids = list(unique_nearby_indices)
@@ -486,12 +505,24 @@ def get_vertex_neighbours(
 
     return (og_verts, neighbouring_vertices)
 
+def get_mesh_topology(mesh, space=om2.MSpace.kWorld):
+    # type: (str, om2.MSpace) -> MeshTopology
+    """Read the polygon topology and points of the mesh in bulk."""
+    fn_mesh = om2.MFnMesh(get_dag_path_api_2(mesh))
+    counts, connects = fn_mesh.getVertices()
+    points = fn_mesh.getPoints(space)
+    return MeshTopology(
+        np.array(counts, dtype=np.int64),
+        np.array(connects, dtype=np.int64),
+        np.array([[p.x, p.y, p.z] for p in points], dtype=np.float64),
+    )
+
 def apply_delta_to_mesh(delta, mesh):
     # type: (str, Delta) -> None
     mesh_fn = om2.MFnMesh(get_dag_path_api_2(mesh))
     points = mesh_fn.getPoints()
 
-    for id, offset in zip(delta.indices, delta.deltas):
+    for id, offset in zip(delta.indices.tolist(), delta.deltas.tolist()):
         points[id] = points[id] + om2.MVector(offset)
 
     mesh_fn.setPoints(points)
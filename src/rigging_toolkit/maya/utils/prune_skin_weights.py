@@ -0,0 +1,71 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from rigging_toolkit.maya.utils.smooth_skin_weights import normalize_weight_matrix
+
+# weights below this value are not counted as influences, matches the skinPercent ignoreBelow used before
+WEIGHT_THRESHOLD = 0.00001
+
+
+@dataclass
+class InfluenceReport:
+    """Vertices of a mesh weighted to more influences than allowed."""
+
+    mesh: str
+    skin_cluster: str
+    max_influences: int
+    vertex_ids: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    counts: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    max_count: int = 0
+
+    @property
+    def is_valid(self):
+        # type: () -> bool
+        return not len(self.vertex_ids)
+
+    def components(self):
+        # type: () -> List[str]
+        return [f"{self.mesh}.vtx[{i}]" for i in self.vertex_ids]
+
+
+def influence_counts(weights, threshold=WEIGHT_THRESHOLD):
+    # type: (np.ndarray, Optional[float]) -> np.ndarray
+    """Number of influences weighted at or above the threshold on each row of a weight matrix."""
+    return np.count_nonzero(np.asarray(weights) >= threshold, axis=1)
+
+
+def audit_weight_matrix(weights, max_influences=8, threshold=WEIGHT_THRESHOLD, mesh="", skin_cluster=""):
+    # type: (np.ndarray, Optional[int], Optional[float], Optional[str], Optional[str]) -> InfluenceReport
+    """Report the rows of a (num_vertices, num_influences) weight matrix using more than max_influences."""
+    counts = influence_counts(weights, threshold)
+    vertex_ids = np.flatnonzero(counts > max_influences)
+    return InfluenceReport(
+        mesh,
+        skin_cluster,
+        max_influences,
+        vertex_ids,
+        counts[vertex_ids],
+        int(counts.max()) if len(counts) else 0,
+    )
+
+
+def prune_weight_matrix(weights, max_influences=8, threshold=WEIGHT_THRESHOLD):
+    # type: (np.ndarray, Optional[int], Optional[float]) -> np.ndarray
+    """
+    Keep the max_influences largest weights of every row using more influences than allowed,
+    and renormalize those rows. The other rows are left untouched.
+    """
+    weights = np.array(weights, dtype=np.float64)
+    rows = np.flatnonzero(influence_counts(weights, threshold) > max_influences)
+    if not len(rows):
+        return weights
+
+    offending = weights[rows]
+    # every weight outside of the top max_influences of its row
+    smallest = np.argpartition(-offending, max_influences, axis=1)[:, max_influences:]
+    np.put_along_axis(offending, smallest, 0.0, axis=1)
+    offending[offending < threshold] = 0.0
+    weights[rows] = normalize_weight_matrix(offending)
+    return weights
@@ -2,12 +2,22 @@
 # coding=future_fstrings
 from __future__ import absolute_import, division, print_function
 
-from typing import TYPE_CHECKING, List, Optional, Union
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
 
 import json
 
 import numpy as np
 
+from rigging_toolkit.core.skin_weights_io import (
+    SKIN_WEIGHTS_EXTENSION,
+    weights_to_csr,
+    csr_to_weights,
+    write_skin_weights,
+    read_skin_weights,
+    SkinWeightsData,
+)
+from rigging_toolkit.core.skin_weights_diff import SkinWeightsDiff, compare_skin_weights
+
 if TYPE_CHECKING:
     from rigging_toolkit.core.filesystem import Path
 
@@ -170,19 +180,109 @@ class SkinWeights(object):
             "max_influences": self.max_influences
         }
     
+    def to_csr(self):
+        # type: () -> Tuple[np.ndarray, np.ndarray, np.ndarray]
+        """Return the weights as (indptr, influence indices, weights) CSR arrays."""
+        return weights_to_csr(self.weights["weights"])
+
+    def to_matrix(self, num_influences=None, influence_map=None):
+        # type: (Optional[int], Optional[np.ndarray]) -> np.ndarray
+        """
+        Return the weights as a dense (num_weights, num_influences) matrix.
+
+        influence_map optionally remaps the stored influence indices to matrix columns.
+        """
+        indptr, indices, values = self.to_csr()
+        if influence_map is not None:
+            indices = np.asarray(influence_map)[indices]
+        if num_influences is None:
+            num_influences = self.num_influences
+        rows = np.repeat(np.arange(self.num_weights), np.diff(indptr))
+        matrix = np.zeros((self.num_weights, num_influences), dtype=np.float64)
+        matrix[rows, indices] = values
+        return matrix
+
+    def to_data(self):
+        # type: () -> SkinWeightsData
+        indptr, indices, values = self.to_csr()
+        return SkinWeightsData(self.name, self.influences, self.max_influences, indptr, indices, values)
+
+    def compare(self, other, tolerance=1e-4, normalization_tolerance=1e-3):
+        # type: (SkinWeights, Optional[float], Optional[float]) -> SkinWeightsDiff
+        """Compare the weights with other, influences are matched by name."""
+        return compare_skin_weights(
+            self.to_data(),
+            other.to_data(),
+            tolerance=tolerance,
+            normalization_tolerance=normalization_tolerance,
+        )
+
     def to_file(self, path):
         # type: (Union[str, Path]) -> None
+        if str(path).endswith(f".{SKIN_WEIGHTS_EXTENSION}"):
+            self.to_binary(path)
+            return
         with open(str(path), "w") as f:
             json.dump(self.to_dict(), f, indent=4)
+
+    def to_binary(self, path, precision="float32", compress=False):
+        # type: (Union[str, Path], Optional[str], Optional[bool]) -> None
+        indptr, indices, values = self.to_csr()
+        write_skin_weights(
+            path,
+            self.name,
+            self.influences,
+            indptr,
+            indices,
+            values,
+            max_influences=self.max_influences,
+            precision=precision,
+            compress=compress,
+        )
     
     @classmethod
     def from_dict(cls, data):
         # type: (dict) -> SkinWeights
         return cls(data["name"], data["weights"], data["max_influences"])
 
+    @classmethod
+    def from_csr(cls, name, influences, indptr, indices, values, max_influences=8):
+        # type: (str, List[str], np.ndarray, np.ndarray, np.ndarray, Optional[int]) -> SkinWeights
+        weights = {
+            "influences": list(influences),
+            "weights": csr_to_weights(indptr, indices, values),
+        }
+        return cls(name, weights, max_influences)
+
+    @classmethod
+    def from_matrix(cls, name, influences, matrix, max_influences=8, threshold=0.0):
+        # type: (str, List[str], np.ndarray, Optional[int], Optional[float]) -> SkinWeights
+        """Create SkinWeights from a dense (num_vertices, num_influences) matrix, dropping weights <= threshold."""
+        matrix = np.asarray(matrix)
+        mask = matrix > threshold
+        indptr = np.zeros(matrix.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.count_nonzero(mask, axis=1), out=indptr[1:])
+        _, indices = np.nonzero(mask)
+        return cls.from_csr(name, influences, indptr, indices, matrix[mask], max_influences=max_influences)
+
     @classmethod
     def from_file(cls, path):
         # type: (Union[str, Path]) -> SkinWeights
+        if str(path).endswith(f".{SKIN_WEIGHTS_EXTENSION}"):
+            return cls.from_binary(path)
         with open(str(path), "r") as f:
             data = json.load(f)
         return cls.from_dict(data)
+
+    @classmethod
+    def from_binary(cls, path):
+        # type: (Union[str, Path]) -> SkinWeights
+        data = read_skin_weights(path)
+        return cls.from_csr(
+            data.name,
+            data.influences,
+            data.indptr,
+            data.indices,
+            data.weights,
+            max_influences=data.max_influences or None,
+        )
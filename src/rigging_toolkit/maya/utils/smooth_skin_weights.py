@@ -0,0 +1,49 @@
+from typing import Optional
+
+import numpy as np
+
+from rigging_toolkit.core.sparse import CSRMatrix
+
+
+def normalize_weight_matrix(weights):
+    # type: (np.ndarray) -> np.ndarray
+    """Scale each row of a (num_vertices, num_influences) matrix to sum to one, empty rows are left at zero."""
+    totals = weights.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+    return weights / totals
+
+
+def smooth_weight_matrix(
+    operator,  # type: CSRMatrix
+    weights,  # type: np.ndarray
+    vertex_ids=None,  # type: Optional[np.ndarray]
+    iterations=1,  # type: Optional[int]
+    smooth_factor=0.5,  # type: Optional[float]
+):
+    # type: (...) -> np.ndarray
+    """
+    Smooth a (num_vertices, num_influences) weight matrix with a row normalized neighbourhood operator.
+
+    Each iteration blends the neighbourhood average with the current weights,
+    new = (1 - smooth_factor) * average + smooth_factor * current, and renormalizes.
+    Only the rows in vertex_ids are changed, all rows are smoothed when it is None.
+    """
+    weights = np.array(weights, dtype=np.float64)
+
+    if vertex_ids is None:
+        vertex_ids = np.arange(weights.shape[0])
+    vertex_ids = np.unique(np.asarray(vertex_ids, dtype=np.int64))
+    if not len(vertex_ids):
+        return weights
+
+    rows = operator.take_rows(vertex_ids)
+    # vertices without any neighbour keep their weights
+    has_neighbours = rows.row_lengths > 0
+
+    for _ in range(iterations):
+        average = rows.dot(weights)
+        smoothed = (1.0 - smooth_factor) * average + smooth_factor * weights[vertex_ids]
+        smoothed = normalize_weight_matrix(smoothed)
+        weights[vertex_ids[has_neighbours]] = smoothed[has_neighbours]
+
+    return weights
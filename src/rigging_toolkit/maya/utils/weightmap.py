@@ -59,15 +59,7 @@ class WeightMap(object):
 
     def __mul__(self, other):
         # type: (Delta) -> Delta
-        # compare the indices of the delta objects
-        # TODO add a check for compatibility
-        svalues, ovalues = np.array(self.values, dtype=np.float32)[
-            other.indices
-        ], np.array(other.deltas, dtype=np.float32)
-        new_values = svalues[:, np.newaxis] * ovalues
-        return Delta(
-            f"{other.name}_{self.name}", deltas=new_values, indices=other.indices
-        )
+        return other.weighted(self)
 
     def __eq__(self, other):
         # type: (object) -> bool
@@ -4,8 +4,9 @@ from rigging_toolkit.ui.widgets import TabWidget
 from rigging_toolkit.ui.dialogs import SetupSkeletonDialog
 from rigging_toolkit.maya.utils import ls_meshes, ls_joints
 from rigging_toolkit.maya.utils.rigging_utils import center_eye_joint
-from rigging_toolkit.maya.utils.deformers.skincluster import import_skin_weights, export_skin_weights, transfer_skin_cluster
+from rigging_toolkit.maya.utils.deformers.skincluster import import_skin_weights, export_skin_weights, transfer_skin_cluster, audit_max_influences, prune_influences
 from PySide2 import QtWidgets
+from maya import cmds
 import logging
 
 logger = logging.getLogger(__name__)
@@ -54,6 +55,22 @@ class RiggingTab(TabWidget):
         self._export_skin_weights_pushbotton.clicked.connect(self._on_export_skin_weights_clicked)
         self._transfer_skin_weights_pushbutton.clicked.connect(self._on_transfer_skin_weights_clicked)
 
+        # max influences layout/widgets
+        self._max_influences_layout = QtWidgets.QHBoxLayout()
+        self._max_influences_label = QtWidgets.QLabel("Max Influences: ")
+        self._max_influences_spinbox = QtWidgets.QSpinBox()
+        self._max_influences_spinbox.setRange(1, 32)
+        self._max_influences_spinbox.setValue(8)
+        self._check_influences_pushbutton = QtWidgets.QPushButton("Check Max Influences")
+        self._prune_influences_pushbutton = QtWidgets.QPushButton("Prune Influences")
+        self._max_influences_layout.addWidget(self._max_influences_label)
+        self._max_influences_layout.addWidget(self._max_influences_spinbox)
+        self._max_influences_layout.addWidget(self._check_influences_pushbutton)
+        self._max_influences_layout.addWidget(self._prune_influences_pushbutton)
+        self._skin_weights_layout.addLayout(self._max_influences_layout)
+        self._check_influences_pushbutton.clicked.connect(self._on_check_influences_clicked)
+        self._prune_influences_pushbutton.clicked.connect(self._on_prune_influences_clicked)
+
         # utils groupbox
         self._utils_layout = QtWidgets.QVBoxLayout()
 
@@ -109,6 +126,33 @@ class RiggingTab(TabWidget):
         target_mesh = selection[1]
         transfer_skin_cluster(source_mesh, target_mesh)
 
+    def _on_check_influences_clicked(self):
+        # type: () -> None
+        max_influences = self._max_influences_spinbox.value()
+        reports = audit_max_influences(max_influences)
+        if not reports:
+            logger.info(f"No vertices weighted to more than {max_influences} influences")
+            cmds.select(clear=True)
+            return
+
+        for report in reports:
+            logger.warning(
+                f"{report.mesh} has {len(report.vertex_ids)} vertices with up to "
+                f"{report.max_count} influences, only {max_influences} allowed"
+            )
+        # select the offending vertices so they can be inspected or painted
+        cmds.select([c for report in reports for c in report.components()], replace=True)
+
+    def _on_prune_influences_clicked(self):
+        # type: () -> None
+        max_influences = self._max_influences_spinbox.value()
+        meshes = ls_meshes()
+        if not meshes:
+            logger.error("Select the meshes to prune")
+            return
+        for report in prune_influences(meshes, max_influences):
+            logger.info(f"Pruned {len(report.vertex_ids)} vertices of {report.mesh} to {max_influences} influences")
+
     def _search_and_replace(self, name):
         # type: (str) -> str
         return name.replace(self._search_string(), self._replace_string())
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import fake_maya
+
+fake_maya.install().plugin_paths.append(os.path.join(ROOT, "maya", "plug-ins"))
+
+
+@pytest.fixture
+def scene():
+    fake_maya.SCENE.clear()
+    yield fake_maya.SCENE
+    fake_maya.SCENE.clear()
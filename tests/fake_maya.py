@@ -0,0 +1,712 @@
+"""
+In memory stand in for the parts of maya.cmds and the Maya Python API used by the bulk
+skinCluster and blendShape adapters, so they can be tested and timed without Maya.
+
+install() registers the fake maya modules in sys.modules, it must run before rigging_toolkit.maya
+is imported. Anything the fake doesn't implement raises NotImplementedError when it is used.
+"""
+from typing import Any, Dict, List, Optional
+import importlib.util
+import itertools
+import os
+import re
+import sys
+import types
+
+import numpy as np
+
+
+class _Unsupported(object):
+    """Placeholder for a Maya attribute the fake doesn't implement, fails only when called"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, name):
+        return _Unsupported(f"{self._name}.{name}")
+
+    def __call__(self, *args, **kwargs):
+        raise NotImplementedError(f"{self._name} is not implemented by the fake maya")
+
+
+class _FakeModule(types.ModuleType):
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Unsupported(f"{self.__name__}.{name}")
+
+
+class FakeNode(object):
+
+    _uuids = itertools.count(1)
+
+    def __init__(self, name, node_type):
+        # type: (str, str) -> None
+        self.name = name
+        self.node_type = node_type
+        self.uuid = next(self._uuids)
+
+
+class FakeMesh(FakeNode):
+
+    def __init__(self, name, vertex_count):
+        # type: (str, int) -> None
+        super(FakeMesh, self).__init__(name, "mesh")
+        self.vertex_count = vertex_count
+
+
+class FakeSkinCluster(FakeNode):
+
+    def __init__(self, name, mesh, influences, weights):
+        # type: (str, FakeMesh, List[str], np.ndarray) -> None
+        super(FakeSkinCluster, self).__init__(name, "skinCluster")
+        self.mesh = mesh
+        self.influences = list(influences)
+        self.weights = np.array(weights, dtype=np.float64).reshape(mesh.vertex_count, len(self.influences))
+
+
+class FakeBlendShape(FakeNode):
+    """
+    Weights, aliases and the full weight item of every target:
+    items[target index] = {"inputPointsTarget": [[x, y, z], ...], "inputComponentsTarget": [component, ...]}
+    and the painted weights, per target index or None for the base weights, as (values, existing) arrays.
+    """
+
+    def __init__(self, name, mesh):
+        # type: (str, FakeMesh) -> None
+        super(FakeBlendShape, self).__init__(name, "blendShape")
+        self.mesh = mesh
+        self.weights = {}  # type: Dict[int, float]
+        self.aliases = {}  # type: Dict[str, int]
+        self.items = {}  # type: Dict[int, Dict[str, list]]
+        self.painted = {}  # type: Dict[Optional[int], tuple]
+
+    def painted_weights(self, target_index):
+        # type: (Optional[int]) -> tuple
+        if target_index not in self.painted:
+            count = self.mesh.vertex_count
+            self.painted[target_index] = (np.ones(count), np.zeros(count, dtype=bool))
+        return self.painted[target_index]
+
+
+class FakeScene(object):
+    """The nodes of the fake maya, shared by the fake cmds and API modules"""
+
+    def __init__(self):
+        self.nodes = {}  # type: Dict[str, FakeNode]
+        self.callbacks = {}  # type: Dict[int, tuple]
+        self._callback_ids = itertools.count(1)
+        # names of the undo chunks opened, and how many are still open
+        self.undo_chunks = []  # type: List[str]
+        self.open_undo_chunks = 0
+        # undoable plugin commands run, last one last
+        self.undo_queue = []  # type: List[Any]
+        # folders loadPlugin looks in, the plugins stay loaded through clear like through a new scene
+        self.plugin_paths = []  # type: List[str]
+        self.plugins = {}  # type: Dict[str, Any]
+
+    def clear(self):
+        # type: () -> None
+        self.nodes.clear()
+        self.callbacks.clear()
+        self.undo_chunks = []
+        self.open_undo_chunks = 0
+        self.undo_queue = []
+
+    def undo(self):
+        # type: () -> None
+        self.undo_queue.pop().undoIt()
+
+    def node(self, name):
+        # type: (str) -> FakeNode
+        name = name.split(".")[0]
+        if name not in self.nodes:
+            raise RuntimeError(f"No object matches name: {name}")
+        return self.nodes[name]
+
+    def add_mesh(self, name, vertex_count):
+        # type: (str, int) -> FakeMesh
+        mesh = self.nodes[name] = FakeMesh(name, vertex_count)
+        return mesh
+
+    def add_skin_cluster(self, name, mesh, influences, weights):
+        # type: (str, str, List[str], np.ndarray) -> FakeSkinCluster
+        for influence in influences:
+            self.nodes.setdefault(influence, FakeNode(influence, "joint"))
+        skin_cluster = self.nodes[name] = FakeSkinCluster(name, self.node(mesh), influences, weights)
+        return skin_cluster
+
+    def add_blendshape(self, name, mesh):
+        # type: (str, str) -> FakeBlendShape
+        blendshape = self.nodes[name] = FakeBlendShape(name, self.node(mesh))
+        return blendshape
+
+    def add_callback(self, *args):
+        # type: (Any) -> int
+        callback_id = next(self._callback_ids)
+        self.callbacks[callback_id] = args
+        return callback_id
+
+    def attribute_changed(self, node, message, plug):
+        # type: (FakeNode, int, str) -> None
+        """Run the attribute changed callbacks of the node for the plug, e.g. weight[3]"""
+        for kind, mobject, callback, client_data in list(self.callbacks.values()):
+            if kind == "attribute_changed" and mobject.node is node:
+                callback(message, _NamedPlug(node, plug), _NamedPlug(node, ""), client_data)
+
+
+SCENE = FakeScene()
+
+
+# maya.api.OpenMaya
+
+class MObject(object):
+
+    def __init__(self, node=None):
+        # type: (Optional[FakeNode]) -> None
+        self.node = node
+
+    def isNull(self):
+        return self.node is None
+
+    def __eq__(self, other):
+        return isinstance(other, MObject) and other.node is self.node
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class MObjectHandle(object):
+
+    def __init__(self, mobject):
+        self._object = mobject
+
+    def hashCode(self):
+        return self._object.node.uuid
+
+    def isValid(self):
+        node = self._object.node
+        return node is not None and SCENE.nodes.get(node.name) is node
+
+    def object(self):
+        return self._object
+
+
+class MDagPath(object):
+
+    def __init__(self, node):
+        # type: (FakeNode) -> None
+        self.node = node
+
+    def partialPathName(self):
+        return self.node.name
+
+    def fullPathName(self):
+        return f"|{self.node.name}"
+
+
+class MSelectionList(object):
+
+    def __init__(self):
+        self._nodes = []  # type: List[FakeNode]
+
+    def add(self, name):
+        self._nodes.append(SCENE.node(name))
+        return self
+
+    def getDependNode(self, index):
+        return MObject(self._nodes[index])
+
+    def getDagPath(self, index):
+        return MDagPath(self._nodes[index])
+
+
+class MPoint(object):
+
+    def __init__(self, x=0.0, y=0.0, z=0.0, w=1.0):
+        self.x, self.y, self.z, self.w = float(x), float(y), float(z), float(w)
+
+
+class _Data(MObject):
+    """Value of a typed attribute, as returned by MPlug.asMObject"""
+
+    def __init__(self, value):
+        super(_Data, self).__init__()
+        self.value = value
+
+    def isNull(self):
+        return self.value is None
+
+
+# plugs of the blendShape node, as a path of (attribute, logical index) below the node
+_PLUG_PATTERN = re.compile(r"(\w+)(?:\[(\d+)\])?")
+# a range of elements of a multi, e.g. blendShape1.inputTarget[0].baseWeights[0:99]
+_RANGE_PATTERN = re.compile(r"^(.*)\[(\d+):(\d+)\]$")
+
+
+def _painted_key(path):
+    # type: (list) -> Optional[int]
+    """Target index of a targetWeights plug path, None for the baseWeights"""
+    return path[1][1] if path[1][0] == "inputTargetGroup" else None
+
+
+class MPlug(object):
+
+    def __init__(self, node, path):
+        # type: (FakeNode, List[list]) -> None
+        self.node = node
+        self.path = path
+
+    def elementByLogicalIndex(self, index):
+        return MPlug(self.node, self.path[:-1] + [[self.path[-1][0], index]])
+
+    def child(self, attribute):
+        return MPlug(self.node, self.path + [[attribute, None]])
+
+    def _names(self):
+        return [name for name, _ in self.path]
+
+    def getExistingArrayAttributeIndices(self):
+        names = self._names()
+        if names == ["inputTarget", "inputTargetGroup"]:
+            # painting the weights of a target creates its group like setting its data does
+            return sorted(set(self.node.items).union(i for i in self.node.painted if i is not None))
+        if names == ["inputTarget", "inputTargetGroup", "inputTargetItem"]:
+            return [6000] if self.path[1][1] in self.node.items else []
+        if names in (["inputTarget", "inputTargetGroup", "targetWeights"], ["inputTarget", "baseWeights"]):
+            return np.flatnonzero(self.node.painted_weights(_painted_key(self.path))[1]).tolist()
+        raise NotImplementedError(f"{'.'.join(names)} indices are not implemented by the fake maya")
+
+    def _item(self):
+        # type: () -> tuple
+        names = self._names()
+        if names[:3] != ["inputTarget", "inputTargetGroup", "inputTargetItem"] or len(names) != 4:
+            raise NotImplementedError(f"{'.'.join(names)} values are not implemented by the fake maya")
+        return self.path[1][1], names[3]
+
+    def asMObject(self):
+        target_index, attribute = self._item()
+        return _Data(self.node.items.get(target_index, {}).get(attribute))
+
+    def _set(self, value):
+        target_index, attribute = self._item()
+        if value is None:
+            self.node.items.get(target_index, {}).pop(attribute, None)
+        else:
+            self.node.items.setdefault(target_index, {})[attribute] = value
+
+
+class _NamedPlug(MPlug):
+    """Plug given to callbacks, only knows its name"""
+
+    def __init__(self, node, name):
+        super(_NamedPlug, self).__init__(node, [])
+        self._name = name
+
+    def partialName(self, useLongNames=False):
+        return self._name
+
+
+class MFnDependencyNode(object):
+
+    def __init__(self, mobject):
+        # type: (MObject) -> None
+        self._node = mobject.node
+
+    def name(self):
+        return self._node.name
+
+    def findPlug(self, attribute, want_networked_plug):
+        return MPlug(self._node, [[attribute, None]])
+
+    def attribute(self, name):
+        return name
+
+
+class MPointArray(list):
+
+    def __init__(self, points=()):
+        super(MPointArray, self).__init__(MPoint(*point) for point in points)
+
+
+class MFnPointArrayData(object):
+
+    def __init__(self, data=None):
+        self._data = data
+
+    def create(self, points):
+        self._data = _Data([[p.x, p.y, p.z] for p in points])
+        return self._data
+
+    def array(self):
+        return MPointArray(self._data.value)
+
+
+class MFnComponentListData(object):
+
+    def __init__(self, data=None):
+        self._data = data
+
+    def create(self):
+        self._data = _Data([])
+        return self._data
+
+    def add(self, component):
+        self._data.value.append(component)
+
+    def length(self):
+        return len(self._data.value)
+
+    def get(self, index):
+        return self._data.value[index]
+
+
+class MDGModifier(object):
+    """Plug values set by doIt, the previous values put back by undoIt"""
+
+    def __init__(self):
+        self._values = []  # type: List[tuple]
+        self._previous = []  # type: List[tuple]
+
+    def newPlugValue(self, plug, data):
+        self._values.append((plug, data.value))
+
+    def doIt(self):
+        self._previous = [(plug, plug.asMObject().value) for plug, _ in self._values]
+        for plug, value in self._values:
+            plug._set(value)
+
+    def undoIt(self):
+        for plug, value in reversed(self._previous):
+            plug._set(value)
+
+
+class MPxCommand(object):
+
+    def isUndoable(self):
+        return False
+
+
+class MFnPlugin(object):
+    """Registers the commands of a plugin as functions of the fake maya.cmds"""
+
+    def __init__(self, plugin, vendor="", version=""):
+        self._plugin = plugin
+
+    def registerCommand(self, name, creator):
+        def command(*args):
+            instance = creator()
+            instance.doIt(list(args))
+            if instance.isUndoable():
+                SCENE.undo_queue.append(instance)
+        setattr(sys.modules["maya.cmds"], name, command)
+
+    def deregisterCommand(self, name):
+        delattr(sys.modules["maya.cmds"], name)
+
+
+class MFn(object):
+
+    kMeshVertComponent = 550
+
+
+class MSpace(object):
+
+    kObject = 2
+    kWorld = 4
+
+
+class MIntArray(list):
+    pass
+
+
+class MDoubleArray(list):
+    pass
+
+
+class _Component(object):
+
+    def __init__(self):
+        self.elements = []  # type: List[int]
+
+
+class MFnSingleIndexedComponent(object):
+
+    def __init__(self, component=None):
+        self._component = component
+
+    def create(self, component_type):
+        self._component = _Component()
+        return self._component
+
+    def setCompleteData(self, count):
+        self._component.elements = list(range(count))
+
+    def addElements(self, elements):
+        self._component.elements.extend(int(x) for x in elements)
+
+    def getElements(self):
+        return MIntArray(self._component.elements)
+
+
+class MFnMesh(object):
+
+    def __init__(self, path):
+        # type: (MDagPath) -> None
+        self._mesh = path.node
+
+    @property
+    def numVertices(self):
+        return self._mesh.vertex_count
+
+
+class MNodeMessage(object):
+
+    kConnectionMade = 0x01
+    kConnectionBroken = 0x02
+    kAttributeSet = 0x08
+    kAttributeArrayAdded = 0x1000
+    kAttributeArrayRemoved = 0x2000
+
+    @staticmethod
+    def addNodeDirtyPlugCallback(node, callback, client_data=None):
+        return SCENE.add_callback("dirty_plug", node, callback, client_data)
+
+    @staticmethod
+    def addAttributeChangedCallback(node, callback, client_data=None):
+        return SCENE.add_callback("attribute_changed", node, callback, client_data)
+
+    @staticmethod
+    def addNodePreRemovalCallback(node, callback, client_data=None):
+        return SCENE.add_callback("pre_removal", node, callback, client_data)
+
+
+class MMessage(object):
+
+    @staticmethod
+    def removeCallbacks(callback_ids):
+        for callback_id in callback_ids:
+            SCENE.callbacks.pop(callback_id, None)
+
+
+# maya.api.OpenMayaAnim
+
+class MFnSkinCluster(object):
+
+    def __init__(self, mobject):
+        # type: (MObject) -> None
+        self._node = mobject.node
+
+    def influenceObjects(self):
+        return [MDagPath(SCENE.node(influence)) for influence in self._node.influences]
+
+    def getPathAtIndex(self, index):
+        return MDagPath(self._node.mesh)
+
+    def getWeights(self, path, components):
+        rows = components.elements
+        return MDoubleArray(self._node.weights[rows].ravel().tolist()), len(self._node.influences)
+
+    def setWeights(self, path, components, influence_indices, values, normalize=True):
+        rows = np.asarray(components.elements, dtype=np.int64)
+        columns = np.asarray(influence_indices, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(rows), len(columns))
+        weights = self._node.weights
+        weights[np.ix_(rows, columns)] = values
+        if normalize:
+            totals = weights[rows].sum(axis=1, keepdims=True)
+            weights[rows] = np.divide(weights[rows], totals, out=np.zeros_like(weights[rows]), where=totals > 0)
+
+
+# maya.cmds
+
+def objExists(name):
+    return name.split(".")[0] in SCENE.nodes
+
+
+def skinCluster(*args, **kwargs):
+    query = kwargs.get("query", kwargs.get("q", False))
+    if query and kwargs.get("influence", kwargs.get("inf", False)):
+        return list(SCENE.node(args[0]).influences)
+    raise NotImplementedError("skinCluster is only implemented for influence queries by the fake maya")
+
+
+def _blendshape(name):
+    # type: (str) -> FakeBlendShape
+    node = SCENE.node(name)
+    if not isinstance(node, FakeBlendShape):
+        raise RuntimeError(f"{name} is not a blendShape")
+    return node
+
+
+def _parse_plug(attribute):
+    # type: (str) -> tuple
+    """Node and [(attribute, index), ...] of e.g. blendShape1.inputTarget[0].inputTargetGroup[2].inputTargetItem[6000]"""
+    node, _, path = attribute.partition(".")
+    return node, [(name, int(index) if index else None) for name, index in _PLUG_PATTERN.findall(path)]
+
+
+def aliasAttr(*args, **kwargs):
+    if kwargs.get("query", kwargs.get("q", False)):
+        node = _blendshape(args[0])
+        return [item for alias, index in node.aliases.items() for item in (alias, f"weight[{index}]")] or None
+    if kwargs.get("remove", kwargs.get("rm", False)):
+        node, path = _parse_plug(args[0])
+        blendshape = _blendshape(node)
+        blendshape.aliases.pop(path[0][0], None)
+    else:
+        alias, attribute = args
+        node, path = _parse_plug(attribute)
+        blendshape = _blendshape(node)
+        # an alias replaces the previous alias of the plug
+        blendshape.aliases = {a: i for a, i in blendshape.aliases.items() if i != path[0][1]}
+        blendshape.aliases[alias] = path[0][1]
+    SCENE.attribute_changed(blendshape, MNodeMessage.kAttributeSet, "attributeAliasList")
+    return None
+
+
+def _painted_range(attribute):
+    # type: (str) -> Optional[tuple]
+    """Values and existing arrays of a targetWeights or baseWeights range, and the slice of the range"""
+    match = _RANGE_PATTERN.match(attribute)
+    if match is None:
+        return None
+    node, path = _parse_plug(match.group(1))
+    if [name for name, _ in path] not in (["inputTarget", "inputTargetGroup", "targetWeights"], ["inputTarget", "baseWeights"]):
+        return None
+    values, existing = _blendshape(node).painted_weights(_painted_key(path))
+    return values, existing, slice(int(match.group(2)), int(match.group(3)) + 1)
+
+
+def getAttr(attribute, **kwargs):
+    painted = _painted_range(attribute)
+    if painted is None:
+        raise NotImplementedError(f"getAttr {attribute} is not implemented by the fake maya")
+    values, _, elements = painted
+    return values[elements].tolist()
+
+
+def setAttr(attribute, *values, **kwargs):
+    painted = _painted_range(attribute)
+    if painted is not None:
+        weights, existing, elements = painted
+        if kwargs.get("size", len(values)) != len(values) or len(values) != len(weights[elements]):
+            raise RuntimeError(f"Wrong number of values for {attribute}")
+        weights[elements] = values
+        existing[elements] = True
+        return
+    node, path = _parse_plug(attribute)
+    names = [name for name, _ in path]
+    if names == ["weight"] and path[0][1] is not None:
+        blendshape = _blendshape(node)
+        added = path[0][1] not in blendshape.weights
+        blendshape.weights[path[0][1]] = float(values[0])
+        if added:
+            SCENE.attribute_changed(blendshape, MNodeMessage.kAttributeArrayAdded, f"weight[{path[0][1]}]")
+        SCENE.attribute_changed(blendshape, MNodeMessage.kAttributeSet, f"weight[{path[0][1]}]")
+        return
+    raise NotImplementedError(f"setAttr {attribute} is not implemented by the fake maya")
+
+
+def removeMultiInstance(attribute, **kwargs):
+    node, path = _parse_plug(attribute)
+    blendshape = _blendshape(node)
+    names = [name for name, _ in path]
+    if names == ["weight"]:
+        blendshape.weights.pop(path[0][1], None)
+        SCENE.attribute_changed(blendshape, MNodeMessage.kAttributeArrayRemoved, f"weight[{path[0][1]}]")
+    elif names == ["inputTarget", "inputTargetGroup"]:
+        blendshape.items.pop(path[1][1], None)
+        blendshape.painted.pop(path[1][1], None)
+    else:
+        raise NotImplementedError(f"removeMultiInstance {attribute} is not implemented by the fake maya")
+
+
+def blendShape(*args, **kwargs):
+    if kwargs.get("query", kwargs.get("q", False)) and kwargs.get("geometry", kwargs.get("g", False)):
+        return [_blendshape(args[0]).mesh.name]
+    raise NotImplementedError("blendShape is only implemented for geometry queries by the fake maya")
+
+
+def polyEvaluate(*args, **kwargs):
+    mesh = args[0][0] if isinstance(args[0], (list, tuple)) else args[0]
+    if kwargs.get("vertex", kwargs.get("v", False)):
+        return SCENE.node(mesh).vertex_count
+    raise NotImplementedError("polyEvaluate is only implemented for vertex counts by the fake maya")
+
+
+def undoInfo(*args, **kwargs):
+    if kwargs.get("openChunk", False):
+        SCENE.undo_chunks.append(kwargs.get("chunkName", ""))
+        SCENE.open_undo_chunks += 1
+    elif kwargs.get("closeChunk", False):
+        SCENE.open_undo_chunks -= 1
+    else:
+        raise NotImplementedError("undoInfo is only implemented for chunks by the fake maya")
+
+
+def pluginInfo(name, **kwargs):
+    if kwargs.get("query", kwargs.get("q", False)) and kwargs.get("loaded", False):
+        return name in SCENE.plugins
+    raise NotImplementedError("pluginInfo is only implemented for loaded queries by the fake maya")
+
+
+def loadPlugin(name, **kwargs):
+    """Import a python plugin from SCENE.plugin_paths and run its initializePlugin"""
+    for folder in SCENE.plugin_paths:
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            break
+    else:
+        raise RuntimeError(f"Plug-in, \"{name}\", was not found on MAYA_PLUG_IN_PATH")
+    spec = importlib.util.spec_from_file_location(os.path.splitext(name)[0], path)
+    plugin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin)
+    plugin.initializePlugin(MObject())
+    SCENE.plugins[name] = plugin
+    return [os.path.splitext(name)[0]]
+
+
+def _build_modules():
+    # type: () -> Dict[str, types.ModuleType]
+    maya = _FakeModule("maya")
+    maya.__path__ = []
+    api = _FakeModule("maya.api")
+    api.__path__ = []
+    cmds = _FakeModule("maya.cmds")
+    om2 = _FakeModule("maya.api.OpenMaya")
+    oma2 = _FakeModule("maya.api.OpenMayaAnim")
+    om1 = _FakeModule("maya.OpenMaya")
+
+    for name in [
+        "MObject", "MObjectHandle", "MDagPath", "MSelectionList", "MFn", "MSpace", "MIntArray", "MDoubleArray",
+        "MFnSingleIndexedComponent", "MFnMesh", "MNodeMessage", "MMessage", "MPoint", "MPlug",
+        "MFnDependencyNode", "MFnPointArrayData", "MFnComponentListData", "MPointArray", "MDGModifier",
+        "MPxCommand", "MFnPlugin",
+    ]:
+        setattr(om2, name, globals()[name])
+    oma2.MFnSkinCluster = MFnSkinCluster
+    for name in [
+        "objExists", "skinCluster", "aliasAttr", "getAttr", "setAttr", "removeMultiInstance", "blendShape", "polyEvaluate",
+        "undoInfo", "pluginInfo", "loadPlugin",
+    ]:
+        setattr(cmds, name, globals()[name])
+
+    maya.cmds, maya.api, maya.OpenMaya = cmds, api, om1
+    api.OpenMaya, api.OpenMayaAnim = om2, oma2
+    return {
+        "maya": maya,
+        "maya.api": api,
+        "maya.cmds": cmds,
+        "maya.api.OpenMaya": om2,
+        "maya.api.OpenMayaAnim": oma2,
+        "maya.OpenMaya": om1,
+    }
+
+
+def install():
+    # type: () -> FakeScene
+    """Register the fake maya modules, returns the scene they share"""
+    sys.modules.update(_build_modules())
+    return SCENE
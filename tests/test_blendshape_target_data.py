@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+from maya import cmds
+
+from rigging_toolkit.core.delta_stack import DeltaStack
+from rigging_toolkit.maya.utils.deformers import blendshape
+from rigging_toolkit.maya.utils.deformers.blendshape import (
+    add_empty_blendshape_targets,
+    get_blendshape_index,
+    get_delta,
+    read_target_data,
+    remove_blendshape_target,
+    set_delta,
+    write_target_data,
+)
+
+
+@pytest.fixture
+def blendshape_node(scene):
+    scene.add_mesh("geo_head_L1", 40)
+    scene.add_blendshape("blendShape1", "geo_head_L1")
+    add_empty_blendshape_targets("blendShape1", ["shp_12_L1", "shp_13_L1", "shp_14_L1"])
+    scene.undo_chunks = []
+    return "blendShape1"
+
+
+def _random_stack(names, vertex_count, seed=0):
+    rng = np.random.default_rng(seed)
+    offsets = rng.normal(size=(len(names), vertex_count, 3)).astype(np.float32)
+    offsets[rng.random((len(names), vertex_count)) < 0.6] = 0.0
+    return DeltaStack.from_dense(names, offsets)
+
+
+def _assert_same_stack(result, expected):
+    assert result.names == expected.names
+    np.testing.assert_array_equal(result.indptr, expected.indptr)
+    np.testing.assert_array_equal(result.indices, expected.indices)
+    np.testing.assert_allclose(result.offsets, expected.offsets)
+
+
+def test_written_targets_read_back_the_same(scene, blendshape_node):
+    stack = _random_stack(["shp_12_L1", "shp_13_L1", "shp_14_L1"], 40)
+
+    assert write_target_data(blendshape_node, stack) == stack.names
+    _assert_same_stack(read_target_data(blendshape_node), stack)
+
+
+def test_write_is_a_single_undo_chunk(scene, blendshape_node):
+    write_target_data(blendshape_node, _random_stack(["shp_12_L1", "shp_13_L1"], 40))
+
+    assert scene.undo_chunks == ["write_target_data"]
+    assert scene.open_undo_chunks == 0
+    assert len(scene.undo_queue) == 1
+
+
+def test_undo_restores_the_previous_target_data(scene, blendshape_node):
+    names = ["shp_12_L1", "shp_13_L1", "shp_14_L1"]
+    first = _random_stack(names, 40, seed=1)
+    write_target_data(blendshape_node, first)
+    write_target_data(blendshape_node, _random_stack(names[:2], 40, seed=2))
+
+    scene.undo()
+    _assert_same_stack(read_target_data(blendshape_node), first)
+    scene.undo()
+    assert read_target_data(blendshape_node).nnz == 0
+
+
+def test_missing_targets_are_skipped_or_created(scene, blendshape_node):
+    stack = _random_stack(["shp_12_L1", "shp_99_L1"], 40)
+
+    assert write_target_data(blendshape_node, stack) == ["shp_12_L1"]
+    assert write_target_data(blendshape_node, stack, create_missing=True) == stack.names
+    _assert_same_stack(read_target_data(blendshape_node, stack.names), stack)
+
+
+def test_set_delta_writes_to_another_target(scene, blendshape_node):
+    delta = _random_stack(["shp_12_L1"], 40).to_deltas(blendshape.Delta)[0]
+
+    set_delta(blendshape_node, delta, "shp_13_L1")
+    assert get_delta(blendshape_node, "shp_13_L1").deltas.tolist() == delta.deltas.tolist()
+    assert len(get_delta(blendshape_node, "shp_12_L1")) == 0
+
+
+def test_many_targets_round_trip(scene):
+    scene.add_mesh("geo_body_L1", 2000)
+    scene.add_blendshape("blendShape1", "geo_body_L1")
+    names = [f"shp_{i}_L1" for i in range(100)]
+    add_empty_blendshape_targets("blendShape1", names)
+    stack = _random_stack(names, 2000, seed=1)
+
+    write_target_data("blendShape1", stack)
+    _assert_same_stack(read_target_data("blendShape1"), stack)
+
+
+def test_index_is_not_reused_by_a_node_of_the_same_name(scene, blendshape_node):
+    assert get_blendshape_index(blendshape_node).names() == ["shp_12_L1", "shp_13_L1", "shp_14_L1"]
+
+    # a new scene with a blendshape of the same name and as many targets
+    scene.clear()
+    scene.add_mesh("geo_head_L1", 40)
+    scene.add_blendshape("blendShape1", "geo_head_L1")
+    add_empty_blendshape_targets("blendShape1", ["shp_20_L1", "shp_21_L1", "shp_22_L1"])
+    assert get_blendshape_index("blendShape1").names() == ["shp_20_L1", "shp_21_L1", "shp_22_L1"]
+
+
+def test_index_is_trusted_without_querying_the_aliases_again(scene, blendshape_node):
+    index = get_blendshape_index(blendshape_node)
+    # a change no callback reports isn't seen, the index isn't checked against the node on every call
+    scene.node(blendshape_node).aliases = {}
+
+    assert get_blendshape_index(blendshape_node) is index
+    assert index.names() == ["shp_12_L1", "shp_13_L1", "shp_14_L1"]
+
+
+def test_index_picks_up_aliases_renamed_outside_of_the_module(scene, blendshape_node):
+    index = get_blendshape_index(blendshape_node)
+    cmds.aliasAttr("shp_30_L1", f"{blendshape_node}.weight[2]")
+
+    assert get_blendshape_index(blendshape_node) is index
+    assert index.index("shp_30_L1") == 2 and "shp_13_L1" not in index
+
+
+def test_index_picks_up_weights_removed_outside_of_the_module(scene, blendshape_node):
+    index = get_blendshape_index(blendshape_node)
+    del scene.node(blendshape_node).aliases["shp_14_L1"]
+    cmds.removeMultiInstance(f"{blendshape_node}.weight[3]", b=True)
+
+    assert get_blendshape_index(blendshape_node).names() == ["shp_12_L1", "shp_13_L1"]
+
+
+def test_module_edits_keep_the_index_in_sync(scene, blendshape_node):
+    index = get_blendshape_index(blendshape_node)
+    add_empty_blendshape_targets(blendshape_node, ["shp_15_L1"])
+    remove_blendshape_target(blendshape_node, "shp_12_L1")
+
+    assert index.indices() == blendshape._target_indices(blendshape_node)
+    # the edits didn't mark the index to be read again
+    scene.node(blendshape_node).aliases = {}
+    assert get_blendshape_index(blendshape_node) is index
+    assert index.names() == ["shp_13_L1", "shp_14_L1", "shp_15_L1"]
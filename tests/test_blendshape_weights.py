@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+import pytest
+from maya import cmds
+
+from rigging_toolkit.core.delta_stack import WeightMapStack
+from rigging_toolkit.maya.utils.deformers.blendshape import (
+    add_empty_blendshape_targets,
+    apply_weightmap_to_base,
+    read_weights,
+    write_weights,
+)
+from rigging_toolkit.maya.utils.weightmap import WeightMap
+
+
+def _add_blendshape(scene, vertex_count, targets):
+    scene.add_mesh("geo_head_L1", vertex_count)
+    scene.add_blendshape("blendShape1", "geo_head_L1")
+    add_empty_blendshape_targets("blendShape1", targets)
+    scene.undo_chunks = []
+    return "blendShape1"
+
+
+def _mask(vertex_count):
+    # a left side mask, a falloff across the middle and zero on the right side
+    return np.clip(np.linspace(2.0, -1.0, vertex_count), 0.0, 1.0).astype(np.float32)
+
+
+def test_write_weights_round_trip(scene):
+    targets = ["shp_12_L1", "shp_13_L1", "shp_14_L1"]
+    blendshape_name = _add_blendshape(scene, 50, targets)
+    values = np.random.default_rng(0).random((3, 50)).astype(np.float32)
+    values[:, :10] = 1.0
+
+    assert write_weights(blendshape_name, WeightMapStack(targets, values)) == targets
+    result, base_weights = read_weights(blendshape_name)
+
+    assert result.names == targets
+    np.testing.assert_allclose(result.values, values)
+    np.testing.assert_array_equal(base_weights, np.ones(50))
+    assert scene.undo_chunks == ["write_weights"]
+    assert scene.open_undo_chunks == 0
+
+
+def test_write_weights_back_to_default(scene):
+    blendshape_name = _add_blendshape(scene, 20, ["shp_12_L1"])
+    write_weights(blendshape_name, WeightMap("msk_L", _mask(20).tolist()), ["shp_12_L1"])
+    write_weights(blendshape_name, WeightMap("msk_full", [1.0] * 20), ["shp_12_L1"])
+
+    result, _ = read_weights(blendshape_name)
+    np.testing.assert_array_equal(result.values, np.ones((1, 20)))
+
+
+def test_apply_weightmap_to_base_is_one_undo_step(scene):
+    blendshape_name = _add_blendshape(scene, 30, ["shp_12_L1"])
+    apply_weightmap_to_base(blendshape_name, WeightMap("msk_L", _mask(30).tolist()))
+
+    _, base_weights = read_weights(blendshape_name)
+    np.testing.assert_allclose(base_weights, _mask(30))
+    assert scene.undo_chunks == ["apply_weightmap_to_base"]
+    assert scene.open_undo_chunks == 0
+
+
+def test_write_one_mask_to_300_targets(scene, monkeypatch):
+    targets = [f"shp_{i}_L1" for i in range(300)]
+    blendshape_name = _add_blendshape(scene, 10000, targets)
+    mask = _mask(10000)
+    calls = []
+    set_attr = cmds.setAttr
+
+    def counted_set_attr(attribute, *values, **kwargs):
+        calls.append(attribute)
+        return set_attr(attribute, *values, **kwargs)
+
+    monkeypatch.setattr(cmds, "setAttr", counted_set_attr)
+    start = time.perf_counter()
+    write_weights(blendshape_name, WeightMap("msk_L", mask.tolist()), targets)
+    elapsed = time.perf_counter() - start
+    monkeypatch.undo()
+
+    # a single setAttr per target, the right side of the mask and its falloff is one run
+    assert len(calls) == 300
+    assert elapsed < 1.0, f"Writing one mask to 300 targets took {elapsed:.2f}s"
+    result, _ = read_weights(blendshape_name, targets[::50])
+    np.testing.assert_allclose(result.values, np.tile(mask, (6, 1)))
+    assert scene.undo_chunks == ["write_weights"]
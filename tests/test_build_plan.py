@@ -0,0 +1,36 @@
+from rigging_toolkit.core.build_plan import FULL_SPLIT_MASK, build_shape_lattice, plan_splits
+from rigging_toolkit.core.config_store import FULL_SPLIT, FaceConfig, SplittingGroup
+
+
+def _face_config():
+    return FaceConfig([
+        SplittingGroup("vertical_split", ("Left", "Right"), ("shp_12_L1",)),
+        SplittingGroup(FULL_SPLIT, (), ("shp_30L_L1",)),
+    ])
+
+
+def test_plan_splits_by_masks():
+    lattice = build_shape_lattice(["shp_12", "shp_13", "shp_12_13"])
+    targets = ["shp_12_L1", "shp_13_L1", "delta_shp_12_13_L1"]
+
+    splits = plan_splits(_face_config(), lattice, targets, "shp_12")
+
+    assert splits == [
+        ("shp_12_L1", "xLeft", "shp_12_L1_xLeft"),
+        ("shp_12_L1", "xRight", "shp_12_L1_xRight"),
+        ("delta_shp_12_13_L1", "xLeft", "delta_shp_12_13_L1_xLeft"),
+        ("delta_shp_12_13_L1", "xRight", "delta_shp_12_13_L1_xRight"),
+    ]
+    assert plan_splits(_face_config(), lattice, targets, "shp_12", skip=["shp_12_L1_xLeft"])[0][2] == "shp_12_L1_xRight"
+
+
+def test_plan_full_split_needs_no_mask():
+    lattice = build_shape_lattice(["shp_30L", "shp_13", "shp_13_30L"])
+    targets = ["shp_30L_L1", "shp_13_L1", "delta_shp_13_30L_L1"]
+
+    splits = plan_splits(_face_config(), lattice, targets, "shp_30L")
+
+    assert splits == [
+        ("shp_30L_L1", FULL_SPLIT_MASK, "shp_30L_L1_xFullShape"),
+        ("delta_shp_13_30L_L1", FULL_SPLIT_MASK, "delta_shp_13_30L_L1_xFullShape"),
+    ]
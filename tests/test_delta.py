@@ -0,0 +1,26 @@
+import json
+
+import numpy as np
+
+from rigging_toolkit.maya.utils.delta import Delta
+
+
+def test_indices_are_sorted_with_duplicates_summed():
+    delta = Delta("shp_12_L1", [5, 1, 5], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 0.0, 0.0]])
+    np.testing.assert_array_equal(delta.indices, [1, 5])
+    np.testing.assert_allclose(delta.deltas, [[0.0, 1.0, 0.0], [2.0, 0.0, 0.0]])
+
+
+def test_data_is_json_serialisable_and_loads_back():
+    delta = Delta("shp_12_L1", np.array([3, 7, 8]), np.arange(9).reshape(3, 3))
+    data = json.loads(json.dumps(delta.data()))
+    assert data["indices"] == [3, 7, 8]
+    assert Delta.load(data) == delta
+
+
+def test_sum_merges_the_union_of_the_indices():
+    a = Delta("a", [0, 2], [[1.0, 1.0, 1.0], [1.0, 1.0, 1.0]])
+    b = Delta("b", [2, 4], [[1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    difference = a - b
+    np.testing.assert_array_equal(difference.indices, [0, 2, 4])
+    np.testing.assert_allclose(difference.deltas, [[1.0, 1.0, 1.0], [0.0, 1.0, 1.0], [0.0, 0.0, -1.0]])
@@ -0,0 +1,36 @@
+import numpy as np
+
+from rigging_toolkit.core.delta_stack import DeltaStack
+
+
+def _stack():
+    return DeltaStack.from_arrays(
+        ["shp_12_L1", "shp_13_L1", "shp_14_L1"],
+        [np.array([4, 1]), np.array([], dtype=np.int64), np.array([0, 2, 5])],
+        [np.array([[1, 0, 0], [0, 1, 0]]), np.zeros((0, 3)), np.array([[0, 0, 1], [1, 1, 0], [2, 0, 0]])],
+        vertex_count=6,
+    )
+
+
+def test_padded_arrays_round_trip():
+    stack = _stack()
+    indices, offsets = stack.to_padded()
+
+    assert indices.shape == (3, 3) and offsets.shape == (3, 3, 3)
+    np.testing.assert_array_equal(indices, [[1, 4, -1], [-1, -1, -1], [0, 2, 5]])
+    np.testing.assert_array_equal(offsets[0, 2], [0, 0, 0])
+
+    restored = DeltaStack.from_padded(stack.names, indices, offsets, stack.vertex_count)
+    np.testing.assert_array_equal(restored.indptr, stack.indptr)
+    np.testing.assert_array_equal(restored.indices, stack.indices)
+    np.testing.assert_array_equal(restored.to_dense(), stack.to_dense())
+
+
+def test_padding_ratio():
+    assert _stack().padding_ratio() == 1.0 - 5 / 9
+    assert DeltaStack.from_arrays([], [], [], vertex_count=0).padding_ratio() == 0.0
+
+
+def test_empty_stack_round_trips_through_padded_arrays():
+    indices, offsets = DeltaStack.from_arrays([], [], [], vertex_count=4).to_padded()
+    assert DeltaStack.from_padded([], indices, offsets, 4).nnz == 0
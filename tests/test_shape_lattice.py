@@ -0,0 +1,144 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from rigging_toolkit.core.delta_stack import DeltaStack
+from rigging_toolkit.core.shape_lattice import (
+    ShapeLattice,
+    shape_components,
+    solve_combination_correctives,
+    strip_shape_name,
+)
+
+
+@pytest.mark.parametrize("shape, components", [
+    ("shp_12_L1", ["12"]),
+    ("delta_shp_12_14_L1_xLeft", ["12", "14"]),
+    ("shp_jaw_open_12_L1", ["jaw_open", "12"]),
+    ("shp_12_14L18_L1", ["12", "14L18"]),
+    ("shp_14R18_12_L1", ["14R18", "12"]),
+    ("delta_shp_13_30L_L1_xFullShape", ["13", "30L"]),
+    ("shp_14L18_30L_L1", ["14L18", "30L"]),
+    ("shp_14R18_30R_L1", ["14R18", "30R"]),
+    ("shp_14_18_30L_L1", ["14", "18", "30L"]),
+])
+def test_shape_components(shape, components):
+    assert shape_components(shape) == components
+
+
+def test_strip_shape_name():
+    assert strip_shape_name("delta_shp_12_14_L1_xLeft") == "12_14"
+
+
+def test_lattice_masks():
+    lattice = ShapeLattice(["shp_12", "shp_14L18", "shp_30L", "shp_12_14L18_30L", "shp_30L_12"])
+
+    assert lattice.components == ["12", "14L18", "30L"]
+    assert lattice.base_shapes == ["shp_12", "shp_14L18", "shp_30L"]
+    assert lattice.combo_shapes == ["shp_12_14L18_30L", "shp_30L_12"]
+    assert lattice.mask("shp_12_14L18_30L") == 0b111
+    assert lattice.shape(0b101) == "shp_30L_12"
+    assert lattice.mask_of("delta_shp_12_30L_L1_xLeft") == 0b101
+    assert lattice.sub_shapes("shp_12_14L18_30L") == ["shp_12", "shp_14L18", "shp_30L", "shp_30L_12"]
+
+
+def test_lattice_ignores_shapes_with_the_same_components():
+    lattice = ShapeLattice(["shp_12", "shp_13", "shp_12_13", "shp_13_12"])
+
+    assert lattice.combo_shapes == ["shp_12_13"]
+    assert "shp_13_12" not in lattice
+
+
+def test_missing_components():
+    lattice = ShapeLattice(["shp_12", "shp_12_13", "shp_12_13_14"])
+
+    assert lattice.base_shape("13") is None
+    assert lattice.missing_components("shp_12_13_14") == ["13", "14"]
+    assert lattice.base_shapes_of("shp_12_13_14") == ["shp_12"]
+
+
+def test_sub_combinations_by_submasks():
+    # 10 pairs and 2 triples, the 8 submasks of a triple are fewer than the 12 combos
+    bases = [f"shp_{i}" for i in range(10, 15)]
+    pairs = [f"shp_{a}_{b}" for a, b in itertools.combinations(range(10, 15), 2)]
+    lattice = ShapeLattice(bases + pairs + ["shp_10_11_12", "shp_10_11_13"])
+
+    assert lattice.sub_combinations("shp_10_11_12") == ["shp_10_11", "shp_10_12", "shp_11_12"]
+    assert lattice.sub_combinations("shp_10_11_13") == ["shp_10_11", "shp_10_13", "shp_11_13"]
+    assert lattice.sub_combinations("shp_12_14") == []
+
+
+def test_sub_combinations_by_scan():
+    # the 32 submasks of the 5 components combo are more than the 4 combos, they are scanned
+    bases = [f"shp_{i}" for i in range(10, 16)]
+    lattice = ShapeLattice(bases + ["shp_12_13", "shp_10_11", "shp_10_15", "shp_10_11_12_13_14"])
+
+    assert lattice.sub_combinations("shp_10_11_12_13_14") == ["shp_10_11", "shp_12_13"]
+    assert lattice.sub_combinations("shp_10_11") == []
+
+
+def test_sub_combinations_match_the_components():
+    rng = np.random.default_rng(0)
+    components = [str(i) for i in range(10, 18)]
+    combos = {
+        tuple(sorted(rng.choice(components, size=size, replace=False)))
+        for size in rng.integers(2, 7, size=60)
+    }
+    lattice = ShapeLattice([f"shp_{c}" for c in components] + [f"shp_{'_'.join(c)}" for c in sorted(combos)])
+
+    for combo in lattice.combo_shapes:
+        expected = {
+            other for other in lattice.combo_shapes
+            if other != combo and set(shape_components(other)) < set(shape_components(combo))
+        }
+        subs = lattice.sub_combinations(combo)
+        assert set(subs) == expected
+        assert [len(shape_components(sub)) for sub in subs] == sorted(len(shape_components(sub)) for sub in subs)
+
+
+def test_evaluation_order():
+    shapes = ["shp_10_11_12", "shp_11", "shp_12_13", "shp_10_11", "shp_10", "shp_12", "shp_13"]
+    lattice = ShapeLattice(shapes)
+
+    order = lattice.evaluation_order()
+
+    assert order == ["shp_11", "shp_10", "shp_12", "shp_13", "shp_12_13", "shp_10_11", "shp_10_11_12"]
+    for i, shape in enumerate(order):
+        assert all(order.index(sub) < i for sub in lattice.sub_shapes(shape))
+
+
+def _brute_force_correctives(names, full):
+    """Every shape minus the correctives of all the shapes it strictly contains, smallest shapes first"""
+    components = {name: set(shape_components(name)) for name in names}
+    correctives = {}
+    for name in sorted(names, key=lambda name: len(components[name])):
+        contained = [other for other in correctives if components[other] < components[name]]
+        correctives[name] = full[names.index(name)] - sum((correctives[other] for other in contained), 0.0)
+    return correctives
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_sparse_correctives_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    # 15 has no base shape, its combos are corrected by their other components only
+    components = [str(i) for i in range(10, 16)]
+    combos = {
+        tuple(sorted(rng.choice(components, size=size, replace=False)))
+        for size in rng.integers(2, 5, size=25)
+    }
+    names = [f"shp_{c}" for c in components[:-1]] + [f"shp_{'_'.join(c)}" for c in sorted(combos)]
+    full = rng.normal(size=(len(names), 30, 3)).astype(np.float32)
+    expected = _brute_force_correctives(names, full.astype(np.float64))
+
+    lattice = ShapeLattice(names)
+    assert lattice.missing_components(next(n for n in names if "15" in n)) == ["15"]
+    for shape, row in lattice.corrective_coefficients().items():
+        combined = sum(value * full[names.index(other)].astype(np.float64) for other, value in row.items())
+        np.testing.assert_allclose(combined, expected[shape], atol=1e-9)
+
+    correctives = solve_combination_correctives(DeltaStack.from_dense(names, full), lattice, tolerance=0.0)
+    assert correctives.names == [shape for shape in lattice.evaluation_order() if lattice.is_combo(shape)]
+    np.testing.assert_allclose(
+        correctives.to_dense(), np.stack([expected[shape] for shape in correctives.names]), atol=1e-4
+    )
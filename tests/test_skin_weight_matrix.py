@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from rigging_toolkit.maya.utils.deformers.skincluster import (
+    get_skin_weight_matrix,
+    get_skin_weights,
+    set_skin_weight_matrix,
+    set_skin_weights,
+)
+
+INFLUENCES = ["root_jnt", "spine_jnt", "neck_jnt", "head_jnt"]
+
+
+def _weights(vertex_count, influence_count, seed=0):
+    weights = np.random.default_rng(seed).random((vertex_count, influence_count))
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def test_get_then_set_returns_the_same_weights(scene):
+    weights = _weights(50, len(INFLUENCES))
+    scene.add_mesh("geo_head_L1", 50)
+    skin_cluster = scene.add_skin_cluster("skinCluster1", "geo_head_L1", INFLUENCES, weights)
+
+    influences, matrix = get_skin_weight_matrix("skinCluster1")
+    assert influences == INFLUENCES
+    np.testing.assert_allclose(matrix, weights)
+
+    skin_cluster.weights[:] = 0.0
+    set_skin_weight_matrix("skinCluster1", matrix)
+    np.testing.assert_allclose(get_skin_weight_matrix("skinCluster1")[1], weights)
+
+
+def test_set_rejects_a_wrong_number_of_influences(scene):
+    scene.add_mesh("geo_head_L1", 10)
+    scene.add_skin_cluster("skinCluster1", "geo_head_L1", INFLUENCES, _weights(10, len(INFLUENCES)))
+
+    with pytest.raises(RuntimeError):
+        set_skin_weight_matrix("skinCluster1", _weights(10, 3))
+
+
+def test_skin_weights_dict_round_trips(scene):
+    weights = _weights(20, len(INFLUENCES), seed=1)
+    scene.add_mesh("geo_head_L1", 20)
+    skin_cluster = scene.add_skin_cluster("skinCluster1", "geo_head_L1", INFLUENCES, weights)
+
+    data = get_skin_weights("skinCluster1")
+    skin_cluster.weights[:] = 0.0
+    set_skin_weights("skinCluster1", data)
+    np.testing.assert_allclose(skin_cluster.weights, weights)
+
+
+def test_set_skin_weights_rejects_a_missing_influence(scene):
+    scene.add_mesh("geo_head_L1", 5)
+    scene.add_skin_cluster("skinCluster1", "geo_head_L1", INFLUENCES, _weights(5, len(INFLUENCES)))
+    data = {"influences": ["jaw_jnt"], "weights": [{0: 1.0}] * 5}
+
+    with pytest.raises(RuntimeError, match="is missing the influence jaw_jnt"):
+        set_skin_weights("skinCluster1", data)
@@ -0,0 +1,12 @@
+import numpy as np
+
+from rigging_toolkit.maya.utils.deformers.skincluster import SmoothSkinWeights
+
+
+def test_vertex_ids_are_parsed_from_the_vtx_part_of_the_components(scene):
+    scene.add_mesh("geo_head_L1", 30)
+    scene.add_skin_cluster("skinCluster1", "geo_head_L1", ["root_jnt", "head_jnt"], np.full((30, 2), 0.5))
+
+    smooth = SmoothSkinWeights("skinCluster1", vertices=["geo_head_L1.vtx[12]", "geo_head_L1.vtx[20:22]"])
+    np.testing.assert_array_equal(smooth._get_vertex_ids(), [12, 20, 21, 22])
+    assert SmoothSkinWeights("skinCluster1")._get_vertex_ids() is None